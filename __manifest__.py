@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'Social Media - Facebook Enhanced',
-    'version': '19.0.2.0.0',
+    'version': '19.0.2.1.0',
     'category': 'Marketing/Social Marketing',
     'summary': 'Facebook Integration with CRM, Messenger Sales & Content Calendar',
     'description': """
@@ -1 +1,9 @@
-from . import facebook_api
\ No newline at end of file
+from . import rate_limiter
+from . import circuit_breaker
+from . import response_cache
+from . import event_dedupe
+from . import keyword_matcher
+from . import flood_control
+from . import counter_buffer
+from . import facebook_api
+from . import facebook_api_async
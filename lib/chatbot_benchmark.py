@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark chatbot Messenger theo từng bước chuyển state, có ngân sách query.
+
+Mô phỏng N khách hàng đi qua mọi nhánh của state machine chatbot
+(social.messenger.bot): khách mới đặt hàng, khách quen cập nhật / giữ
+thông tin (ask_update), hủy đơn, quay lại menu giữa chừng, nhập sai. Mỗi
+tin nhắn đi đúng đường của webhook thật: social.webhook.event._enqueue()
+(như controller) rồi _process() của các row vừa tạo (như cron, nhưng không
+commit). Mỗi tin nhắn được đo:
+
+- số SQL query (cursor.sql_log_count, gồm cả flush ORM cuối lượt)
+- thời gian (wall time)
+- bộ nhớ cấp phát (tracemalloc, peak trong lượt)
+
+theo transition `state trước->state sau`. Graph API trỏ về FakeGraphServer;
+tin trả lời chỉ nằm trong outbox. Mọi thay đổi được rollback khi kết thúc.
+
+Ngân sách query = số query đo được (chatbot_query_baseline.json) cộng
+BUDGET_MARGIN / BUDGET_SLACK. Ghi baseline mới sau khi thay đổi có chủ đích:
+
+    python -m odoo.addons.module_social_facebook.lib.chatbot_benchmark \\
+        -c /etc/odoo/odoo.conf -d bench --customers 20 --record-baseline
+
+Chạy không có --record-baseline để kiểm tra: exit code 1 nếu có
+transition vượt ngân sách hoặc chưa có baseline.
+tests/test_chatbot_query_budget.py kiểm tra cùng điều kiện trong test Odoo.
+"""
+
+import os
+import json
+import math
+import time
+import argparse
+import tracemalloc
+import logging
+
+from .fake_graph_server import fake_graph_server
+from .webhook_benchmark import percentile
+
+_logger = logging.getLogger(__name__)
+
+
+# Số query lớn nhất đo được theo transition (state trước->state sau), ghi
+# bằng --record-baseline
+QUERY_BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'chatbot_query_baseline.json')
+# Ngân sách = baseline * (1 + BUDGET_MARGIN) + BUDGET_SLACK
+BUDGET_MARGIN = 0.1
+BUDGET_SLACK = 2
+
+# Khách chạy trước để làm nóng cache (matcher, catalog, resolver) - không tính
+WARMUP_CUSTOMERS = 1
+# Khoảng cách timestamp giữa hai tin của cùng khách (ms): flood control tính
+# theo timestamp của event nên khách mô phỏng không bị coi là spam
+EVENT_INTERVAL_MS = 60 * 1000
+
+
+def load_baseline(path=QUERY_BASELINE_FILE):
+    """Baseline {transition: số query}; {} nếu chưa ghi"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def query_budgets(baseline):
+    """Ngân sách query theo transition từ baseline đo được"""
+    return {
+        transition: int(math.ceil(queries * (1 + BUDGET_MARGIN))) + BUDGET_SLACK
+        for transition, queries in baseline.items()
+    }
+
+
+QUERY_BUDGETS = query_budgets(load_baseline())
+
+
+def _text(text):
+    return {'text': text}
+
+
+def _quick_reply(payload):
+    return {'text': payload, 'quick_reply': {'payload': payload}}
+
+
+def _sticker():
+    return {'attachments': [{
+        'type': 'image',
+        'payload': {'url': 'https://example.invalid/sticker.png', 'sticker_id': 369239263222822},
+    }]}
+
+
+def build_scenarios(product_id, seq):
+    """
+    Các kịch bản hội thoại, chạy nối tiếp trên cùng một PSID (kịch bản sau
+    là khách quen vì kịch bản đầu đã đặt hàng).
+
+    Returns:
+        list: [(tên kịch bản, [message])]
+    """
+    product = f'PRODUCT_{product_id}'
+    phone = f'09{seq:08d}'[-10:]
+    return [
+        ('new_order', [
+            _text('xin chào'),
+            _sticker(),
+            _text('mua'),
+            _text('a'),                                 # tên quá ngắn
+            _text(f'khach hang {seq}'),
+            _text('12345'),                             # SĐT sai
+            _text(phone),
+            _text(f'{seq} Nguyen Trai, Ha Noi'),
+            _quick_reply(product),
+            _text('abc'),                               # số lượng sai
+            _text('2'),
+            _text('Có'),
+        ]),
+        ('returning_update', [
+            _text('mua'),
+            _text('Có'),
+            _text('.'),
+            _text('.'),
+            _text('.'),
+            _quick_reply(product),
+            _text('1'),
+            _text('Không'),                             # hủy đơn
+            _quick_reply(product),
+            _text('3'),
+            _text('Có'),
+        ]),
+        ('returning_skip', [
+            _text('mua'),
+            _text('Không'),
+            _quick_reply(product),
+            _text('1'),
+            _text('Có'),
+        ]),
+        ('restart_midway', [
+            _text('mua'),
+            _text('Có'),
+            _text('menu'),                              # quay lại từ ask_name
+            _text('Không'),
+            _quick_reply(product),
+            _text('5'),
+            _text('Không'),
+        ]),
+    ]
+
+
+class ChatbotSimulator:
+
+    def __init__(self, env, account, product_id, budgets=None):
+        self.env = env
+        self.account = account
+        self.product_id = product_id
+        self.budgets = QUERY_BUDGETS if budgets is None else budgets
+        self.samples = {}           # transition -> [(queries, seconds, alloc bytes)]
+        self._clock = int(time.time() * 1000)
+
+    def _session(self, psid):
+        Message = self.env['social.message'].sudo()
+        Message.invalidate_model()
+        return Message.search([
+            ('facebook_user_id', '=', psid),
+            ('account_id', '=', self.account.id),
+        ], limit=1)
+
+    def _payload(self, psid, message, index):
+        """Body webhook của một tin nhắn (timestamp tăng đều theo EVENT_INTERVAL_MS)"""
+        self._clock += EVENT_INTERVAL_MS
+        page_id = self.account.facebook_page_id
+        return json.dumps({
+            'object': 'page',
+            'entry': [{
+                'id': page_id,
+                'time': self._clock,
+                'messaging': [{
+                    'sender': {'id': psid},
+                    'recipient': {'id': page_id},
+                    'timestamp': self._clock,
+                    'message': dict(message, mid=f'm_bench_{psid}_{index}'),
+                }],
+            }],
+        })
+
+    def step(self, psid, message, index):
+        """
+        Xử lý một tin nhắn qua queue webhook.
+
+        Returns:
+            tuple: (transition, số query, giây, byte cấp phát)
+        """
+        session = self._session(psid)
+        if session.cooldown_until:
+            # Cooldown sau khi đặt hàng không phải đối tượng đo
+            session.write({'cooldown_until': False})
+        before = session.chatbot_state if session else 'new'
+        payload = self._payload(psid, message, index)
+        self.env.flush_all()
+        self.env.invalidate_all()
+
+        cr = self.env.cr
+        queries = cr.sql_log_count
+        tracemalloc.reset_peak()
+        alloc_before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+
+        events = self.env['social.webhook.event'].sudo()._enqueue(payload)
+        events.filtered(lambda e: e.state == 'pending')._process()
+        self.env.flush_all()
+
+        elapsed = time.perf_counter() - started
+        alloc = tracemalloc.get_traced_memory()[1] - alloc_before
+        queries = cr.sql_log_count - queries
+
+        failed = events.filtered(lambda e: e.state != 'done')
+        if failed:
+            raise RuntimeError(f'Webhook delivery of PSID {psid} not processed: '
+                               f'{failed[0].state} {failed[0].error_message or ""}')
+        after = self._session(psid).chatbot_state
+        return f'{before}->{after}', queries, elapsed, alloc
+
+    def run_customer(self, psid, seq, record=True):
+        index = 0
+        for _name, messages in build_scenarios(self.product_id, seq):
+            for message in messages:
+                index += 1
+                transition, queries, elapsed, alloc = self.step(psid, message, index)
+                if record:
+                    self.samples.setdefault(transition, []).append((queries, elapsed, alloc))
+
+    def run(self, customers=10, warmup=WARMUP_CUSTOMERS):
+        base = int(time.time()) * 1000
+        tracemalloc.start()
+        try:
+            for seq in range(warmup + customers):
+                self.run_customer(str(base + seq), seq, record=seq >= warmup)
+        finally:
+            tracemalloc.stop()
+        return self.report()
+
+    def report(self):
+        transitions = {}
+        for transition, samples in sorted(self.samples.items()):
+            queries = [s[0] for s in samples]
+            seconds = [s[1] for s in samples]
+            allocs = [s[2] for s in samples]
+            budget = self.budgets.get(transition)
+            transitions[transition] = {
+                'count': len(samples),
+                'queries_max': max(queries),
+                'queries_p50': percentile(queries, 50),
+                'budget': budget,
+                'over_budget': budget is not None and max(queries) > budget,
+                'wall_p50_ms': round(percentile(seconds, 50) * 1000, 2),
+                'wall_p95_ms': round(percentile(seconds, 95) * 1000, 2),
+                'alloc_peak_kb': round(max(allocs) / 1024, 1),
+            }
+        return {
+            'transitions': transitions,
+            'over_budget': sorted(t for t, s in transitions.items() if s['over_budget']),
+            'unrecorded': sorted(t for t, s in transitions.items() if s['budget'] is None),
+        }
+
+
+def format_report(report):
+    lines = [f"{'transition':<32} {'n':>4} {'q.max':>6} {'q.p50':>6} {'budget':>6} "
+             f"{'p50 ms':>8} {'p95 ms':>8} {'alloc KB':>9}"]
+    for transition, s in report['transitions'].items():
+        flag = '  OVER BUDGET' if s['over_budget'] else ''
+        budget = '-' if s['budget'] is None else s['budget']
+        lines.append(
+            f"{transition:<32} {s['count']:>4} {s['queries_max']:>6} {s['queries_p50']:>6} "
+            f"{budget:>6} {s['wall_p50_ms']:>8} {s['wall_p95_ms']:>8} {s['alloc_peak_kb']:>9}{flag}"
+        )
+    if report['over_budget']:
+        lines.append('over budget: ' + ', '.join(report['over_budget']))
+    if report['unrecorded']:
+        lines.append('no baseline (--record-baseline): ' + ', '.join(report['unrecorded']))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Messenger chatbot query-budget benchmark')
+    parser.add_argument('-c', '--config', help='File cấu hình Odoo')
+    parser.add_argument('-d', '--database', required=True)
+    parser.add_argument('--page-id', help='facebook_page_id (mặc định: page active đầu tiên)')
+    parser.add_argument('--product-id', type=int,
+                        help='id social.messenger.product (mặc định: sản phẩm active đầu tiên)')
+    parser.add_argument('--customers', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=WARMUP_CUSTOMERS)
+    parser.add_argument('--baseline', default=QUERY_BASELINE_FILE,
+                        help='JSON {transition: số query} làm baseline (mặc định: file đi kèm module)')
+    parser.add_argument('--record-baseline', action='store_true',
+                        help='Ghi số query lớn nhất đo được vào file --baseline')
+    parser.add_argument('--json', action='store_true', help='In report dạng JSON')
+    args = parser.parse_args(argv)
+
+    import odoo
+    from odoo import SUPERUSER_ID, api
+    from odoo.modules.registry import Registry
+
+    odoo.tools.config.parse_config(['-c', args.config] if args.config else [])
+    logging.getLogger('odoo').setLevel(logging.WARNING)
+
+    budgets = query_budgets(load_baseline(args.baseline))
+
+    registry = Registry(args.database)
+    with fake_graph_server(), registry.cursor() as cr:
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        domain = [('facebook_page_id', '=', args.page_id)] if args.page_id else []
+        account = env['social.account'].search(domain, limit=1)
+        if not account:
+            parser.error('Không tìm thấy social.account')
+        product_id = args.product_id or env['social.messenger.product'].search([
+            ('company_id', '=', account.company_id.id),
+        ], limit=1).id
+        if not product_id:
+            parser.error('Không tìm thấy social.messenger.product')
+
+        simulator = ChatbotSimulator(env, account, product_id, budgets=budgets)
+        try:
+            report = simulator.run(customers=args.customers, warmup=args.warmup)
+        finally:
+            cr.rollback()
+
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+    if args.record_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({t: s['queries_max'] for t, s in report['transitions'].items()},
+                      f, indent=2, sort_keys=True)
+            f.write('\n')
+        return 0
+
+    return 1 if report['over_budget'] or report['unrecorded'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+import logging
+
+import requests
+
+_logger = logging.getLogger(__name__)
+
+
+# Số lỗi liên tiếp (5xx / timeout / lỗi kết nối) trước khi mở mạch
+FAILURE_THRESHOLD = 5
+# Thời gian mạch mở (giây) trước khi cho một request thử lại
+RESET_TIMEOUT = 30.0
+# Request thử (half_open) không báo kết quả trong bấy nhiêu giây → mở lại
+# mạch với cooldown mới (không bao giờ kẹt ở half_open)
+HALF_OPEN_TIMEOUT = 60.0
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Graph API đang lỗi với page/token này - fail fast, không gửi request"""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker theo page + token.
+
+    closed    -> request đi bình thường, đếm lỗi liên tiếp
+    open      -> từ chối ngay (CircuitOpenError) trong RESET_TIMEOUT giây
+    half_open -> cho đúng một request thử; thành công thì đóng mạch,
+                 lỗi thì mở lại. Request thử không báo kết quả trong
+                 HALF_OPEN_TIMEOUT giây thì mạch mở lại với cooldown mới.
+
+    Caller phải gọi record_success() hoặc record_failure() cho mọi request
+    đã qua before_call(), kể cả khi request kết thúc bằng exception.
+    """
+
+    def __init__(self, key, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT,
+                 half_open_timeout=HALF_OPEN_TIMEOUT):
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_timeout = half_open_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Gọi trước mỗi request. Raises CircuitOpenError khi mạch đang mở."""
+        with self._lock:
+            if self.state == 'closed':
+                return
+            now = time.monotonic()
+            if self.state == 'half_open' and now - self.trial_started_at >= self.half_open_timeout:
+                _logger.warning(f'Graph API circuit trial timed out for {self.key}, reopening')
+                self.state = 'open'
+                self.opened_at = now
+            if self.state == 'open' and now - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self.trial_started_at = now
+                return
+            if self.state == 'half_open':
+                raise CircuitOpenError(f'Graph API circuit half-open for {self.key}, trial in progress')
+            retry_in = max(0.0, self.reset_timeout - (now - self.opened_at))
+            raise CircuitOpenError(
+                f'Graph API circuit open for {self.key}, retry in {retry_in:.0f}s'
+            )
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                _logger.info(f'Graph API circuit closed for {self.key}')
+            self.state = 'closed'
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    _logger.warning(
+                        f'Graph API circuit opened for {self.key} after {self.failures} failures'
+                    )
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(key):
+    """Circuit breaker dùng chung trong process cho một page/token"""
+    breaker = _breakers.get(key)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(key, CircuitBreaker(key))
+    return breaker
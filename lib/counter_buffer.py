@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+
+
+# Chu kỳ (giây) tối thiểu giữa hai lần ghi bộ đếm xuống database
+FLUSH_INTERVAL = 30.0
+
+
+class CounterBuffer:
+    """
+    Bộ đếm cộng dồn trong bộ nhớ của process, ghi xuống database theo lô
+    (UPDATE ... SET x = x + n) thay vì read-modify-write mỗi lần.
+
+    Mỗi key giữ (số lần, thời điểm cuối).
+    """
+
+    def __init__(self, flush_interval=FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._counts = {}
+        self._drained_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, key, count=1, when=None):
+        with self._lock:
+            current, last = self._counts.get(key, (0, None))
+            if last is not None and when is not None:
+                when = max(last, when)
+            self._counts[key] = (current + count, when if when is not None else last)
+
+    def merge(self, items):
+        """Cộng lại các giá trị đã drain (khi ghi database lỗi)"""
+        for key, (count, when) in items.items():
+            self.add(key, count, when)
+
+    def is_due(self):
+        """Có dữ liệu và đã qua flush_interval kể từ lần drain trước"""
+        with self._lock:
+            return bool(self._counts) and time.monotonic() - self._drained_at >= self.flush_interval
+
+    def drain(self):
+        """
+        Lấy và xóa mọi giá trị đang cộng dồn.
+
+        Returns:
+            dict: key -> (số lần, thời điểm cuối)
+        """
+        with self._lock:
+            items, self._counts = self._counts, {}
+            self._drained_at = time.monotonic()
+            return items
+
+    def __len__(self):
+        with self._lock:
+            return len(self._counts)
+
+
+_trigger_counters = CounterBuffer()
+
+
+def get_trigger_counters():
+    """Bộ đếm kích hoạt chatbot rule của process: (rule_id, ngày) -> (số lần, lần cuối)"""
+    return _trigger_counters
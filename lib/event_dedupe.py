@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+# Số key (mid / watermark) đã xử lý giữ trong bộ nhớ mỗi process
+SEEN_LRU_SIZE = 10000
+
+
+def make_event_key(event):
+    """
+    Key idempotency của một messaging event.
+
+    - message / postback: mid (postback cũ không có mid → sender + timestamp)
+    - delivery / read: sender + watermark
+
+    Returns:
+        str | None: None nếu event không có gì để nhận diện
+    """
+    sender_id = event.get('sender', {}).get('id')
+
+    if 'message' in event:
+        mid = event['message'].get('mid')
+        return f'mid:{mid}' if mid else None
+
+    if 'postback' in event:
+        mid = event['postback'].get('mid')
+        if mid:
+            return f'mid:{mid}'
+        return f'postback:{sender_id}:{event.get("timestamp")}'
+
+    for kind in ('delivery', 'read'):
+        if kind in event:
+            return f'{kind}:{sender_id}:{event[kind].get("watermark")}'
+
+    return None
+
+
+def make_change_key(change):
+    """
+    Key idempotency của một change (feed, leadgen, ...). Change không có
+    id riêng nên dùng hash nội dung - redelivery gửi lại đúng nội dung cũ.
+    """
+    raw = json.dumps(change, sort_keys=True, default=str)
+    return f"change:{change.get('field')}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+
+class SeenEvents:
+    """LRU giới hạn các event key đã xử lý (đã commit) trong process"""
+
+    def __init__(self, size=SEEN_LRU_SIZE):
+        self.size = size
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                return True
+            return False
+
+    def add(self, key):
+        with self._lock:
+            self._keys[key] = True
+            self._keys.move_to_end(key)
+            while len(self._keys) > self.size:
+                self._keys.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+
+_seen = SeenEvents()
+
+
+def get_seen_events():
+    """LRU event key dùng chung của process"""
+    return _seen
@@ -1,65 +1,752 @@
 # -*- coding: utf-8 -*-
 
-import requests
+import os
+import json
+import time
+import random
+import hashlib
+import threading
 import logging
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .circuit_breaker import get_circuit_breaker
+from .rate_limiter import PRIORITY_HIGH, PRIORITY_LOW, get_rate_limiter, page_key
+from .response_cache import TTL_LEADGEN_FORMS, TTL_PAGE_INFO, get_response_cache, make_cache_key
 
 _logger = logging.getLogger(__name__)
 
 
+# -------------------------------------------------------------------------
+# HTTP TRANSPORT
+# -------------------------------------------------------------------------
+
+# Số host giữ trong pool (graph.facebook.com, graph-video, ...)
+POOL_CONNECTIONS = 4
+# Số keep-alive connection tối đa mỗi host
+POOL_MAXSIZE = 16
+# Timeout mặc định (giây) - không bao giờ gọi Graph mà không có timeout
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 30
+
+# Graph API cho phép tối đa 50 sub-request trong một batch call
+BATCH_LIMIT = 50
+# Error code Graph coi là tạm thời (throttling / lỗi nội bộ) - được retry
+BATCH_RETRYABLE_ERROR_CODES = {1, 2, 4, 17, 32, 341, 613}
+
+# Số item mỗi trang khi duyệt cursor pagination
+PAGE_SIZE = 100
+# Field của một lead (leadgen) đọc từ Graph
+LEADGEN_FIELDS = 'id,created_time,field_data,form_id,ad_id,campaign_id'
+
+# Kích thước tối đa mỗi chunk khi upload video (resumable upload) -
+# bộ nhớ worker dùng cho upload không vượt quá giá trị này
+VIDEO_CHUNK_SIZE = 4 * 1024 * 1024
+# Timeout đọc (giây) cho mỗi chunk video
+VIDEO_CHUNK_TIMEOUT = 120
+
+# Error code Graph báo lỗi tạm thời phía Facebook (unknown / service unavailable)
+TRANSIENT_ERROR_CODES = {1, 2}
+
+# Retry với exponential backoff + full jitter, theo độ ưu tiên.
+# High priority (webhook) retry ít và ngắn để không giữ worker lâu.
+RETRY_POLICY = {
+    PRIORITY_HIGH: {'max_attempts': 2, 'base_delay': 0.2, 'max_delay': 1.0},
+    PRIORITY_LOW: {'max_attempts': 4, 'base_delay': 1.0, 'max_delay': 15.0},
+}
+
+
+class FacebookAPIError(Exception):
+    """
+    Lỗi trả về từ Graph API.
+    
+    Attributes:
+        code (int): Graph error code
+        status_code (int): HTTP status
+        is_transient (bool): True nếu có thể thử lại sau (5xx, timeout,
+            throttling, circuit đang mở)
+    """
+    
+    def __init__(self, message, code=None, status_code=None, is_transient=False):
+        super().__init__(message)
+        self.code = code
+        self.status_code = status_code
+        self.is_transient = is_transient
+    
+    @classmethod
+    def from_response(cls, response):
+        """Tạo lỗi từ response Graph (body {'error': {...}})"""
+        try:
+            error = response.json().get('error', {})
+        except (ValueError, AttributeError):
+            error = {}
+        
+        code = error.get('code')
+        is_transient = (
+            response.status_code >= 500
+            or code in TRANSIENT_ERROR_CODES
+            or bool(error.get('is_transient'))
+        )
+        return cls(
+            error.get('message') or response.text,
+            code=code,
+            status_code=response.status_code,
+            is_transient=is_transient,
+        )
+    
+    @classmethod
+    def from_exception(cls, exc):
+        """Lỗi mạng / timeout / rate limit / circuit open → transient"""
+        return cls(str(exc), is_transient=True)
+
+
+def parse_graph_datetime(value):
+    """
+    '2025-01-01T10:00:00+0000' (Graph) → datetime UTC naive (chuẩn Odoo).
+    
+    Trả về None nếu value rỗng hoặc sai format.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.strptime(value, '%Y-%m-%dT%H:%M:%S%z')
+    except (TypeError, ValueError):
+        return None
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+# Base URL Graph API. Ghi đè bằng biến môi trường FACEBOOK_GRAPH_BASE_URL
+# hoặc set_base_url() (vd: trỏ tới fake_graph_server khi test / benchmark)
+_base_url = os.environ.get('FACEBOOK_GRAPH_BASE_URL')
+
+
+def set_base_url(url):
+    """
+    Đổi base URL mặc định cho mọi FacebookAPI tạo sau đó.
+    
+    Args:
+        url (str): vd 'http://127.0.0.1:8765/v18.0'; None = Graph thật
+    
+    Returns:
+        str: Base URL trước đó (để khôi phục)
+    """
+    global _base_url
+    previous = _base_url
+    _base_url = url.rstrip('/') if url else None
+    return previous
+
+
+# Mapping câu hỏi của lead form theo form_id, làm mới sau TTL_LEADGEN_FORMS:
+# {form_id: (expires_at, {question key: question type})}
+_leadgen_field_maps = {}
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Trả về requests.Session dùng chung cho worker hiện tại.
+    
+    Session giữ keep-alive connection tới Graph API nên các request sau
+    không phải bắt tay TCP + TLS lại. Odoo prefork worker là process riêng,
+    vì vậy session được tạo lại sau khi fork (không dùng chung socket với
+    process cha).
+    
+    Returns:
+        requests.Session: Session có connection pool giới hạn mỗi host
+    """
+    global _session, _session_pid
+    
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=POOL_CONNECTIONS,
+                    pool_maxsize=POOL_MAXSIZE,
+                    max_retries=0,
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+                _session_pid = pid
+    return _session
+
+
 class FacebookAPI:
     """
     Wrapper for Facebook Graph API.
     Version: v18.0
+    
+    Mọi request đi qua connection pool dùng chung (xem get_session()),
+    luôn có connect/read timeout và phải lấy quota từ rate limiter
+    (xem rate_limiter.GraphRateLimiter) trước khi gửi.
     """
     
     API_VERSION = 'v18.0'
     BASE_URL = f'https://graph.facebook.com/{API_VERSION}'
     
-    def __init__(self, access_token):
+    def __init__(self, access_token, timeout=None, priority=PRIORITY_HIGH, base_url=None):
         """
         Initialize API wrapper.
         
         Args:
             access_token (str): Page Access Token
+            timeout (float|tuple): Read timeout (giây) hoặc (connect, read)
+                mặc định cho mọi request của instance này
+            priority (int): PRIORITY_HIGH (Messenger, thao tác user) hoặc
+                PRIORITY_LOW (cron đồng bộ) khi xếp hàng chờ quota
+            base_url (str): Ghi đè base URL (mặc định BASE_URL hoặc
+                giá trị của set_base_url())
         """
         self.access_token = access_token
+        self.base_url = (base_url or _base_url or self.BASE_URL).rstrip('/')
+        self.timeout = timeout
+        self.priority = priority
+        self.session = get_session()
+        self.rate_limiter = get_rate_limiter()
+        self.rate_key = page_key(access_token)
+        self.response_cache = get_response_cache()
+    
+    # -------------------------------------------------------------------------
+    # TRANSPORT
+    # -------------------------------------------------------------------------
+    
+    def _build_url(self, endpoint):
+        """Ghép endpoint tương đối (vd: '123/feed') với base URL"""
+        if endpoint.startswith(('http://', 'https://')):
+            return endpoint
+        return f"{self.base_url}/{endpoint.lstrip('/')}"
+    
+    def _resolve_timeout(self, timeout):
+        """Chuẩn hóa timeout thành tuple (connect, read)"""
+        timeout = timeout if timeout is not None else self.timeout
+        if timeout is None:
+            return (CONNECT_TIMEOUT, READ_TIMEOUT)
+        if isinstance(timeout, (tuple, list)):
+            return tuple(timeout)
+        return (CONNECT_TIMEOUT, timeout)
+    
+    @staticmethod
+    def _is_transient_response(response):
+        """5xx hoặc error code tạm thời của Graph (không tính throttling)"""
+        if response.status_code >= 500:
+            return True
+        if response.status_code < 400:
+            return False
+        try:
+            error = response.json().get('error', {})
+        except (ValueError, AttributeError):
+            return False
+        return error.get('code') in TRANSIENT_ERROR_CODES or bool(error.get('is_transient'))
+    
+    def _retry_policy(self):
+        return RETRY_POLICY.get(self.priority, RETRY_POLICY[PRIORITY_LOW])
+    
+    def _backoff(self, attempt):
+        """Exponential backoff với full jitter"""
+        policy = self._retry_policy()
+        delay = min(policy['max_delay'], policy['base_delay'] * (2 ** (attempt - 1)))
+        time.sleep(random.uniform(0, delay))
+    
+    def request(self, method, endpoint, params=None, timeout=None, cost=1, retry=None, **kwargs):
+        """
+        Gửi request tới Graph API qua session dùng chung.
+        
+        Access token được thêm vào query string nếu caller chưa truyền.
+        
+        Args:
+            method (str): HTTP method ('GET', 'POST', ...)
+            endpoint (str): Path tương đối (vd: '{page_id}/feed') hoặc URL đầy đủ
+            params (dict): Query parameters
+            timeout (float|tuple): Ghi đè timeout của instance
+            cost (int): Số call Graph tính vào quota (batch = số sub-request)
+            retry (bool): Cho phép retry lỗi tạm thời. Mặc định chỉ GET
+                (idempotent); POST chỉ retry khi chưa kết nối được
+                (ConnectTimeout) vì request chắc chắn chưa tới Facebook
+            **kwargs: data / json / files truyền thẳng cho requests
+        
+        Returns:
+            requests.Response
+        
+        Raises:
+            RateLimitError: Hết quota và không chờ được trong MAX_WAIT
+            CircuitOpenError: Page/token đang lỗi liên tục, fail fast
+        """
+        params = dict(params or {})
+        params.setdefault('access_token', self.access_token)
+        
+        if retry is None:
+            retry = method.upper() == 'GET'
+        max_attempts = self._retry_policy()['max_attempts']
+        breaker = get_circuit_breaker(self.rate_key)
+        attempt = 0
+        
+        while True:
+            attempt += 1
+            # Chờ quota trước khi chiếm lượt thử của mạch half_open
+            self.rate_limiter.acquire([self.rate_key], priority=self.priority, cost=cost)
+            breaker.before_call()
+            
+            response, error, succeeded = None, None, False
+            try:
+                response = self.session.request(
+                    method,
+                    self._build_url(endpoint),
+                    params=params,
+                    timeout=self._resolve_timeout(timeout),
+                    **kwargs
+                )
+                self.rate_limiter.update_from_response([self.rate_key], response)
+                succeeded = not self._is_transient_response(response)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            finally:
+                # Mọi đường ra (kể cả exception khác) đều báo kết quả cho breaker
+                if succeeded:
+                    breaker.record_success()
+                else:
+                    breaker.record_failure()
+            
+            if error is not None:
+                safe = retry or isinstance(error, requests.exceptions.ConnectTimeout)
+                if not safe or attempt >= max_attempts:
+                    raise error
+                _logger.warning(f'Graph {method} {endpoint} failed ({error}), retry {attempt}')
+                self._backoff(attempt)
+                continue
+            
+            if not succeeded and retry and attempt < max_attempts:
+                _logger.warning(
+                    f'Graph {method} {endpoint} transient error {response.status_code}, retry {attempt}'
+                )
+                self._backoff(attempt)
+                continue
+            
+            return response
+    
+    def get(self, endpoint, params=None, cache_ttl=None, refresh=False, **kwargs):
+        """
+        GET request tới Graph API.
+        
+        Args:
+            cache_ttl (int): Nếu có, đọc qua response cache (LRU + DB) với
+                TTL này và revalidate bằng ETag khi hết hạn
+            refresh (bool): Luôn gọi Graph (bỏ qua entry còn hạn) và cập
+                nhật cache - cho thao tác kiểm tra của user
+        """
+        if not cache_ttl:
+            return self.request('GET', endpoint, params=params, **kwargs)
+        
+        headers = kwargs.pop('headers', None) or {}
+        key = make_cache_key(self.rate_key, endpoint, params)
+        return self.response_cache.fetch(
+            key, cache_ttl,
+            lambda extra_headers: self.request(
+                'GET', endpoint, params=params, headers={**headers, **extra_headers}, **kwargs
+            ),
+            refresh=refresh,
+        )
+    
+    def post(self, endpoint, params=None, **kwargs):
+        """POST request tới Graph API"""
+        return self.request('POST', endpoint, params=params, **kwargs)
+    
+    # -------------------------------------------------------------------------
+    # CURSOR PAGINATION
+    # -------------------------------------------------------------------------
+    
+    @staticmethod
+    def _to_timestamp(value):
+        """since/until: datetime hoặc unix timestamp"""
+        if value is None:
+            return None
+        if hasattr(value, 'timestamp'):
+            return int(value.timestamp())
+        return int(value)
+    
+    def iter_edge(self, endpoint, params=None, page_size=PAGE_SIZE, since=None, until=None,
+                  timeout=None, cache_ttl=None):
+        """
+        Duyệt lazily mọi item của một edge có cursor pagination.
+        
+        Chỉ giữ một trang trong bộ nhớ; trang kế tiếp được gọi khi caller
+        tiêu thụ hết trang hiện tại (theo paging.cursors.after).
+        
+        Args:
+            endpoint (str): Edge (vd: '{post_id}/comments')
+            params (dict): Query parameters (fields, filter, ...)
+            page_size (int): Số item mỗi trang (limit)
+            since / until (datetime|int): Cửa sổ thời gian
+            cache_ttl (int): Cache từng trang (xem get())
+        
+        Yields:
+            dict: Từng item trong 'data'
+        
+        Raises:
+            FacebookAPIError: Nếu một trang trả lỗi
+        """
+        params = dict(params or {})
+        params['limit'] = page_size
+        if since is not None:
+            params['since'] = self._to_timestamp(since)
+        if until is not None:
+            params['until'] = self._to_timestamp(until)
+        
+        while True:
+            response = self.get(endpoint, params=params, timeout=timeout, cache_ttl=cache_ttl)
+            if response.status_code != 200:
+                raise FacebookAPIError.from_response(response)
+            
+            page = response.json()
+            yield from page.get('data', [])
+            
+            paging = page.get('paging', {})
+            after = paging.get('cursors', {}).get('after')
+            if not paging.get('next') or not after:
+                return
+            params['after'] = after
+    
+    def iter_comments(self, object_id, fields='id,message,from,created_time,parent',
+                      since=None, until=None, page_size=PAGE_SIZE):
+        """Duyệt mọi comment của một post / comment (stream)"""
+        return self.iter_edge(
+            f"{object_id}/comments",
+            params={'fields': fields},
+            page_size=page_size, since=since, until=until,
+        )
+    
+    def iter_conversation_messages(self, conversation_id, fields='id,created_time,from,to,message',
+                                   since=None, until=None, page_size=PAGE_SIZE):
+        """Duyệt mọi tin nhắn của một conversation"""
+        return self.iter_edge(
+            f"{conversation_id}/messages",
+            params={'fields': fields},
+            page_size=page_size, since=since, until=until,
+        )
+    
+    def iter_leadgen_forms(self, page_id, fields='id,name,status,questions', page_size=PAGE_SIZE):
+        """Duyệt mọi lead form của page"""
+        return self.iter_edge(
+            f"{page_id}/leadgen_forms",
+            params={'fields': fields},
+            page_size=page_size, timeout=10, cache_ttl=TTL_LEADGEN_FORMS,
+        )
+    
+    def iter_leads(self, form_id, fields='id,created_time,field_data',
+                   since=None, until=None, page_size=PAGE_SIZE):
+        """Duyệt mọi lead của một form"""
+        return self.iter_edge(
+            f"{form_id}/leads",
+            params={'fields': fields},
+            page_size=page_size, since=since, until=until,
+        )
+    
+    # -------------------------------------------------------------------------
+    # BATCH API
+    # -------------------------------------------------------------------------
+    
+    @staticmethod
+    def make_batch_request(endpoint, params=None, method='GET'):
+        """
+        Tạo một sub-request cho execute_batch().
+        
+        Args:
+            endpoint (str): Path tương đối (vd: '{post_id}')
+            params (dict): Query parameters (đã bỏ access_token)
+            method (str): HTTP method
+        
+        Returns:
+            dict: {'method': 'GET', 'relative_url': '{post_id}?fields=...'}
+        """
+        relative_url = endpoint.lstrip('/')
+        if params:
+            relative_url = f"{relative_url}?{urlencode(params)}"
+        return {'method': method, 'relative_url': relative_url}
+    
+    @staticmethod
+    def _is_retryable_batch_item(code, body):
+        """Sub-response lỗi tạm thời (timeout, 5xx, throttling) → retry"""
+        if code is None or code >= 500:
+            return True
+        if code >= 400 and isinstance(body, dict):
+            return body.get('error', {}).get('code') in BATCH_RETRYABLE_ERROR_CODES
+        return False
+    
+    def execute_batch(self, sub_requests, max_retries=2, timeout=60):
+        """
+        Gửi nhiều sub-request qua Graph batch endpoint, 50 request / call.
+        
+        Mỗi sub-response được map lại theo key của caller. Chỉ những item
+        lỗi tạm thời mới được gửi lại ở lượt retry sau.
+        
+        Args:
+            sub_requests (dict): key -> sub-request (xem make_batch_request())
+            max_retries (int): Số lượt retry cho các item lỗi
+            timeout (float|tuple): Timeout cho mỗi batch call
+        
+        Returns:
+            dict: key -> {'code': int|None, 'body': dict}
+        
+        Example:
+            >>> api.execute_batch({
+            ...     post.id: api.make_batch_request(post.facebook_post_id, {'fields': 'shares'})
+            ... })
+            {42: {'code': 200, 'body': {'id': '...', 'shares': {'count': 3}}}}
+        """
+        results = {}
+        pending = list(sub_requests.items())
+        attempt = 0
+        
+        while pending:
+            failed = []
+            
+            for start in range(0, len(pending), BATCH_LIMIT):
+                chunk = pending[start:start + BATCH_LIMIT]
+                data = {
+                    'batch': json.dumps([sub_request for _key, sub_request in chunk]),
+                    'include_headers': 'false',
+                }
+                
+                try:
+                    response = self.post('', data=data, timeout=timeout, cost=len(chunk))
+                    response.raise_for_status()
+                    items = response.json()
+                except (requests.exceptions.RequestException, ValueError) as e:
+                    _logger.warning(f'Batch call failed ({len(chunk)} items): {e}')
+                    for key, sub_request in chunk:
+                        results[key] = {'code': None, 'body': {'error': {'message': str(e)}}}
+                    failed.extend(chunk)
+                    continue
+                
+                for (key, sub_request), item in zip(chunk, items):
+                    # item = None khi sub-request bị timeout phía Facebook
+                    code = item.get('code') if item else None
+                    try:
+                        body = json.loads(item.get('body') or '{}') if item else {}
+                    except ValueError:
+                        body = {}
+                    
+                    results[key] = {'code': code, 'body': body}
+                    if self._is_retryable_batch_item(code, body):
+                        failed.append((key, sub_request))
+            
+            if not failed or attempt >= max_retries:
+                break
+            
+            attempt += 1
+            _logger.info(f'Retrying {len(failed)} failed batch items (attempt {attempt})')
+            time.sleep(attempt)
+            pending = failed
+        
+        return results
     
     # -------------------------------------------------------------------------
     # PAGE METHODS
     # -------------------------------------------------------------------------
     
-    def get_page_info(self, page_id):
-        """Get page information"""
-        url = f"{self.BASE_URL}/{page_id}"
-        params = {
-            'access_token': self.access_token,
-            'fields': 'id,name,category,picture,fan_count,link'
-        }
-        response = requests.get(url, params=params)
+    def get_page_info(self, page_id, fields=None, refresh=False):
+        """
+        Get page information
+
+        Args:
+            refresh (bool): Bỏ qua response còn hạn trong cache (kiểm tra token)
+        """
+        params = {'fields': fields or 'id,name,category,picture,fan_count,link'}
+        response = self.get(page_id, params=params, cache_ttl=TTL_PAGE_INFO, refresh=refresh)
+        return response.json()
+    
+    @staticmethod
+    def make_dedupe_key(message, link=None):
+        """Khóa chống đăng trùng phía client: hash của nội dung bài đăng"""
+        raw = f"{(message or '').strip()}\n{(link or '').strip()}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    
+    def find_post_by_dedupe_key(self, page_id, dedupe_key, since):
+        """
+        Tìm bài vừa đăng (từ `since`) có cùng dedupe key.
+        
+        Dùng sau một lần publish không rõ kết quả (timeout / 5xx) để biết
+        Facebook đã nhận bài hay chưa trước khi gửi lại.
+        
+        Returns:
+            str: Facebook post ID, hoặc None
+        """
+        params = {'fields': 'id,message,link', 'since': int(since), 'limit': 25}
+        response = self.get(f"{page_id}/posts", params=params, timeout=10)
+        if response.status_code != 200:
+            return None
+        
+        for post in response.json().get('data', []):
+            if self.make_dedupe_key(post.get('message'), post.get('link')) == dedupe_key:
+                return post.get('id')
+        return None
+    
+    def publish(self, endpoint, data, files=None, timeout=None):
+        """
+        Đăng bài (feed / photos) với retry an toàn.
+        
+        Lỗi tạm thời (timeout, 5xx) được retry với backoff; trước mỗi lần
+        gửi lại, kiểm tra feed theo dedupe key để không đăng trùng.
+        
+        Args:
+            endpoint (str): '{page_id}/feed' hoặc '{page_id}/photos'
+            data (dict): Form data (message, link, ...)
+            files (dict): File upload (multipart)
+        
+        Returns:
+            dict: Response Graph, vd {'id': '...'}
+        
+        Raises:
+            FacebookAPIError: is_transient=True nếu nên thử lại sau
+        """
+        page_id = endpoint.split('/')[0]
+        dedupe_key = self.make_dedupe_key(data.get('message'), data.get('link'))
+        started_at = time.time() - 60
+        max_attempts = self._retry_policy()['max_attempts']
+        attempt = 0
+        
+        while True:
+            attempt += 1
+            error = None
+            try:
+                response = self.post(endpoint, data=data, files=files, timeout=timeout)
+                if response.status_code == 200:
+                    return response.json()
+                error = FacebookAPIError.from_response(response)
+            except requests.exceptions.RequestException as e:
+                error = FacebookAPIError.from_exception(e)
+            
+            if not error.is_transient or attempt >= max_attempts:
+                raise error
+            
+            _logger.warning(f'Publish to {endpoint} failed ({error}), retry {attempt}')
+            self._backoff(attempt)
+            
+            try:
+                post_id = self.find_post_by_dedupe_key(page_id, dedupe_key, started_at)
+            except requests.exceptions.RequestException as e:
+                raise FacebookAPIError.from_exception(e)
+            if post_id:
+                _logger.info(f'Post already published as {post_id}, skip retry')
+                return {'id': post_id}
+    
+    def _post_video_phase(self, page_id, data, files=None):
+        """Gửi một phase của resumable upload, raise FacebookAPIError khi lỗi"""
+        try:
+            response = self.post(
+                f'{page_id}/videos',
+                data=data,
+                files=files,
+                timeout=(CONNECT_TIMEOUT, VIDEO_CHUNK_TIMEOUT),
+                # start/transfer cùng offset là idempotent - an toàn khi retry
+                retry=data.get('upload_phase') != 'finish',
+            )
+        except requests.exceptions.RequestException as e:
+            raise FacebookAPIError.from_exception(e)
+        if response.status_code != 200:
+            raise FacebookAPIError.from_response(response)
         return response.json()
     
+    def upload_video(self, page_id, fileobj, file_size, data=None, upload_session=None,
+                     on_progress=None, chunk_size=VIDEO_CHUNK_SIZE):
+        """
+        Upload video lên page bằng resumable upload (start / transfer / finish).
+        
+        File được đọc từng chunk (tối đa chunk_size byte) nên không phải
+        nạp cả video vào bộ nhớ. Truyền lại upload_session đã lưu để tiếp
+        tục từ offset cuối cùng sau khi lỗi.
+        
+        Args:
+            page_id (str): Facebook page ID
+            fileobj: File mở ở chế độ binary, seek được
+            file_size (int): Kích thước file (byte)
+            data (dict): Field gửi ở phase finish (description, title, ...)
+            upload_session (dict): {'upload_session_id', 'video_id', 'start_offset'}
+                của lần upload trước (None = bắt đầu mới)
+            on_progress (callable): on_progress(upload_session) sau mỗi chunk,
+                để caller lưu lại trạng thái
+            chunk_size (int): Số byte tối đa mỗi chunk
+        
+        Returns:
+            dict: {'id': video_id, 'success': True}
+        
+        Raises:
+            FacebookAPIError: is_transient=True nếu có thể resume sau
+        """
+        session = dict(upload_session or {})
+        
+        if not session.get('upload_session_id'):
+            result = self._post_video_phase(page_id, {
+                'upload_phase': 'start',
+                'file_size': file_size,
+            })
+            session = {
+                'upload_session_id': result['upload_session_id'],
+                'video_id': result.get('video_id'),
+                'start_offset': int(result.get('start_offset', 0)),
+                'end_offset': int(result.get('end_offset', file_size)),
+            }
+            if on_progress:
+                on_progress(session)
+        
+        while session['start_offset'] < file_size:
+            start = session['start_offset']
+            end = session.get('end_offset') or file_size
+            fileobj.seek(start)
+            chunk = fileobj.read(max(1, min(end - start, chunk_size)))
+            
+            result = self._post_video_phase(
+                page_id,
+                {
+                    'upload_phase': 'transfer',
+                    'upload_session_id': session['upload_session_id'],
+                    'start_offset': start,
+                },
+                files={'video_file_chunk': ('chunk', chunk)},
+            )
+            del chunk
+            session['start_offset'] = int(result['start_offset'])
+            session['end_offset'] = int(result['end_offset'])
+            if on_progress:
+                on_progress(session)
+        
+        finish_data = dict(data or {})
+        finish_data.update({
+            'upload_phase': 'finish',
+            'upload_session_id': session['upload_session_id'],
+        })
+        result = self._post_video_phase(page_id, finish_data)
+        if not result.get('success'):
+            raise FacebookAPIError(f'Video upload not finished: {result}')
+        return {'id': session.get('video_id'), 'success': True}
+    
     def publish_post(self, page_id, message, **kwargs):
         """Publish a post to page"""
-        url = f"{self.BASE_URL}/{page_id}/feed"
-        data = {
-            'access_token': self.access_token,
-            'message': message,
-        }
+        data = {'message': message}
         data.update(kwargs)
-        response = requests.post(url, data=data)
+        response = self.post(f"{page_id}/feed", data=data)
         return response.json()
     
     # -------------------------------------------------------------------------
     # ✅ MESSENGER SEND API - FIXED
     # -------------------------------------------------------------------------
     
-    def send_message(self, recipient_id, message_text):
+    def send_message(self, recipient_id, message_text, quick_replies=None):
         """
         ✅ FIX: Send text message via Messenger Send API.
         
         Args:
             recipient_id (str): PSID of recipient
             message_text (str): Text message to send
+            quick_replies (list): Optional quick reply buttons
         
         Returns:
             dict: API response with message_id
@@ -69,18 +756,18 @@ class FacebookAPI:
             >>> api.send_message('user456', 'Hello!')
             {'recipient_id': 'user456', 'message_id': 'mid.xxx'}
         """
-        url = f"{self.BASE_URL}/me/messages"
+        message = {'text': message_text}
+        if quick_replies:
+            message['quick_replies'] = quick_replies
         
         payload = {
             'recipient': {'id': recipient_id},
-            'message': {'text': message_text},
+            'message': message,
             'messaging_type': 'RESPONSE'
         }
         
-        params = {'access_token': self.access_token}
-        
         try:
-            response = requests.post(url, json=payload, params=params, timeout=30)
+            response = self.post('me/messages', json=payload)
             response.raise_for_status()
             
             # ✅ FIX: Parse JSON an toàn
@@ -104,36 +791,33 @@ class FacebookAPI:
             
         except requests.exceptions.HTTPError as e:
             # ✅ FIX: Handle HTTP errors
-            try:
-                error_data = e.response.json()
-                
-                # ✅ Check error_data type
-                if isinstance(error_data, dict):
-                    error_msg = error_data.get('error', {}).get('message', str(e))
-                else:
-                    error_msg = str(e)
-            except:
-                error_msg = str(e)
-            
-            _logger.error(f"❌ Facebook API Error: {error_msg}")
-            raise Exception(f"Facebook API Error: {error_msg}")
+            error = FacebookAPIError.from_response(e.response)
+            _logger.error(f"❌ Facebook API Error: {error}")
+            raise FacebookAPIError(
+                f"Facebook API Error: {error}",
+                code=error.code,
+                status_code=error.status_code,
+                is_transient=error.is_transient,
+            )
             
         except requests.exceptions.RequestException as e:
             _logger.error(f"❌ Request failed: {e}")
-            raise Exception(f"Failed to send message: {str(e)}")
+            raise FacebookAPIError(f"Failed to send message: {str(e)}", is_transient=True)
     
     # -------------------------------------------------------------------------
     # CONVERSATION METHODS
     # -------------------------------------------------------------------------
     
     def get_conversation_messages(self, conversation_id, limit=25):
-        """Get messages from a conversation"""
-        url = f"{self.BASE_URL}/{conversation_id}"
+        """
+        Get messages from a conversation (chỉ trang đầu).
+        
+        Dùng iter_conversation_messages() để lấy toàn bộ.
+        """
         params = {
-            'access_token': self.access_token,
             'fields': f'messages.limit({limit}){{id,created_time,from,to,message}}'
         }
-        response = requests.get(url, params=params)
+        response = self.get(conversation_id, params=params)
         return response.json()
     
     # -------------------------------------------------------------------------
@@ -162,14 +846,10 @@ class FacebookAPI:
                     ]
                 }
         """
-        url = f"{self.BASE_URL}/{leadgen_id}"
-        params = {
-            'access_token': self.access_token,
-            'fields': 'id,created_time,field_data'
-        }
+        params = {'fields': 'id,created_time,field_data'}
         
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = self.get(leadgen_id, params=params, timeout=10)
             response.raise_for_status()
             data = response.json()
             
@@ -180,6 +860,76 @@ class FacebookAPI:
             _logger.error(f'Failed to fetch leadgen {leadgen_id}: {e}')
             raise
     
+    def get_leadgen_batch(self, leadgen_ids, fields=LEADGEN_FIELDS):
+        """
+        Lấy dữ liệu nhiều lead qua Graph batch (50 lead / call).
+        
+        Args:
+            leadgen_ids (list): Leadgen ID từ webhook
+            fields (str): Field cần đọc
+        
+        Returns:
+            tuple: (leads, errors)
+                leads: {leadgen_id: lead data}
+                errors: {leadgen_id: FacebookAPIError} - is_transient=True
+                    nếu nên thử lại sau
+        """
+        results = self.execute_batch({
+            leadgen_id: self.make_batch_request(leadgen_id, {'fields': fields})
+            for leadgen_id in dict.fromkeys(leadgen_ids)
+        })
+        
+        leads, errors = {}, {}
+        for leadgen_id, item in results.items():
+            code, body = item['code'], item['body']
+            if code == 200 and isinstance(body, dict):
+                leads[leadgen_id] = body
+                continue
+            error = body.get('error', {}) if isinstance(body, dict) else {}
+            errors[leadgen_id] = FacebookAPIError(
+                error.get('message') or f'Leadgen {leadgen_id} failed (HTTP {code})',
+                code=error.get('code'),
+                status_code=code,
+                is_transient=self._is_retryable_batch_item(code, body),
+            )
+        return leads, errors
+    
+    def get_leadgen_field_map(self, page_id, form_id):
+        """
+        Mapping câu hỏi của một lead form, cache theo form trong process.
+        
+        Lần đầu gặp form (hoặc hết TTL_LEADGEN_FORMS) thì đọc mọi form của
+        page một lần và cache mapping của từng form. Không đọc được form
+        → {} và không cache (caller dùng key chuẩn của Facebook).
+        
+        Returns:
+            dict: {question key: question type}, vd {'phone_number': 'PHONE'}
+        """
+        now = time.monotonic()
+        cached = _leadgen_field_maps.get(form_id)
+        if cached and cached[0] > now:
+            return cached[1]
+        
+        try:
+            forms = list(self.iter_leadgen_forms(page_id))
+        except (requests.exceptions.RequestException, FacebookAPIError) as e:
+            _logger.warning(f'Failed to fetch leadgen forms of page {page_id}: {e}')
+            return {}
+        
+        expires_at = now + TTL_LEADGEN_FORMS
+        field_maps = {
+            form.get('id'): {
+                question['key']: question.get('type')
+                for question in form.get('questions') or []
+                if question.get('key')
+            }
+            for form in forms
+        }
+        field_maps.setdefault(form_id, {})
+        for fid, field_map in field_maps.items():
+            _leadgen_field_maps[fid] = (expires_at, field_map)
+        return field_maps[form_id]
+    
     def get_leadgen_forms(self, page_id):
         """
         Lấy danh sách lead forms của page.
@@ -190,20 +940,10 @@ class FacebookAPI:
         Returns:
             list: List of lead forms
         """
-        url = f"{self.BASE_URL}/{page_id}/leadgen_forms"
-        params = {
-            'access_token': self.access_token,
-            'fields': 'id,name,status,questions'
-        }
-        
         try:
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            return data.get('data', [])
+            return list(self.iter_leadgen_forms(page_id))
             
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, FacebookAPIError) as e:
             _logger.error(f'Failed to fetch leadgen forms: {e}')
             return []
     
@@ -218,12 +958,8 @@ class FacebookAPI:
         Args:
             payload (str): Postback payload when button clicked
         """
-        url = f"{self.BASE_URL}/me/messenger_profile"
-        data = {
-            'access_token': self.access_token,
-            'get_started': {'payload': payload}
-        }
-        response = requests.post(url, json=data)
+        data = {'get_started': {'payload': payload}}
+        response = self.post('me/messenger_profile', json=data)
         return response.json()
     
     def set_greeting_text(self, greeting_text):
@@ -233,9 +969,7 @@ class FacebookAPI:
         Args:
             greeting_text (str): Greeting message
         """
-        url = f"{self.BASE_URL}/me/messenger_profile"
         data = {
-            'access_token': self.access_token,
             'greeting': [
                 {
                     'locale': 'default',
@@ -243,5 +977,5 @@ class FacebookAPI:
                 }
             ]
         }
-        response = requests.post(url, json=data)
+        response = self.post('me/messenger_profile', json=data)
         return response.json()
\ No newline at end of file
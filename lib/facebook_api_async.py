@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from .facebook_api import FacebookAPI
+from .rate_limiter import PRIORITY_HIGH, PRIORITY_LOW
+
+_logger = logging.getLogger(__name__)
+
+# Số request Graph chạy song song mặc định
+DEFAULT_CONCURRENCY = 8
+
+
+class AsyncFacebookAPI:
+    """
+    Biến thể asyncio của FacebookAPI, cùng bộ method.
+
+    Mỗi coroutine chạy method đồng bộ tương ứng trên thread pool, vẫn đi qua
+    connection pool dùng chung (get_session()), nên không cần thêm thư viện
+    HTTP async. Semaphore giới hạn số request đang bay cùng lúc.
+    """
+
+    def __init__(self, access_token, timeout=None, semaphore=None, executor=None,
+                 priority=PRIORITY_HIGH):
+        """
+        Args:
+            access_token (str): Page Access Token
+            timeout (float|tuple): Timeout mặc định cho mỗi request
+            semaphore (asyncio.Semaphore): Giới hạn concurrency dùng chung
+            executor (Executor): Thread pool chạy request đồng bộ
+            priority (int): Độ ưu tiên khi xếp hàng chờ quota
+        """
+        self.api = FacebookAPI(access_token, timeout=timeout, priority=priority)
+        self.semaphore = semaphore
+        self.executor = executor
+
+    async def _call(self, method, *args, **kwargs):
+        """Chạy FacebookAPI.<method> trên executor, tôn trọng semaphore"""
+        loop = asyncio.get_running_loop()
+        func = functools.partial(getattr(self.api, method), *args, **kwargs)
+
+        if self.semaphore is None:
+            return await loop.run_in_executor(self.executor, func)
+
+        async with self.semaphore:
+            return await loop.run_in_executor(self.executor, func)
+
+    # -------------------------------------------------------------------------
+    # TRANSPORT
+    # -------------------------------------------------------------------------
+
+    async def request(self, method, endpoint, params=None, **kwargs):
+        return await self._call('request', method, endpoint, params=params, **kwargs)
+
+    async def get(self, endpoint, params=None, **kwargs):
+        return await self._call('get', endpoint, params=params, **kwargs)
+
+    async def post(self, endpoint, params=None, **kwargs):
+        return await self._call('post', endpoint, params=params, **kwargs)
+
+    async def execute_batch(self, sub_requests, **kwargs):
+        return await self._call('execute_batch', sub_requests, **kwargs)
+
+    # -------------------------------------------------------------------------
+    # GRAPH METHODS
+    # -------------------------------------------------------------------------
+
+    async def get_page_info(self, page_id, fields=None, refresh=False):
+        return await self._call('get_page_info', page_id, fields=fields, refresh=refresh)
+
+    async def publish_post(self, page_id, message, **kwargs):
+        return await self._call('publish_post', page_id, message, **kwargs)
+
+    async def send_message(self, recipient_id, message_text, quick_replies=None):
+        return await self._call('send_message', recipient_id, message_text,
+                                quick_replies=quick_replies)
+
+    async def get_conversation_messages(self, conversation_id, limit=25):
+        return await self._call('get_conversation_messages', conversation_id, limit=limit)
+
+    async def get_leadgen_data(self, leadgen_id):
+        return await self._call('get_leadgen_data', leadgen_id)
+
+    async def get_leadgen_forms(self, page_id):
+        return await self._call('get_leadgen_forms', page_id)
+
+    async def set_get_started_button(self, payload='GET_STARTED'):
+        return await self._call('set_get_started_button', payload)
+
+    async def set_greeting_text(self, greeting_text):
+        return await self._call('set_greeting_text', greeting_text)
+
+
+async def gather_graph_calls(jobs, concurrency=DEFAULT_CONCURRENCY, timeout=None,
+                             priority=PRIORITY_LOW):
+    """
+    Chạy nhiều Graph call song song, tối đa `concurrency` request cùng lúc.
+
+    Args:
+        jobs (dict): key -> (access_token, method_name, *args)
+        concurrency (int): Số request song song tối đa
+        timeout (float|tuple): Timeout cho mỗi request
+        priority (int): Độ ưu tiên quota (mặc định low - dùng cho cron)
+
+    Returns:
+        dict: key -> kết quả của method, hoặc Exception nếu call đó lỗi
+    """
+    if not jobs:
+        return {}
+
+    concurrency = max(1, concurrency or DEFAULT_CONCURRENCY)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        keys = list(jobs)
+        coroutines = []
+        for key in keys:
+            access_token, method, *args = jobs[key]
+            client = AsyncFacebookAPI(access_token, timeout=timeout, semaphore=semaphore,
+                                      executor=executor, priority=priority)
+            coroutines.append(client._call(method, *args))
+
+        results = await asyncio.gather(*coroutines, return_exceptions=True)
+
+    return dict(zip(keys, results))
+
+
+def run_graph_calls(jobs, concurrency=DEFAULT_CONCURRENCY, timeout=None,
+                    priority=PRIORITY_LOW):
+    """
+    Facade đồng bộ cho gather_graph_calls() - dùng được từ code ORM.
+
+    Chỉ HTTP chạy song song; caller ghi kết quả về DB trên thread hiện tại
+    (cùng một transaction).
+
+    Example:
+        >>> results = run_graph_calls({
+        ...     account.id: (account.access_token, 'get_page_info', account.facebook_page_id)
+        ...     for account in accounts
+        ... })
+    """
+    results = asyncio.run(gather_graph_calls(jobs, concurrency=concurrency,
+                                             timeout=timeout, priority=priority))
+
+    for key, result in results.items():
+        if isinstance(result, Exception):
+            _logger.warning(f'Graph call for {key} failed: {result}')
+
+    return results
@@ -0,0 +1,443 @@
+# -*- coding: utf-8 -*-
+
+"""
+Graph API giả lập chạy local (không cần mạng) cho test và benchmark.
+
+Ví dụ:
+
+    from odoo.addons.module_social_facebook.lib.fake_graph_server import fake_graph_server
+
+    with fake_graph_server(latency=0.05, error_rate=0.1) as server:
+        # Mọi FacebookAPI tạo trong block này gọi tới server giả
+        FacebookAPI('token').send_message('psid', 'Xin chào')
+        assert server.count('POST', 'me/messages') == 1
+"""
+
+import os
+import copy
+import json
+import time
+import random
+import itertools
+import threading
+import logging
+from contextlib import contextmanager
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from . import facebook_api
+
+_logger = logging.getLogger(__name__)
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'fake_graph.json')
+
+
+def load_fixtures(path=FIXTURES_PATH):
+    """Đọc fixtures (pages, posts, comments, leadgen_forms, leads) từ file JSON"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class FakeGraphServer:
+    """
+    Server HTTP giả lập các endpoint Graph API module này sử dụng:
+
+        GET  /{page}                       page info
+        GET  /{post}                       post stats
+        POST /{page}/feed, /{page}/photos  đăng bài
+        POST /{page}/videos                resumable video upload (start/transfer/finish)
+        GET  /{page}/posts                 bài gần đây (dedupe khi publish)
+        GET  /{post}/comments              comments (cursor pagination)
+        POST /{comment}/comments           trả lời comment
+        GET  /{page}/leadgen_forms         lead forms
+        GET  /{leadgen_id}, /{form}/leads  leadgen
+        POST /me/messages                  Messenger Send API
+        POST /me/messenger_profile         Messenger profile
+        POST /                             batch
+
+    Hành vi cấu hình được khi đang chạy (configure()):
+        latency      giây hoặc (min, max) trước mỗi response
+        error_rate   tỉ lệ trả 500 (error code 2, is_transient)
+        throttle_rate  tỉ lệ trả lỗi throttling (code 613)
+        app_usage / page_usage  % usage trả trong X-App-Usage / X-Page-Usage
+    """
+
+    API_VERSION = facebook_api.FacebookAPI.API_VERSION
+
+    def __init__(self, fixtures=None, host='127.0.0.1', port=0, latency=0.0, error_rate=0.0,
+                 throttle_rate=0.0, app_usage=None, page_usage=None, seed=None):
+        self.fixtures = copy.deepcopy(fixtures if fixtures is not None else load_fixtures())
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.app_usage = app_usage
+        self.page_usage = page_usage
+        self.random = random.Random(seed)
+        self.requests = []
+        self.sent_messages = {}
+        self.video_sessions = {}
+        self.video_chunk_size = 1024 * 1024
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._message_received = threading.Condition(self._lock)
+        self._httpd = None
+        self._thread = None
+
+    # -------------------------------------------------------------------------
+    # LIFECYCLE
+    # -------------------------------------------------------------------------
+
+    @property
+    def base_url(self):
+        return f'http://{self.host}:{self.port}/{self.API_VERSION}'
+
+    def start(self):
+        server = self
+
+        class Handler(_FakeGraphHandler):
+            fake = server
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name='fake-graph-server', daemon=True
+        )
+        self._thread.start()
+        _logger.info(f'Fake Graph server listening on {self.base_url}')
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def configure(self, **kwargs):
+        """Đổi latency / error_rate / throttle_rate / usage khi đang chạy"""
+        with self._lock:
+            for key, value in kwargs.items():
+                if not hasattr(self, key):
+                    raise AttributeError(key)
+                setattr(self, key, value)
+
+    # -------------------------------------------------------------------------
+    # INSPECTION
+    # -------------------------------------------------------------------------
+
+    def count(self, method=None, path=None):
+        """Số request đã nhận, lọc theo method và path (không có version)"""
+        with self._lock:
+            return sum(
+                1 for req in self.requests
+                if (method is None or req['method'] == method)
+                and (path is None or req['path'] == path)
+            )
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.sent_messages.clear()
+
+    def message_count(self, recipient_id):
+        """Số tin Send API đã gửi tới recipient"""
+        with self._lock:
+            return len(self.sent_messages.get(recipient_id, []))
+
+    def wait_for_messages(self, recipient_id, count, timeout=10.0):
+        """
+        Chờ tới khi recipient nhận đủ `count` tin.
+
+        Returns:
+            float | None: time.monotonic() lúc nhận tin thứ `count`, None nếu timeout
+        """
+        deadline = time.monotonic() + timeout
+        with self._message_received:
+            while len(self.sent_messages.get(recipient_id, [])) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._message_received.wait(remaining)
+            return self.sent_messages[recipient_id][count - 1]
+
+    # -------------------------------------------------------------------------
+    # ROUTING
+    # -------------------------------------------------------------------------
+
+    def _next_id(self):
+        return f'{int(time.time())}{next(self._ids):06d}'
+
+    def _sleep(self):
+        latency = self.latency
+        if isinstance(latency, (tuple, list)):
+            latency = self.random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+
+    def _injected_error(self):
+        roll = self.random.random()
+        if roll < self.error_rate:
+            return 500, {'error': {'message': 'An unexpected error has occurred.',
+                                   'type': 'OAuthException', 'code': 2, 'is_transient': True}}
+        if roll < self.error_rate + self.throttle_rate:
+            return 400, {'error': {'message': 'Calls to this api have exceeded the rate limit.',
+                                   'type': 'OAuthException', 'code': 613}}
+        return None
+
+    def usage_headers(self):
+        headers = {}
+        if self.app_usage is not None:
+            headers['X-App-Usage'] = json.dumps({
+                'call_count': self.app_usage, 'total_time': self.app_usage,
+                'total_cputime': self.app_usage,
+            })
+        if self.page_usage is not None:
+            headers['X-Page-Usage'] = json.dumps({
+                'call_count': self.page_usage, 'total_time': self.page_usage,
+                'total_cputime': self.page_usage,
+            })
+        return headers
+
+    def handle(self, method, path, params, inject=True):
+        """
+        Xử lý một request (cũng dùng cho từng sub-request của batch).
+
+        Returns:
+            tuple: (status, body dict)
+        """
+        with self._lock:
+            self.requests.append({'method': method, 'path': path, 'params': params})
+
+        if inject:
+            error = self._injected_error()
+            if error:
+                return error
+
+        parts = [part for part in path.split('/') if part]
+        fixtures = self.fixtures
+
+        if method == 'POST' and not parts:
+            return self._handle_batch(params)
+
+        if parts == ['me', 'messages'] and method == 'POST':
+            message = params.get('json', {})
+            recipient_id = message.get('recipient', {}).get('id')
+            with self._message_received:
+                self.sent_messages.setdefault(recipient_id, []).append(time.monotonic())
+                self._message_received.notify_all()
+            return 200, {
+                'recipient_id': message.get('recipient', {}).get('id'),
+                'message_id': f'm_{self._next_id()}',
+            }
+
+        if parts == ['me', 'messenger_profile'] and method == 'POST':
+            return 200, {'result': 'success'}
+
+        if len(parts) == 1 and method == 'GET':
+            object_id = parts[0]
+            for collection in ('pages', 'posts', 'leads'):
+                if object_id in fixtures.get(collection, {}):
+                    return 200, fixtures[collection][object_id]
+            return 404, _not_found(object_id)
+
+        if len(parts) == 2:
+            object_id, edge = parts
+
+            if edge in ('feed', 'photos') and method == 'POST':
+                post_id = f'{object_id}_{self._next_id()}'
+                with self._lock:
+                    fixtures.setdefault('posts', {})[post_id] = {
+                        'id': post_id,
+                        'message': params.get('message', ''),
+                        'link': params.get('link'),
+                        'created_time': time.strftime('%Y-%m-%dT%H:%M:%S+0000', time.gmtime()),
+                        'likes': {'data': [], 'summary': {'total_count': 0}},
+                        'comments': {'data': [], 'summary': {'total_count': 0}},
+                        'shares': {'count': 0},
+                    }
+                if edge == 'photos':
+                    return 200, {'id': self._next_id(), 'post_id': post_id}
+                return 200, {'id': post_id}
+
+            if edge == 'videos' and method == 'POST':
+                return self._handle_video_upload(object_id, params)
+
+            if edge == 'posts' and method == 'GET':
+                posts = [post for key, post in fixtures.get('posts', {}).items()
+                         if key.startswith(f'{object_id}_')]
+                return 200, self._paginate(posts, params)
+
+            if edge == 'comments' and method == 'GET':
+                return 200, self._paginate(fixtures.get('comments', {}).get(object_id, []), params)
+
+            if edge == 'comments' and method == 'POST':
+                return 200, {'id': f'{object_id}_{self._next_id()}'}
+
+            if edge == 'leadgen_forms' and method == 'GET':
+                return 200, self._paginate(fixtures.get('leadgen_forms', {}).get(object_id, []), params)
+
+            if edge == 'leads' and method == 'GET':
+                leads = [lead for lead in fixtures.get('leads', {}).values()
+                         if lead.get('form_id') == object_id]
+                return 200, self._paginate(leads, params)
+
+        return 400, {'error': {'message': f'Unsupported path {method} /{path}',
+                               'type': 'GraphMethodException', 'code': 100}}
+
+    def _paginate(self, items, params):
+        """Cursor pagination kiểu Graph: cursor = vị trí (string)"""
+        limit = int(params.get('limit') or 25)
+        start = int(params.get('after') or 0)
+        page = items[start:start + limit]
+        result = {'data': page}
+        if page:
+            result['paging'] = {'cursors': {'before': str(start), 'after': str(start + len(page))}}
+            if start + len(page) < len(items):
+                result['paging']['next'] = f'{self.base_url}/?after={start + len(page)}'
+        return result
+
+    def _handle_video_upload(self, page_id, params):
+        phase = params.get('upload_phase')
+        if phase == 'start':
+            session_id = self._next_id()
+            file_size = int(params.get('file_size') or 0)
+            with self._lock:
+                self.video_sessions[session_id] = {
+                    'video_id': self._next_id(), 'file_size': file_size, 'received': 0,
+                }
+            return 200, {
+                'upload_session_id': session_id,
+                'video_id': self.video_sessions[session_id]['video_id'],
+                'start_offset': '0',
+                'end_offset': str(min(file_size, self.video_chunk_size)),
+            }
+
+        upload = self.video_sessions.get(params.get('upload_session_id'))
+        if upload is None:
+            return 400, {'error': {'message': 'Invalid upload session', 'code': 100, 'error_subcode': 1363019}}
+
+        if phase == 'transfer':
+            start = int(params.get('start_offset') or 0)
+            if start != upload['received']:
+                return 400, {'error': {'message': 'Invalid start offset', 'code': 6000, 'error_subcode': 1363037}}
+            upload['received'] += params.get('video_file_chunk_size', 0)
+            received = upload['received']
+            return 200, {
+                'start_offset': str(received),
+                'end_offset': str(min(upload['file_size'], received + self.video_chunk_size)),
+            }
+
+        if phase == 'finish':
+            return 200, {'success': upload['received'] >= upload['file_size']}
+
+        return 400, {'error': {'message': f'Invalid upload_phase {phase}', 'code': 100}}
+
+    def _handle_batch(self, params):
+        try:
+            sub_requests = json.loads(params.get('batch') or '[]')
+        except ValueError:
+            return 400, {'error': {'message': 'Invalid batch', 'code': 100}}
+
+        results = []
+        for sub_request in sub_requests:
+            split = urlsplit(sub_request.get('relative_url', ''))
+            sub_params = {k: v[0] for k, v in parse_qs(split.query).items()}
+            status, body = self.handle(sub_request.get('method', 'GET').upper(), split.path, sub_params)
+            results.append({'code': status, 'headers': [], 'body': json.dumps(body)})
+        return 200, results
+
+
+def _not_found(object_id):
+    return {'error': {
+        'message': f"Unsupported get request. Object with ID '{object_id}' does not exist",
+        'type': 'GraphMethodException', 'code': 100, 'error_subcode': 33,
+    }}
+
+
+def _parse_multipart(raw, content_type):
+    """Form field dạng text; field file chỉ giữ kích thước (<name>_size)"""
+    message = BytesParser(policy=default_policy).parsebytes(
+        f'Content-Type: {content_type}\r\n\r\n'.encode('latin-1') + raw
+    )
+    params = {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        payload = part.get_payload(decode=True) or b''
+        if part.get_filename():
+            params[f'{name}_size'] = len(payload)
+        else:
+            params[name] = payload.decode('utf-8')
+    return params
+
+
+class _FakeGraphHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    fake = None
+
+    def log_message(self, format, *args):
+        _logger.debug('fake graph: ' + format, *args)
+
+    def _params(self):
+        split = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(split.query).items()}
+
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        content_type = self.headers.get('Content-Type', '')
+        if raw and content_type.startswith('application/json'):
+            params['json'] = json.loads(raw.decode('utf-8'))
+        elif raw and content_type.startswith('application/x-www-form-urlencoded'):
+            params.update({k: v[0] for k, v in parse_qs(raw.decode('utf-8')).items()})
+        elif raw and content_type.startswith('multipart/form-data'):
+            params.update(_parse_multipart(raw, content_type))
+        return split.path, params
+
+    def _dispatch(self, method):
+        path, params = self._params()
+        prefix = f'/{self.fake.API_VERSION}'
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+
+        self.fake._sleep()
+        status, body = self.fake.handle(method, path.strip('/'), params)
+
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in self.fake.usage_headers().items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+
+@contextmanager
+def fake_graph_server(fixtures=None, **options):
+    """
+    Test helper: chạy FakeGraphServer và trỏ FacebookAPI tới nó trong block.
+
+    Args:
+        fixtures (dict): Ghi đè fixtures mặc định (fixtures/fake_graph.json)
+        **options: latency, error_rate, throttle_rate, app_usage, page_usage, seed
+
+    Yields:
+        FakeGraphServer
+    """
+    server = FakeGraphServer(fixtures=fixtures, **options).start()
+    previous = facebook_api.set_base_url(server.base_url)
+    try:
+        yield server
+    finally:
+        facebook_api.set_base_url(previous)
+        server.stop()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+from collections import OrderedDict
+
+from .rate_limiter import TokenBucket
+
+
+# Token bucket mặc định mỗi khách (page, PSID): event / giây, burst
+FLOOD_RATE = 1.0
+FLOOD_BURST = 5
+# Số (page, PSID) giữ bucket trong bộ nhớ mỗi process
+FLOOD_LRU_SIZE = 10000
+
+
+class FloodControl:
+    """
+    Chống spam tin nhắn theo (page, PSID) trong bộ nhớ của process, chạy
+    lúc nhận webhook (mỗi event chỉ tính token một lần). Bucket nạp token
+    theo timestamp của event (thời điểm khách gửi), không theo lúc xử lý,
+    nên backlog của queue không bị coi là flood. Event vượt bucket bị bỏ
+    và được đếm.
+
+    Bucket không chia sẻ giữa các process: caller chia giới hạn cho số
+    worker (xem social.messenger.bot._configure_flood_control()).
+    cooldown_until của social.message vẫn là chốt chặn bền vững.
+    """
+
+    def __init__(self, rate=FLOOD_RATE, burst=FLOOD_BURST, size=FLOOD_LRU_SIZE):
+        self.rate = rate
+        self.burst = burst
+        self.size = size
+        self.allowed = 0
+        self.dropped = 0
+        self._buckets = OrderedDict()
+        self._drops = {}
+        self._lock = threading.Lock()
+
+    def configure(self, rate=None, burst=None):
+        """Đổi giới hạn; bucket cũ được tạo lại với giới hạn mới"""
+        with self._lock:
+            if (rate, burst) == (self.rate, self.burst):
+                return
+            if rate is not None and rate > 0:
+                self.rate = float(rate)
+            if burst is not None and burst > 0:
+                self.burst = float(burst)
+            for bucket in self._buckets.values():
+                if (bucket.base_rate, bucket.capacity) != (self.rate, self.burst):
+                    bucket.base_rate = bucket.rate = self.rate
+                    bucket.capacity = self.burst
+                    bucket.tokens = min(bucket.tokens, self.burst)
+
+    def allow(self, key, at=None):
+        """
+        Lấy một token của khách `key`.
+
+        Args:
+            at (float): Thời điểm của event (epoch giây), mặc định là hiện tại
+
+        Returns:
+            bool: False nếu khách đang gửi quá giới hạn (event bị bỏ)
+        """
+        at = time.time() if at is None else at
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now=at)
+                while len(self._buckets) > self.size:
+                    evicted, _bucket = self._buckets.popitem(last=False)
+                    self._drops.pop(evicted, None)
+            else:
+                self._buckets.move_to_end(key)
+
+            if bucket.time_until(1, now=at):
+                self.dropped += 1
+                self._drops[key] = self._drops.get(key, 0) + 1
+                return False
+            bucket.consume(1, now=at)
+            self.allowed += 1
+            return True
+
+    def stats(self, top=10):
+        """Số event cho qua / bị bỏ và các khách bị bỏ nhiều nhất"""
+        with self._lock:
+            offenders = sorted(self._drops.items(), key=lambda item: item[1], reverse=True)[:top]
+            return {'allowed': self.allowed, 'dropped': self.dropped, 'top_dropped': offenders}
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+            self._drops.clear()
+            self.allowed = self.dropped = 0
+
+
+_flood_control = FloodControl()
+
+
+def get_flood_control():
+    """Flood control dùng chung của process"""
+    return _flood_control
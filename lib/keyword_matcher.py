@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+import unicodedata
+from collections import deque
+
+
+def fold_text(text):
+    """
+    Chuẩn hóa text để so khớp từ khóa: chữ thường, bỏ dấu tiếng Việt
+    (đ → d), gộp khoảng trắng. 'Đặt  Hàng' → 'dat hang'.
+    """
+    text = unicodedata.normalize('NFD', (text or '').lower())
+    text = ''.join(ch for ch in text if unicodedata.category(ch) != 'Mn')
+    return ' '.join(text.replace('đ', 'd').split())
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == '_'
+
+
+class KeywordMatcher:
+    """
+    Automaton Aho-Corasick cho nhiều từ khóa: một lượt duyệt message tìm
+    mọi từ khóa, không phụ thuộc số từ khóa / số rule.
+
+    Từ khóa và message đều qua fold_text(). Từ khóa chỉ khớp trọn từ
+    ('mua' khớp 'muốn mua áo' nhưng không khớp 'muahe').
+    """
+
+    def __init__(self, keywords):
+        """
+        Args:
+            keywords (iterable): (keyword, value) - value trả về khi khớp
+        """
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]     # node -> [(độ dài từ khóa, value)]
+        self.size = 0
+
+        for keyword, value in keywords:
+            folded = fold_text(keyword)
+            if not folded:
+                continue
+            node = 0
+            for ch in folded:
+                child = self._goto[node].get(ch)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto[node][ch] = child
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                node = child
+            self._output[node].append((len(folded), value))
+            self.size += 1
+
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def iter_matches(self, text):
+        """Các value có từ khóa khớp (trọn từ) trong text, theo vị trí kết thúc"""
+        text = fold_text(text)
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for end, ch in enumerate(text, 1):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, value in output[node]:
+                start = end - length
+                if start > 0 and _is_word_char(text[start]) and _is_word_char(text[start - 1]):
+                    continue
+                if end < len(text) and _is_word_char(text[end - 1]) and _is_word_char(text[end]):
+                    continue
+                yield value
+
+    def find_best(self, text):
+        """
+        Value nhỏ nhất trong các từ khóa khớp (value = thứ hạng ưu tiên).
+
+        Returns:
+            None nếu không có từ khóa nào khớp
+        """
+        return min(self.iter_matches(text), default=None)
@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+
+import json
+import time
+import hashlib
+import threading
+import logging
+
+import requests
+
+_logger = logging.getLogger(__name__)
+
+
+# -------------------------------------------------------------------------
+# CONFIG
+# -------------------------------------------------------------------------
+
+# Độ ưu tiên: số nhỏ = ưu tiên cao
+PRIORITY_HIGH = 0      # Messenger replies, thao tác của user
+PRIORITY_LOW = 10      # Cron đồng bộ stats / comments / insights
+
+# Token bucket mặc định: (request / giây, dung lượng burst)
+APP_RATE = (50.0, 100)
+PAGE_RATE = (10.0, 20)
+
+# Thời gian chờ quota tối đa (giây) trước khi báo RateLimitError
+MAX_WAIT = {
+    PRIORITY_HIGH: 5.0,
+    PRIORITY_LOW: 60.0,
+}
+
+# Low priority chỉ được dùng token khi bucket còn trên mức dự trữ này
+LOW_PRIORITY_RESERVE = 0.2
+
+# Usage (%) bắt đầu giảm tốc / dừng hẳn
+SLOWDOWN_USAGE = 60
+BLOCK_USAGE = 95
+MIN_RATE_FACTOR = 0.05
+
+# Error code Graph báo throttling: 4 = app, 17 = user, 32 = page, 613 = chung
+THROTTLE_ERROR_CODES = {4, 17, 32, 613}
+DEFAULT_BLOCK_SECONDS = 60
+
+# Chu kỳ đồng bộ state với store dùng chung giữa các worker
+SYNC_INTERVAL = 2.0
+# Chỉ ghi xuống store khi usage thay đổi ít nhất bấy nhiêu điểm %
+SAVE_USAGE_DELTA = 5
+
+
+class RateLimitError(requests.exceptions.RequestException):
+    """Không lấy được quota Graph API trong thời gian chờ cho phép"""
+
+
+def page_key(access_token):
+    """Key của bucket theo page (mỗi Page Access Token ứng với một page)"""
+    digest = hashlib.sha1((access_token or '').encode()).hexdigest()[:12]
+    return f'page:{digest}'
+
+
+def parse_usage_headers(headers):
+    """
+    Đọc % usage từ header của Graph API.
+
+    Headers:
+        X-App-Usage: {"call_count": 28, "total_time": 25, "total_cputime": 25}
+        X-Page-Usage: {"call_count": 10, ...}
+        X-Business-Use-Case-Usage: {"<id>": [{"call_count": 5,
+            "estimated_time_to_regain_access": 0, ...}]}
+
+    Returns:
+        tuple: (app_usage, page_usage, regain_seconds) - None nếu không có
+    """
+    def _max_usage(value):
+        return max(
+            (value.get(k) or 0 for k in ('call_count', 'total_time', 'total_cputime')),
+            default=0,
+        )
+
+    def _load(name):
+        raw = headers.get(name)
+        if not raw:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    app_usage = page_usage = regain = None
+
+    app = _load('X-App-Usage')
+    if isinstance(app, dict):
+        app_usage = _max_usage(app)
+
+    page = _load('X-Page-Usage')
+    if isinstance(page, dict):
+        page_usage = _max_usage(page)
+
+    buc = _load('X-Business-Use-Case-Usage')
+    if isinstance(buc, dict):
+        for entries in buc.values():
+            for entry in entries or []:
+                page_usage = max(page_usage or 0, _max_usage(entry))
+                minutes = entry.get('estimated_time_to_regain_access') or 0
+                if minutes:
+                    regain = max(regain or 0, minutes * 60)
+
+    return app_usage, page_usage, regain
+
+
+class TokenBucket:
+    """Token bucket đơn giản, rate có thể điều chỉnh khi đang chạy"""
+
+    def __init__(self, rate, capacity, now=None):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic() if now is None else now
+
+    def _refill(self, now=None):
+        # `now` cho phép dùng đồng hồ khác (vd. timestamp của event); thời
+        # điểm lùi về trước không nạp thêm token
+        now = time.monotonic() if now is None else now
+        if now > self.updated_at:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+    def time_until(self, cost, reserve=0.0, now=None):
+        """Số giây cần chờ để có `cost` token (trên mức dự trữ `reserve`)"""
+        self._refill(now)
+        needed = cost + reserve * self.capacity - self.tokens
+        return 0.0 if needed <= 0 else needed / self.rate
+
+    def consume(self, cost, now=None):
+        self._refill(now)
+        self.tokens -= cost
+
+
+class GraphRateLimiter:
+    """
+    Rate limiter thích ứng cho Graph API, một bucket cho app và một cho mỗi page.
+
+    - Rate của bucket giảm dần khi header usage vượt SLOWDOWN_USAGE và dừng
+      hẳn khi vượt BLOCK_USAGE hoặc Facebook trả lỗi throttling (4/17/32/613).
+    - Request low priority xếp sau high priority đang chờ và không được dùng
+      phần token dự trữ.
+    - Khi có `store` (xem set_store()), token được lấy trực tiếp trên store
+      nên mọi worker dùng chung một ngân sách; usage / thời điểm hết block
+      được đồng bộ tối đa mỗi SYNC_INTERVAL giây. Bucket trong process chỉ
+      dùng khi không có store hoặc store lỗi.
+    - Không gọi store khi đang giữ self._cond.
+    """
+
+    APP_KEY = 'app'
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._buckets = {}
+        self._usage = {}
+        self._blocked_until = {}
+        self._saved_usage = {}
+        self._waiting = {}
+        self._store = None
+        self._synced_at = 0.0
+
+    def set_store(self, store):
+        """
+        Gắn store dùng chung giữa các worker.
+
+        Store cần 3 method:
+            load() -> {key: (usage, blocked_until_epoch)}
+            save(key, usage, blocked_until_epoch)
+            take(buckets, cost) -> số giây cần chờ (0 = đã trừ token)
+                với buckets = {key: (rate, capacity, tokens cần có)}
+        """
+        with self._cond:
+            self._store = store
+            self._synced_at = 0.0
+
+    # -------------------------------------------------------------------------
+    # INTERNALS (gọi khi đang giữ self._cond)
+    # -------------------------------------------------------------------------
+
+    def _bucket(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate, capacity = APP_RATE if key == self.APP_KEY else PAGE_RATE
+            bucket = self._buckets[key] = TokenBucket(rate, capacity)
+            self._apply_usage(key)
+        return bucket
+
+    def _apply_usage(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return
+        usage = self._usage.get(key) or 0
+        if usage <= SLOWDOWN_USAGE:
+            factor = 1.0
+        else:
+            factor = max(MIN_RATE_FACTOR, (100 - usage) / (100 - SLOWDOWN_USAGE))
+        bucket.rate = bucket.base_rate * factor
+
+    def _pending_save(self, key, force=False):
+        """(key, usage, blocked_until) cần ghi xuống store, None nếu không cần"""
+        if self._store is None:
+            return None
+        usage = self._usage.get(key) or 0
+        if not force and abs(usage - self._saved_usage.get(key, 0)) < SAVE_USAGE_DELTA:
+            return None
+        self._saved_usage[key] = usage
+        return key, usage, self._blocked_until.get(key)
+
+    def _block(self, key, seconds):
+        self._blocked_until[key] = max(self._blocked_until.get(key, 0), time.time() + seconds)
+        return self._pending_save(key, force=True)
+
+    def _has_priority_waiters(self, priority):
+        return any(count for prio, count in self._waiting.items() if prio < priority)
+
+    # -------------------------------------------------------------------------
+    # STORE I/O (gọi khi KHÔNG giữ self._cond)
+    # -------------------------------------------------------------------------
+
+    def _sync(self):
+        with self._cond:
+            store = self._store
+            now = time.monotonic()
+            if store is None or now - self._synced_at < SYNC_INTERVAL:
+                return
+            self._synced_at = now
+        try:
+            shared = store.load()
+        except Exception as e:
+            _logger.warning(f'Rate limiter store load failed: {e}')
+            return
+        with self._cond:
+            for key, (usage, blocked_until) in shared.items():
+                self._usage[key] = usage
+                self._saved_usage[key] = usage
+                if blocked_until:
+                    self._blocked_until[key] = max(self._blocked_until.get(key, 0), blocked_until)
+                self._apply_usage(key)
+            self._cond.notify_all()
+
+    def _save(self, saves):
+        store = self._store
+        for item in saves:
+            if item is None or store is None:
+                continue
+            try:
+                store.save(*item)
+            except Exception as e:
+                _logger.warning(f'Rate limiter store save failed: {e}')
+
+    def _take_shared(self, store, buckets, cost):
+        """Lấy token trên store; None nếu store lỗi (dùng bucket trong process)"""
+        try:
+            return store.take(buckets, cost)
+        except Exception as e:
+            _logger.warning(f'Rate limiter store take failed: {e}')
+            return None
+
+    # -------------------------------------------------------------------------
+    # PUBLIC API
+    # -------------------------------------------------------------------------
+
+    def acquire(self, keys, priority=PRIORITY_HIGH, cost=1, max_wait=None):
+        """
+        Chờ tới khi mọi bucket trong `keys` có đủ `cost` token rồi trừ token.
+
+        Raises:
+            RateLimitError: nếu phải chờ lâu hơn max_wait
+        """
+        if max_wait is None:
+            max_wait = MAX_WAIT.get(priority, MAX_WAIT[PRIORITY_LOW])
+        keys = [self.APP_KEY] + [key for key in keys if key != self.APP_KEY]
+        reserve = LOW_PRIORITY_RESERVE if priority > PRIORITY_HIGH else 0.0
+        deadline = time.monotonic() + max_wait
+
+        with self._cond:
+            self._waiting[priority] = self._waiting.get(priority, 0) + 1
+        try:
+            while True:
+                self._sync()
+
+                with self._cond:
+                    store = self._store
+                    wait = max(self._blocked_until.get(key, 0) - time.time() for key in keys)
+                    if wait <= 0 and self._has_priority_waiters(priority):
+                        wait = 0.05
+                    if wait <= 0:
+                        buckets = {key: self._bucket(key) for key in keys}
+                        shared = {
+                            key: (bucket.rate, bucket.capacity, cost + reserve * bucket.capacity)
+                            for key, bucket in buckets.items()
+                        }
+
+                if wait <= 0 and store is not None:
+                    wait = self._take_shared(store, shared, cost)
+                    if wait is not None and wait <= 0:
+                        return
+
+                with self._cond:
+                    if wait is None or (wait <= 0 and store is None):
+                        wait = max(bucket.time_until(cost, reserve) for bucket in buckets.values())
+                        if wait <= 0:
+                            for bucket in buckets.values():
+                                bucket.consume(cost)
+                            return
+
+                    if time.monotonic() + wait > deadline:
+                        raise RateLimitError(
+                            f'Graph API rate limit: need to wait {wait:.1f}s for {", ".join(keys)}'
+                        )
+                    self._cond.wait(wait)
+        finally:
+            with self._cond:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+    def update_from_response(self, keys, response):
+        """Cập nhật usage từ header (và lỗi throttling) của một response"""
+        app_usage, page_usage, regain = parse_usage_headers(response.headers)
+
+        error_code = None
+        if response.status_code >= 400:
+            try:
+                error_code = response.json().get('error', {}).get('code')
+            except (ValueError, AttributeError):
+                error_code = None
+
+        saves = []
+        with self._cond:
+            updates = []
+            if app_usage is not None:
+                updates.append((self.APP_KEY, app_usage))
+            if page_usage is not None:
+                updates.extend((key, page_usage) for key in keys if key != self.APP_KEY)
+
+            for key, usage in updates:
+                self._usage[key] = usage
+                self._apply_usage(key)
+                if usage >= BLOCK_USAGE:
+                    saves.append(self._block(key, regain or DEFAULT_BLOCK_SECONDS))
+                else:
+                    saves.append(self._pending_save(key))
+
+            if error_code in THROTTLE_ERROR_CODES:
+                if error_code == 4:
+                    blocked = [self.APP_KEY]
+                elif error_code == 32:
+                    blocked = [key for key in keys if key != self.APP_KEY]
+                else:
+                    blocked = [self.APP_KEY] + [key for key in keys if key != self.APP_KEY]
+                _logger.warning(f'Graph API throttled (code {error_code}), backing off {", ".join(blocked)}')
+                for key in blocked:
+                    saves.append(self._block(key, regain or DEFAULT_BLOCK_SECONDS))
+
+            self._cond.notify_all()
+
+        self._save(saves)
+
+
+_limiter = GraphRateLimiter()
+
+
+def get_rate_limiter():
+    """Rate limiter dùng chung của process"""
+    return _limiter
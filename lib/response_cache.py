@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+
+import json
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+
+_logger = logging.getLogger(__name__)
+
+
+# Số response giữ trong LRU của mỗi process
+LRU_SIZE = 256
+
+# TTL (giây) theo loại endpoint
+TTL_PAGE_INFO = 300
+TTL_LEADGEN_FORMS = 3600
+
+# Single-flight giữa các worker: worker tải key giữ lease (không giữ lock /
+# connection DB trong lúc gọi Graph). Lease dài hơn read timeout của Graph.
+LEASE_SECONDS = 35
+# Worker khác chờ entry mới tối đa bấy nhiêu giây rồi tự gọi Graph
+LEASE_WAIT = 10.0
+LEASE_POLL_INTERVAL = 0.2
+
+
+class CachedResponse:
+    """Response đọc từ cache, cùng interface tối thiểu với requests.Response"""
+
+    from_cache = True
+
+    def __init__(self, status_code, text, headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        pass
+
+
+class CacheEntry:
+
+    __slots__ = ('text', 'etag', 'expires_at')
+
+    def __init__(self, text, etag, expires_at):
+        self.text = text
+        self.etag = etag
+        self.expires_at = expires_at
+
+    @property
+    def is_fresh(self):
+        return self.expires_at > time.time()
+
+    def to_response(self):
+        headers = {'ETag': self.etag} if self.etag else {}
+        return CachedResponse(200, self.text, headers)
+
+
+def make_cache_key(scope, endpoint, params):
+    """Key = scope (page/token) + endpoint + params (bỏ access_token)"""
+    params = {k: v for k, v in (params or {}).items() if k != 'access_token'}
+    raw = f"{scope}|{endpoint.lstrip('/')}|{json.dumps(params, sort_keys=True, default=str)}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class GraphResponseCache:
+    """
+    Cache read-through cho Graph GET, 2 tầng:
+
+    - LRU trong process (LRU_SIZE entry)
+    - Store dùng chung giữa các worker (xem set_store()), vd bảng DB
+
+    Entry hết hạn được revalidate bằng If-None-Match nếu có ETag (304 →
+    gia hạn, không tải lại body). Các request cùng key được gộp
+    (single-flight): trong process bằng lock theo key, giữa các worker
+    bằng lease của store (xem fetch()).
+    """
+
+    def __init__(self, size=LRU_SIZE):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._store = None
+
+    def set_store(self, store):
+        """
+        Gắn tầng cache dùng chung.
+
+        Store cần các method:
+            load(key) -> (text, etag, expires_at_epoch) | None
+            save(key, text, etag, expires_at_epoch)
+            acquire_lease(key, seconds) -> bool (True = worker này tải key)
+            release_lease(key)
+        """
+        self._store = store
+
+    # -------------------------------------------------------------------------
+    # TẦNG LRU
+    # -------------------------------------------------------------------------
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _set_local(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """Xóa một key (hoặc toàn bộ) khỏi LRU của process"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    # -------------------------------------------------------------------------
+    # TẦNG DÙNG CHUNG
+    # -------------------------------------------------------------------------
+
+    def _get_shared(self, key):
+        if self._store is None:
+            return None
+        try:
+            row = self._store.load(key)
+        except Exception as e:
+            _logger.warning(f'Graph cache load failed: {e}')
+            return None
+        if not row:
+            return None
+        entry = CacheEntry(*row)
+        self._set_local(key, entry)
+        return entry
+
+    def _set_shared(self, key, entry):
+        if self._store is None:
+            return
+        try:
+            self._store.save(key, entry.text, entry.etag, entry.expires_at)
+        except Exception as e:
+            _logger.warning(f'Graph cache save failed: {e}')
+
+    def _lookup(self, key):
+        entry = self._get_local(key)
+        if entry is None or not entry.is_fresh:
+            entry = self._get_shared(key) or entry
+        return entry
+
+    @contextmanager
+    def _local_flight(self, key):
+        """Lock theo key trong process; lock bị xóa khi không còn thread dùng"""
+        with self._lock:
+            item = self._key_locks.get(key)
+            if item is None:
+                item = self._key_locks[key] = [threading.Lock(), 0]
+            item[1] += 1
+        try:
+            with item[0]:
+                yield
+        finally:
+            with self._lock:
+                item[1] -= 1
+                if not item[1]:
+                    self._key_locks.pop(key, None)
+
+    def _acquire_lease(self, key):
+        """True nếu worker này được tải key (không có store / store lỗi → True)"""
+        if self._store is None:
+            return True
+        try:
+            return self._store.acquire_lease(key, LEASE_SECONDS)
+        except Exception as e:
+            _logger.warning(f'Graph cache lease failed ({e}), fetching directly')
+            return True
+
+    def _release_lease(self, key):
+        if self._store is None:
+            return
+        try:
+            self._store.release_lease(key)
+        except Exception as e:
+            _logger.warning(f'Graph cache lease release failed: {e}')
+
+    def _wait_for_entry(self, key):
+        """Chờ worker giữ lease lưu entry mới (tối đa LEASE_WAIT giây)"""
+        deadline = time.monotonic() + LEASE_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(LEASE_POLL_INTERVAL)
+            entry = self._get_shared(key)
+            if entry is not None and entry.is_fresh:
+                return entry
+        return None
+
+    def _download(self, key, ttl, fetch_func, entry):
+        """Gọi Graph (revalidate bằng ETag nếu có) và lưu vào cả hai tầng"""
+        headers = {'If-None-Match': entry.etag} if entry is not None and entry.etag else {}
+        response = fetch_func(headers)
+
+        if response.status_code == 304 and entry is not None:
+            entry = CacheEntry(entry.text, entry.etag, time.time() + ttl)
+        elif response.status_code == 200:
+            entry = CacheEntry(response.text, response.headers.get('ETag'), time.time() + ttl)
+        else:
+            return response
+
+        self._set_local(key, entry)
+        self._set_shared(key, entry)
+        return entry.to_response() if response.status_code == 304 else response
+
+    # -------------------------------------------------------------------------
+    # PUBLIC API
+    # -------------------------------------------------------------------------
+
+    def fetch(self, key, ttl, fetch_func, refresh=False):
+        """
+        Trả response cho `key`, gọi fetch_func(headers) khi cache miss / hết hạn.
+
+        Chỉ một worker giữ lease và gọi Graph; worker khác chờ entry mới
+        (tối đa LEASE_WAIT giây) rồi tự gọi Graph nếu vẫn chưa có.
+
+        Args:
+            key (str): Cache key (xem make_cache_key())
+            ttl (int): Thời gian sống (giây) của response mới
+            fetch_func (callable): fetch_func(extra_headers) -> requests.Response
+            refresh (bool): Bỏ qua cache, luôn gọi Graph (kết quả vẫn được lưu)
+
+        Returns:
+            requests.Response | CachedResponse
+        """
+        if refresh:
+            return self._download(key, ttl, fetch_func, None)
+
+        entry = self._lookup(key)
+        if entry is not None and entry.is_fresh:
+            return entry.to_response()
+
+        with self._local_flight(key):
+            # Thread khác có thể vừa tải xong trong lúc chờ lock
+            entry = self._lookup(key)
+            if entry is not None and entry.is_fresh:
+                return entry.to_response()
+
+            if not self._acquire_lease(key):
+                fresh = self._wait_for_entry(key)
+                if fresh is not None:
+                    return fresh.to_response()
+                _logger.info('Graph cache lease wait timed out, fetching directly')
+                return self._download(key, ttl, fetch_func, entry)
+
+            try:
+                return self._download(key, ttl, fetch_func, entry)
+            finally:
+                self._release_lease(key)
+
+
+_cache = GraphResponseCache()
+
+
+def get_response_cache():
+    """Response cache dùng chung của process"""
+    return _cache
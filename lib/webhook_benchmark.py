@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark tải cho webhook Messenger (/social/facebook/webhook).
+
+Sinh delivery giống thật (text, quick reply, sticker, nhiều entry / delivery)
+cho N khách hàng ảo đi hết luồng chatbot (mua → tên → SĐT → địa chỉ → chọn
+sản phẩm → số lượng → xác nhận), phát lại với tốc độ mục tiêu tới một Odoo
+test, Graph API được thay bằng FakeGraphServer.
+
+Mỗi khách gửi bước tiếp theo khi đã nhận được trả lời của bot (Send API
+trên server giả), nên độ trễ đo được là end-to-end: POST webhook → queue
+→ chatbot → outbox → Send API.
+
+Chạy (Odoo test phải trỏ Graph về server giả của harness):
+
+    FACEBOOK_GRAPH_BASE_URL=http://127.0.0.1:8765/v18.0 odoo-bin -d bench ...
+
+    python -m odoo.addons.module_social_facebook.lib.webhook_benchmark \\
+        --url http://127.0.0.1:8069/social/facebook/webhook \\
+        --page-id <facebook_page_id> --product-id <social.messenger.product id> \\
+        --customers 200 --rate 50 --batch 5 --graph-port 8765 --dsn dbname=bench
+
+--dsn (tùy chọn) đọc pg_stat_statements để báo số SQL query / event.
+"""
+
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .fake_graph_server import FakeGraphServer
+
+_logger = logging.getLogger(__name__)
+
+
+STICKER_RATE = 0.1
+REPLY_TIMEOUT = 30.0
+
+
+def percentile(values, pct):
+    """Percentile (nearest-rank) của danh sách giá trị"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class VirtualCustomer:
+    """Một khách hàng ảo: danh sách message đi hết luồng đặt hàng"""
+
+    def __init__(self, psid, page_id, product_id, sticker=False):
+        self.psid = psid
+        self.page_id = page_id
+        self.steps = []
+        if sticker:
+            self.steps.append(self._sticker())
+        self.steps += [
+            self._text('mua'),
+            self._text(f'Khach Hang {psid[-4:]}'),
+            self._text('09' + psid[-8:]),
+            self._text(f'{psid[-3:]} Nguyen Trai, Ha Noi'),
+            self._quick_reply(f'PRODUCT_{product_id}'),
+            self._text(str(random.randint(1, 5))),
+            self._text('Có'),
+        ]
+
+    def _mid(self):
+        return f'm_{uuid.uuid4().hex}'
+
+    def _text(self, text):
+        return {'mid': self._mid(), 'text': text}
+
+    def _quick_reply(self, payload):
+        return {'mid': self._mid(), 'text': payload, 'quick_reply': {'payload': payload}}
+
+    def _sticker(self):
+        return {'mid': self._mid(), 'attachments': [{
+            'type': 'image',
+            'payload': {'url': 'https://example.invalid/sticker.png', 'sticker_id': 369239263222822},
+        }]}
+
+    def event(self, step):
+        return {
+            'sender': {'id': self.psid},
+            'recipient': {'id': self.page_id},
+            'timestamp': int(time.time() * 1000),
+            'message': self.steps[step],
+        }
+
+
+def make_delivery(page_id, events):
+    """Delivery webhook: mỗi event một entry (giống Facebook khi gom nhiều event)"""
+    now = int(time.time() * 1000)
+    return {
+        'object': 'page',
+        'entry': [{'id': page_id, 'time': now, 'messaging': [event]} for event in events],
+    }
+
+
+class Pacer:
+    """Giới hạn số delivery / giây trên mọi thread"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class QueryCounter:
+    """Tổng số query của database từ pg_stat_statements (nếu có)"""
+
+    def __init__(self, dsn):
+        import psycopg2
+        self.conn = psycopg2.connect(dsn)
+        self.conn.autocommit = True
+
+    def total(self):
+        with self.conn.cursor() as cr:
+            cr.execute("""
+                SELECT coalesce(sum(calls), 0) FROM pg_stat_statements
+                WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+            """)
+            return int(cr.fetchone()[0])
+
+
+class WebhookBenchmark:
+
+    def __init__(self, url, page_id, product_id, customers=100, rate=20.0, batch=1,
+                 graph_server=None, query_counter=None, reply_timeout=REPLY_TIMEOUT):
+        self.url = url
+        self.page_id = str(page_id)
+        self.product_id = product_id
+        self.customers = customers
+        self.batch = max(1, batch)
+        self.pacer = Pacer(rate)
+        self.graph = graph_server
+        self.query_counter = query_counter
+        self.reply_timeout = reply_timeout
+        self.session = requests.Session()
+
+        self.ack_latencies = []
+        self.e2e_latencies = []
+        self.errors = {'http': 0, 'timeout': 0, 'exception': 0}
+        self.events_sent = 0
+        self._lock = threading.Lock()
+
+    def _make_customers(self):
+        base = int(time.time()) * 100000
+        return [
+            VirtualCustomer(str(base + i), self.page_id, self.product_id,
+                            sticker=random.random() < STICKER_RATE)
+            for i in range(self.customers)
+        ]
+
+    def _run_cohort(self, cohort):
+        """Nhóm khách đi cùng nhịp: mỗi bước là một delivery nhiều entry"""
+        for step in range(max(len(c.steps) for c in cohort)):
+            active = [c for c in cohort if step < len(c.steps)]
+            expected = {c.psid: self.graph.message_count(c.psid) + 1 for c in active}
+            payload = make_delivery(self.page_id, [c.event(step) for c in active])
+
+            self.pacer.wait()
+            started = time.monotonic()
+            try:
+                response = self.session.post(self.url, json=payload, timeout=30)
+                ack = time.monotonic() - started
+                ok = response.status_code == 200
+            except requests.exceptions.RequestException:
+                with self._lock:
+                    self.errors['exception'] += 1
+                return
+
+            with self._lock:
+                self.events_sent += len(active)
+                self.ack_latencies.append(ack)
+                if not ok:
+                    self.errors['http'] += 1
+            if not ok:
+                return
+
+            for customer in active:
+                received = self.graph.wait_for_messages(
+                    customer.psid, expected[customer.psid], timeout=self.reply_timeout
+                )
+                with self._lock:
+                    if received is None:
+                        self.errors['timeout'] += 1
+                    else:
+                        self.e2e_latencies.append(received - started)
+                if received is None:
+                    return
+
+    def run(self, concurrency=32):
+        customers = self._make_customers()
+        cohorts = [customers[i:i + self.batch] for i in range(0, len(customers), self.batch)]
+        queries_before = self.query_counter.total() if self.query_counter else None
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(self._run_cohort, cohorts))
+        elapsed = time.monotonic() - started
+
+        queries = None
+        if self.query_counter:
+            queries = self.query_counter.total() - queries_before
+        return self.report(elapsed, queries)
+
+    def report(self, elapsed, queries=None):
+        def stats(values):
+            return {
+                'p50_ms': round(percentile(values, 50) * 1000, 1),
+                'p95_ms': round(percentile(values, 95) * 1000, 1),
+                'p99_ms': round(percentile(values, 99) * 1000, 1),
+                'max_ms': round(max(values) * 1000, 1) if values else 0.0,
+            }
+
+        return {
+            'customers': self.customers,
+            'batch': self.batch,
+            'events': self.events_sent,
+            'deliveries': len(self.ack_latencies),
+            'elapsed_s': round(elapsed, 2),
+            'throughput_eps': round(len(self.e2e_latencies) / elapsed, 1) if elapsed else 0.0,
+            'ack_latency': stats(self.ack_latencies),
+            'e2e_latency': stats(self.e2e_latencies),
+            'sql_queries_per_event': round(queries / self.events_sent, 1)
+            if queries is not None and self.events_sent else None,
+            'errors': dict(self.errors),
+        }
+
+
+def format_report(report):
+    lines = [
+        f"customers={report['customers']} batch={report['batch']} "
+        f"events={report['events']} deliveries={report['deliveries']} "
+        f"elapsed={report['elapsed_s']}s",
+        f"throughput: {report['throughput_eps']} events/s",
+    ]
+    for name in ('ack_latency', 'e2e_latency'):
+        s = report[name]
+        lines.append(
+            f"{name}: p50={s['p50_ms']}ms p95={s['p95_ms']}ms p99={s['p99_ms']}ms max={s['max_ms']}ms"
+        )
+    if report['sql_queries_per_event'] is not None:
+        lines.append(f"sql queries / event: {report['sql_queries_per_event']}")
+    lines.append('errors: ' + ', '.join(f'{k}={v}' for k, v in report['errors'].items()))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Messenger webhook load benchmark')
+    parser.add_argument('--url', required=True, help='URL webhook của Odoo test')
+    parser.add_argument('--page-id', required=True, help='facebook_page_id của social.account test')
+    parser.add_argument('--product-id', required=True, type=int, help='id social.messenger.product')
+    parser.add_argument('--customers', type=int, default=100)
+    parser.add_argument('--rate', type=float, default=20.0, help='Delivery / giây (0 = không giới hạn)')
+    parser.add_argument('--batch', type=int, default=1, help='Số khách (entry) mỗi delivery')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--graph-port', type=int, default=8765)
+    parser.add_argument('--graph-latency', type=float, default=0.05)
+    parser.add_argument('--graph-error-rate', type=float, default=0.0)
+    parser.add_argument('--dsn', help='DSN PostgreSQL để đếm query (cần pg_stat_statements)')
+    parser.add_argument('--json', action='store_true', help='In report dạng JSON')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    graph = FakeGraphServer(port=args.graph_port, latency=args.graph_latency,
+                            error_rate=args.graph_error_rate).start()
+    print(f'Fake Graph API: {graph.base_url} (FACEBOOK_GRAPH_BASE_URL của Odoo test)')
+    try:
+        benchmark = WebhookBenchmark(
+            args.url, args.page_id, args.product_id,
+            customers=args.customers, rate=args.rate, batch=args.batch,
+            graph_server=graph,
+            query_counter=QueryCounter(args.dsn) if args.dsn else None,
+        )
+        report = benchmark.run(concurrency=args.concurrency)
+    finally:
+        graph.stop()
+
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+PSID_TAG_PREFIX = 'facebook_psid:'
+
+
+def _column_exists(cr, table, column):
+    cr.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = %s AND column_name = %s
+    """, (table, column))
+    return bool(cr.fetchone())
+
+
+def migrate(cr, version):
+    """
+    Backfill social_messenger_identity (page, PSID → partner) từ:
+    - tag res.partner.category `facebook_psid:<psid>` (page lấy từ
+      social_message / social_conversation của PSID đó)
+    - res_partner.facebook_user_id (nếu cột tồn tại)
+    và crm_lead.facebook_user_id từ tag crm.tag `facebook_psid:<psid>`.
+
+    Tag cũ được giữ nguyên; chatbot không tạo tag PSID mới nữa.
+    """
+    if not version:
+        return
+
+    # PSID → page từ session chatbot và conversation
+    cr.execute("""
+        CREATE TEMP TABLE tmp_psid_page ON COMMIT DROP AS
+        SELECT facebook_user_id AS psid, account_id FROM social_message
+        WHERE facebook_user_id IS NOT NULL AND account_id IS NOT NULL
+        UNION
+        SELECT facebook_psid, account_id FROM social_conversation
+        WHERE facebook_psid IS NOT NULL AND account_id IS NOT NULL
+    """)
+    cr.execute("CREATE INDEX ON tmp_psid_page (psid)")
+
+    cr.execute("""
+        INSERT INTO social_messenger_identity
+            (account_id, psid, partner_id, create_uid, create_date, write_uid, write_date)
+        SELECT DISTINCT ON (p.account_id, p.psid)
+               p.account_id, p.psid, rel.partner_id,
+               1, now() at time zone 'UTC', 1, now() at time zone 'UTC'
+        FROM res_partner_category tag
+        JOIN res_partner_res_partner_category_rel rel ON rel.category_id = tag.id
+        JOIN res_partner partner ON partner.id = rel.partner_id AND partner.active
+        JOIN tmp_psid_page p ON p.psid = substr(tag.name->>'en_US', %(offset)s)
+        WHERE tag.name->>'en_US' LIKE %(pattern)s
+        ORDER BY p.account_id, p.psid, rel.partner_id DESC
+        ON CONFLICT (account_id, psid) DO NOTHING
+    """, {'offset': len(PSID_TAG_PREFIX) + 1, 'pattern': 'facebook\\_psid:%'})
+    _logger.info(f'Backfilled {cr.rowcount} Messenger identities from partner PSID tags')
+
+    if _column_exists(cr, 'res_partner', 'facebook_user_id'):
+        cr.execute("""
+            INSERT INTO social_messenger_identity
+                (account_id, psid, partner_id, create_uid, create_date, write_uid, write_date)
+            SELECT DISTINCT ON (p.account_id, p.psid)
+                   p.account_id, p.psid, partner.id,
+                   1, now() at time zone 'UTC', 1, now() at time zone 'UTC'
+            FROM res_partner partner
+            JOIN tmp_psid_page p ON p.psid = partner.facebook_user_id
+            WHERE partner.facebook_user_id IS NOT NULL AND partner.active
+            ORDER BY p.account_id, p.psid, partner.id DESC
+            ON CONFLICT (account_id, psid) DO NOTHING
+        """)
+        _logger.info(f'Backfilled {cr.rowcount} Messenger identities from res.partner.facebook_user_id')
+
+    cr.execute("""
+        UPDATE crm_lead lead
+        SET facebook_user_id = substr(tag.name->>'en_US', %(offset)s)
+        FROM crm_tag_rel rel
+        JOIN crm_tag tag ON tag.id = rel.tag_id
+        WHERE rel.lead_id = lead.id
+          AND lead.facebook_user_id IS NULL
+          AND tag.name->>'en_US' LIKE %(pattern)s
+    """, {'offset': len(PSID_TAG_PREFIX) + 1, 'pattern': 'facebook\\_psid:%'})
+    _logger.info(f'Backfilled facebook_user_id on {cr.rowcount} CRM leads')
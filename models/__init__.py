@@ -1,15 +1,24 @@
 # -*- coding: utf-8 -*-
 
 from . import crm_lead
+from . import product_template
 from . import res_company
 from . import res_config_settings
 from . import social_account
 from . import social_analytics
+from . import social_cache_version
 from . import social_comment
 from . import social_conversation
+from . import social_graph_cache
+from . import social_graph_usage
 from . import social_message
+from . import social_messenger_bot
+from . import social_messenger_identity
 from . import social_messenger_order
+from . import social_messenger_outbox
 from . import social_messenger_product
 from . import social_post
 from . import social_post_template
+from . import social_webhook_dedupe
+from . import social_webhook_event
 from . import social_chatbot_automation
\ No newline at end of file
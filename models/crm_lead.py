@@ -1,6 +1,57 @@
 # -*- coding: utf-8 -*-
 
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
+import re
+import logging
+from collections import defaultdict
+
+from ..lib.facebook_api import FacebookAPI
+
+_logger = logging.getLogger(__name__)
+
+# Question type của lead form → field crm.lead
+LEADGEN_TYPE_FIELDS = {
+    'FULL_NAME': 'contact_name',
+    'EMAIL': 'email_from',
+    'PHONE': 'phone',
+    'COMPANY_NAME': 'partner_name',
+    'JOB_TITLE': 'function',
+    'STREET_ADDRESS': 'street',
+    'CITY': 'city',
+    'ZIP': 'zip',
+    'POST_CODE': 'zip',
+}
+# Question key chuẩn của Facebook → type (khi không đọc được câu hỏi của form)
+LEADGEN_DEFAULT_TYPES = {
+    'full_name': 'FULL_NAME',
+    'first_name': 'FIRST_NAME',
+    'last_name': 'LAST_NAME',
+    'email': 'EMAIL',
+    'phone_number': 'PHONE',
+    'company_name': 'COMPANY_NAME',
+    'job_title': 'JOB_TITLE',
+    'street_address': 'STREET_ADDRESS',
+    'city': 'CITY',
+    'zip_code': 'ZIP',
+    'post_code': 'POST_CODE',
+}
+
+
+def normalize_phone(phone):
+    """SĐT về dạng 0xxxxxxxxx (cùng quy tắc với chatbot); '' nếu trống"""
+    phone = re.sub(r'[\s\-\(\)\.]', '', phone or '')
+    if phone.startswith('+84'):
+        phone = '0' + phone[3:]
+    elif phone.startswith('84'):
+        phone = '0' + phone[2:]
+    return phone
+
+
+def phone_variants(phone):
+    """Các cách lưu phổ biến của một SĐT đã chuẩn hóa (0x, +84x, 84x)"""
+    if not phone.startswith('0'):
+        return [phone]
+    return [phone, '+84' + phone[1:], '84' + phone[1:]]
 
 
 class CrmLead(models.Model):
@@ -18,9 +69,20 @@ class CrmLead(models.Model):
     )
     facebook_user_id = fields.Char(
         string='Facebook User ID',
+        index='btree_not_null',
         help='PSID của khách hàng',
     )
     
+    # Lead Ads
+    facebook_leadgen_id = fields.Char(
+        string='Facebook Lead ID',
+        index='btree_not_null',
+        copy=False,
+        help='Leadgen ID của lead từ Facebook Lead Ads',
+    )
+    facebook_form_id = fields.Char(string='Facebook Lead Form ID', copy=False)
+    facebook_ad_id = fields.Char(string='Facebook Ad ID', copy=False)
+    
     # Statistics
     messenger_message_count = fields.Integer(
         string='Messenger Messages',
@@ -52,4 +114,171 @@ class CrmLead(models.Model):
             'res_id': self.facebook_conversation_id.id,
             'view_mode': 'form',
             'target': 'current',
-        }
\ No newline at end of file
+        }
+    
+    # -------------------------------------------------------------------------
+    # LEAD ADS (webhook leadgen)
+    # -------------------------------------------------------------------------
+    
+    @api.model
+    def _create_from_facebook_leadgen(self, values):
+        """
+        Tạo crm.lead từ các change `leadgen` của webhook.
+        
+        Dữ liệu lead đọc qua Graph batch (mỗi page một lượt), loại lead trùng
+        (leadgen id, SĐT hoặc email đã có) bằng một search rồi tạo tất cả
+        bằng một create().
+        
+        Args:
+            values (list): change['value'] ({'leadgen_id', 'page_id',
+                'form_id', 'ad_id', ...})
+        
+        Returns:
+            crm.lead: Lead đã tạo
+        
+        Raises:
+            FacebookAPIError: Graph lỗi tạm thời - caller xử lý lại cả lô
+        """
+        by_page = defaultdict(dict)
+        for value in values:
+            if value.get('leadgen_id') and value.get('page_id'):
+                by_page[str(value['page_id'])][str(value['leadgen_id'])] = value
+        
+        Account = self.env['social.account'].sudo()
+        user_id = self.env['ir.config_parameter'].sudo().get_param(
+            'module_social_facebook.lead_default_user_id'
+        )
+        vals_list = []
+        
+        for page_id, page_values in by_page.items():
+            resolved = Account._resolve_page_id(page_id)
+            if not resolved:
+                _logger.warning(f'Leadgen for unknown page {page_id} ignored ({len(page_values)} leads)')
+                continue
+            account_id, company_id, access_token = resolved
+            
+            api = FacebookAPI(access_token)
+            leads, errors = api.get_leadgen_batch(list(page_values))
+            for leadgen_id, error in errors.items():
+                if error.is_transient:
+                    raise error
+                _logger.error(f'Leadgen {leadgen_id} skipped: {error}')
+            
+            for leadgen_id, lead in leads.items():
+                value = page_values.get(leadgen_id, {})
+                form_id = str(lead.get('form_id') or value.get('form_id') or '')
+                field_map = api.get_leadgen_field_map(page_id, form_id) if form_id else {}
+                vals = self._prepare_facebook_leadgen_vals(lead, value, field_map)
+                vals['company_id'] = company_id
+                if user_id:
+                    vals['user_id'] = int(user_id)
+                vals_list.append(vals)
+        
+        vals_list = self._filter_duplicate_facebook_leads(vals_list)
+        if not vals_list:
+            return self.browse()
+        
+        leads = self.with_context(tracking_disable=True, mail_create_nolog=True).sudo().create(vals_list)
+        _logger.info(f'Created {len(leads)} CRM leads from Facebook Lead Ads')
+        return leads
+    
+    @api.model
+    def _prepare_facebook_leadgen_vals(self, lead, value, field_map):
+        """
+        Giá trị crm.lead từ dữ liệu một lead.
+        
+        Args:
+            lead (dict): Dữ liệu Graph ({'id', 'field_data', ...})
+            value (dict): change['value'] của webhook
+            field_map (dict): {question key: question type} của form
+        """
+        vals = {}
+        names = {}
+        extra = []
+        
+        for item in lead.get('field_data') or []:
+            key = item.get('name')
+            answer = ', '.join(str(v) for v in item.get('values') or [] if v not in (None, ''))
+            if not key or not answer:
+                continue
+            question_type = field_map.get(key) or LEADGEN_DEFAULT_TYPES.get(key)
+            if question_type in ('FIRST_NAME', 'LAST_NAME'):
+                names[question_type] = answer
+            elif question_type in LEADGEN_TYPE_FIELDS and LEADGEN_TYPE_FIELDS[question_type] not in vals:
+                vals[LEADGEN_TYPE_FIELDS[question_type]] = answer
+            else:
+                extra.append(f'{key}: {answer}')
+        
+        if 'contact_name' not in vals and names:
+            vals['contact_name'] = ' '.join(filter(None, [names.get('FIRST_NAME'), names.get('LAST_NAME')]))
+        if vals.get('phone'):
+            vals['phone'] = normalize_phone(vals['phone'])
+        if vals.get('email_from'):
+            vals['email_from'] = vals['email_from'].strip().lower()
+        
+        label = vals.get('contact_name') or vals.get('email_from') or vals.get('phone') or lead.get('id')
+        vals.update({
+            'name': f'FB Lead Ads - {label}',
+            'facebook_leadgen_id': lead.get('id') or value.get('leadgen_id'),
+            'facebook_form_id': lead.get('form_id') or value.get('form_id'),
+            'facebook_ad_id': lead.get('ad_id') or value.get('ad_id'),
+        })
+        if extra:
+            vals['description'] = tools.plaintext2html('\n'.join(extra))
+        return vals
+    
+    @api.model
+    def _filter_duplicate_facebook_leads(self, vals_list):
+        """
+        Bỏ lead trùng với lead đã có (cùng company hoặc lead không có
+        company) hoặc trùng nhau trong lô: theo leadgen id, SĐT đã chuẩn
+        hóa, email đã chuẩn hóa. Một search cho cả lô.
+        """
+        if not vals_list:
+            return []
+        
+        leadgen_ids, phones, emails = set(), set(), set()
+        for vals in vals_list:
+            leadgen_ids.add(vals['facebook_leadgen_id'])
+            if vals.get('phone'):
+                phones.update(phone_variants(vals['phone']))
+            email = tools.email_normalize(vals.get('email_from') or '')
+            if email:
+                emails.add(email)
+        
+        domain = [('facebook_leadgen_id', 'in', list(leadgen_ids))]
+        if phones:
+            domain = ['|', ('phone', 'in', list(phones))] + domain
+        if emails:
+            domain = ['|', ('email_normalized', 'in', list(emails))] + domain
+        existing = self.sudo().with_context(active_test=False).search_read(
+            domain, ['active', 'company_id', 'facebook_leadgen_id', 'phone', 'email_normalized'],
+        )
+        
+        seen = defaultdict(set)     # company_id (False = mọi company) -> keys
+        for lead in existing:
+            company_id = lead['company_id'] and lead['company_id'][0]
+            seen[company_id].add(('leadgen', lead['facebook_leadgen_id']))
+            # Lead đã lưu trữ (lost) chỉ chặn đúng leadgen id đó
+            if lead['active']:
+                if lead['phone']:
+                    seen[company_id].add(('phone', normalize_phone(lead['phone'])))
+                if lead['email_normalized']:
+                    seen[company_id].add(('email', lead['email_normalized']))
+        
+        result = []
+        for vals in vals_list:
+            keys = {('leadgen', vals['facebook_leadgen_id'])}
+            if vals.get('phone'):
+                keys.add(('phone', vals['phone']))
+            email = tools.email_normalize(vals.get('email_from') or '')
+            if email:
+                keys.add(('email', email))
+            
+            company_id = vals.get('company_id') or False
+            if keys & (seen[company_id] | seen[False]):
+                _logger.info(f"Duplicate Facebook lead {vals['facebook_leadgen_id']} skipped")
+                continue
+            seen[company_id] |= keys
+            result.append(vals)
+        return result
@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models
+
+from .social_messenger_product import CATALOG_CACHE
+
+# Field của sản phẩm có trong catalog Messenger đã render
+CATALOG_PRODUCT_FIELDS = {'name', 'list_price'}
+
+
+class ProductTemplate(models.Model):
+    """Làm mới catalog Messenger đã cache khi tên / giá sản phẩm đổi"""
+    _inherit = 'product.template'
+
+    def write(self, vals):
+        result = super().write(vals)
+        if CATALOG_PRODUCT_FIELDS & set(vals) and not self.env[
+            'social.messenger.product'
+        ].sudo()._get_catalog_template_ids().isdisjoint(self.ids):
+            self.env['social.cache.version']._bump(CATALOG_CACHE)
+        return result
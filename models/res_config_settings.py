@@ -49,6 +49,17 @@ class ResConfigSettings(models.TransientModel):
         help='Trạng thái ngrok',
     )
     
+    # -------------------------------------------------------------------------
+    # GRAPH API CONFIG
+    # -------------------------------------------------------------------------
+    
+    graph_concurrency = fields.Integer(
+        string='Graph API Concurrency',
+        config_parameter='module_social_facebook.graph_concurrency',
+        default=8,
+        help='Số request Graph API chạy song song khi cron đồng bộ nhiều page',
+    )
+    
     # -------------------------------------------------------------------------
     # CRM INTEGRATION CONFIG
     # -------------------------------------------------------------------------
@@ -82,6 +93,19 @@ class ResConfigSettings(models.TransientModel):
         default='Xin chào! Tôi là trợ lý bán hàng tự động. 😊\nBạn vui lòng cho tôi biết tên của bạn?',
         help='Tin nhắn chào mừng khi bắt đầu flow',
     )
+    chatbot_flood_rate = fields.Float(
+        string='Flood Control Rate',
+        config_parameter='module_social_facebook.chatbot_flood_rate',
+        default=1.0,
+        help='Số tin nhắn / giây mỗi khách được chatbot xử lý (vượt quá bị bỏ qua). '
+             'Giới hạn được chia đều cho các HTTP worker',
+    )
+    chatbot_flood_burst = fields.Integer(
+        string='Flood Control Burst',
+        config_parameter='module_social_facebook.chatbot_flood_burst',
+        default=5,
+        help='Số tin nhắn liên tiếp tối đa mỗi khách trước khi áp dụng giới hạn',
+    )
     
     # -------------------------------------------------------------------------
     # COMPUTE METHODS
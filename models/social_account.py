@@ -1,10 +1,20 @@
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import UserError
-import requests
 import logging
 
+from ..lib.facebook_api import FacebookAPI
+from ..lib.facebook_api_async import DEFAULT_CONCURRENCY, run_graph_calls
+from ..lib.response_cache import TTL_PAGE_INFO
+
 _logger = logging.getLogger(__name__)
 
+PAGE_INFO_FIELDS = 'name,category,about,followers_count,fan_count,overall_star_rating'
+
+# Field thay đổi thì phải xóa cache resolver page id → account
+PAGE_RESOLVER_FIELDS = {'facebook_page_id', 'access_token', 'company_id', 'active'}
+# Tên cache của resolver trong social.cache.version
+PAGE_RESOLVER_CACHE = 'page_resolver'
+
 
 class SocialAccount(models.Model):
     _name = 'social.account'
@@ -14,7 +24,7 @@ class SocialAccount(models.Model):
 
     name = fields.Char(string='Page Name', required=True, tracking=True)
     platform = fields.Selection([('facebook', 'Facebook')], string='Platform', default='facebook', required=True)
-    facebook_page_id = fields.Char(string='Facebook Page ID', required=True, tracking=True)
+    facebook_page_id = fields.Char(string='Facebook Page ID', required=True, tracking=True, index=True)
     facebook_page_url = fields.Char(string='Page URL', compute='_compute_page_url', store=True)
     
     access_token = fields.Char(string='Access Token', required=True)
@@ -50,10 +60,57 @@ class SocialAccount(models.Model):
     # ✅ THÊM: Field đếm conversations
     conversation_count = fields.Integer(string='Conversations', compute='_compute_conversation_count')
     
-    _sql_constraints = [
-        ('facebook_page_id_uniq', 'UNIQUE(facebook_page_id, company_id)', 
-         'Facebook Page ID must be unique per company!'),
-    ]
+    _facebook_page_id_uniq = models.Constraint(
+        'UNIQUE(facebook_page_id, company_id)',
+        'Facebook Page ID must be unique per company!',
+    )
+    
+    # -------------------------------------------------------------------------
+    # PAGE ID RESOLVER (webhook hot path)
+    # -------------------------------------------------------------------------
+    
+    @api.model
+    @tools.ormcache('page_id', f'self.env["social.cache.version"]._get_version("{PAGE_RESOLVER_CACHE}")')
+    def _resolve_page_id(self, page_id):
+        """
+        Page id → (account_id, company_id, access_token), cache trong registry
+        theo version PAGE_RESOLVER_CACHE (đổi khi account đổi).
+        
+        Returns:
+            tuple | None: None nếu không có account (active) cho page này
+        """
+        self.env.cr.execute("""
+            SELECT id, company_id, access_token FROM social_account
+            WHERE facebook_page_id = %s AND active
+            ORDER BY id
+            LIMIT 1
+        """, (page_id,))
+        row = self.env.cr.fetchone()
+        return tuple(row) if row else None
+    
+    @api.model_create_multi
+    def create(self, vals_list):
+        accounts = super().create(vals_list)
+        self.env['social.cache.version']._bump(PAGE_RESOLVER_CACHE)
+        return accounts
+    
+    def write(self, vals):
+        result = super().write(vals)
+        if PAGE_RESOLVER_FIELDS & set(vals):
+            self.env['social.cache.version']._bump(PAGE_RESOLVER_CACHE)
+        return result
+    
+    def unlink(self):
+        result = super().unlink()
+        self.env['social.cache.version']._bump(PAGE_RESOLVER_CACHE)
+        return result
+    
+    def _register_hook(self):
+        """Nạp sẵn cache resolver cho mọi page khi registry load xong"""
+        super()._register_hook()
+        self.env.cr.execute("SELECT DISTINCT facebook_page_id FROM social_account WHERE active")
+        for (page_id,) in self.env.cr.fetchall():
+            self._resolve_page_id(page_id)
     
     @api.depends('facebook_page_id')
     def _compute_page_url(self):
@@ -86,10 +143,13 @@ class SocialAccount(models.Model):
     def action_test_connection(self):
         self.ensure_one()
         try:
-            url = f'https://graph.facebook.com/v18.0/{self.facebook_page_id}'
-            params = {'access_token': self.access_token, 'fields': 'id,name,category'}
-            response = requests.get(url, params=params, timeout=10)
-            
+            params = {'fields': 'id,name,category'}
+            # Kiểm tra thật với Graph (không dùng response còn hạn trong cache)
+            response = FacebookAPI(self.access_token).get(
+                self.facebook_page_id, params=params, timeout=10,
+                cache_ttl=TTL_PAGE_INFO, refresh=True,
+            )
+
             if response.status_code == 200:
                 self.write({'state': 'connected', 'error_message': False})
                 return {
@@ -111,30 +171,47 @@ class SocialAccount(models.Model):
     def action_sync_page_info(self):
         self.ensure_one()
         try:
-            url = f'https://graph.facebook.com/v18.0/{self.facebook_page_id}'
-            params = {
-                'access_token': self.access_token,
-                'fields': 'name,category,about,followers_count,fan_count,overall_star_rating'
-            }
-            response = requests.get(url, params=params, timeout=10)
+            params = {'fields': PAGE_INFO_FIELDS}
+            response = FacebookAPI(self.access_token).get(
+                self.facebook_page_id, params=params, timeout=10, cache_ttl=TTL_PAGE_INFO
+            )
             
             if response.status_code == 200:
-                data = response.json()
-                self.write({
-                    'name': data.get('name', self.name),
-                    'page_category': data.get('category'),
-                    'page_about': data.get('about'),
-                    'followers_count': data.get('followers_count', 0),
-                    'likes_count': data.get('fan_count', 0),
-                    'page_rating': data.get('overall_star_rating', 0),
-                    'last_sync_date': fields.Datetime.now(),
-                })
+                self.write(self._prepare_page_info_values(response.json()))
                 return True
             return False
         except Exception as e:
             _logger.error(f'Error syncing page info: {e}')
             return False
     
+    def _prepare_page_info_values(self, data):
+        """Chuyển response Graph của page thành vals để write"""
+        self.ensure_one()
+        return {
+            'name': data.get('name', self.name),
+            'page_category': data.get('category'),
+            'page_about': data.get('about'),
+            'followers_count': data.get('followers_count', 0),
+            'likes_count': data.get('fan_count', 0),
+            'page_rating': data.get('overall_star_rating', 0),
+            'last_sync_date': fields.Datetime.now(),
+        }
+    
+    @api.model
+    def _get_graph_concurrency(self):
+        """Số Graph request song song (Settings > Graph API Concurrency)"""
+        value = self.env['ir.config_parameter'].sudo().get_param(
+            'module_social_facebook.graph_concurrency', DEFAULT_CONCURRENCY
+        )
+        try:
+            return max(1, int(value))
+        except (TypeError, ValueError):
+            return DEFAULT_CONCURRENCY
+    
+    def _run_graph_calls(self, jobs):
+        """Chạy Graph call song song cho nhiều page (xem run_graph_calls)"""
+        return run_graph_calls(jobs, concurrency=self._get_graph_concurrency())
+    
     def action_view_posts(self):
         self.ensure_one()
         return {
@@ -204,9 +281,24 @@ class SocialAccount(models.Model):
     
     @api.model
     def cron_refresh_facebook_tokens(self):
+        """Kiểm tra token của mọi page song song, đánh dấu page có token lỗi"""
         accounts = self.search([('platform', '=', 'facebook'), ('state', '=', 'connected')])
+        # refresh=True: response cũ trong cache không chứng minh token còn hợp lệ
+        results = accounts._run_graph_calls({
+            account.id: (account.access_token, 'get_page_info', account.facebook_page_id, 'id', True)
+            for account in accounts
+        })
+        
         for account in accounts:
+            result = results.get(account.id)
             try:
                 _logger.info(f'Refreshing token for account {account.id}')
+                if isinstance(result, Exception):
+                    raise result
+                if isinstance(result, dict) and result.get('error'):
+                    account.write({
+                        'state': 'error',
+                        'error_message': result['error'].get('message'),
+                    })
             except Exception as e:
                 _logger.error(f'Error refreshing token: {e}')
\ No newline at end of file
@@ -1,6 +1,8 @@
 from odoo import models, fields, api, tools
 import logging
 
+from .social_account import PAGE_INFO_FIELDS
+
 _logger = logging.getLogger(__name__)
 
 
@@ -155,10 +157,22 @@ class SocialAnalytics(models.Model):
                 ('state', '=', 'connected'),
             ])
             
+            # Gọi Graph song song cho mọi page, ghi kết quả trong cùng transaction
+            results = accounts._run_graph_calls({
+                account.id: (account.access_token, 'get_page_info',
+                             account.facebook_page_id, PAGE_INFO_FIELDS)
+                for account in accounts
+            })
+            
             for account in accounts:
                 try:
-                    # TODO: Implement Facebook Insights API call
-                    # account.sync_insights()
+                    data = results.get(account.id)
+                    if isinstance(data, Exception):
+                        raise data
+                    if not isinstance(data, dict) or data.get('error'):
+                        raise ValueError((data or {}).get('error', {}).get('message'))
+                    
+                    account.write(account._prepare_page_info_values(data))
                     _logger.info(f'Updated insights for account {account.name}')
                 except Exception as e:
                     _logger.error(f'Error updating insights for {account.name}: {e}')
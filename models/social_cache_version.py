@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+
+
+class SocialCacheVersion(models.Model):
+    """
+    Phiên bản của các ormcache trong module (page resolver, chatbot matcher,
+    catalog Messenger).
+
+    Method cache đưa version vào key thay vì xóa toàn bộ cache của registry:
+    dữ liệu đổi thì chỉ cache đó bị bỏ, ở mọi worker. Version lấy từ
+    sequence nên không bao giờ lặp lại (kể cả khi transaction bump bị
+    rollback), và chỉ worker khác thấy sau khi commit.
+    """
+    _name = 'social.cache.version'
+    _description = 'Facebook Cache Version'
+    _rec_name = 'name'
+
+    name = fields.Char(string='Cache', required=True, readonly=True)
+    version = fields.Integer(string='Version', default=0, readonly=True)
+
+    _name_uniq = models.Constraint('UNIQUE(name)', 'Cache name must be unique!')
+
+    def init(self):
+        self.env.cr.execute("CREATE SEQUENCE IF NOT EXISTS social_cache_version_seq")
+
+    @api.model
+    def _get_version(self, name):
+        """
+        Version hiện tại của cache `name`. Mọi version được đọc bằng một
+        query và giữ tới hết transaction.
+        """
+        cr = self.env.cr
+        versions = cr.cache.get('social_cache_versions')
+        if versions is None:
+            cr.execute("SELECT name, version FROM social_cache_version")
+            versions = cr.cache['social_cache_versions'] = dict(cr.fetchall())
+            cr.postcommit.add(self._forget_versions)
+            cr.postrollback.add(self._forget_versions)
+        return versions.get(name, 0)
+
+    def _forget_versions(self):
+        self.env.cr.cache.pop('social_cache_versions', None)
+
+    @api.model
+    def _bump(self, *names):
+        """Đổi version của các cache `names` (trong transaction hiện tại)"""
+        self.env.cr.execute("""
+            INSERT INTO social_cache_version (name, version, write_date)
+            SELECT name, nextval('social_cache_version_seq'), now() at time zone 'UTC'
+            FROM unnest(%s::varchar[]) AS name
+            ON CONFLICT (name) DO UPDATE
+            SET version = EXCLUDED.version,
+                write_date = EXCLUDED.write_date
+        """, (list(names),))
+        self._forget_versions()
@@ -1,11 +1,35 @@
 # -*- coding: utf-8 -*-
 
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, SUPERUSER_ID, _
 from odoo.exceptions import ValidationError
 import logging
+from functools import partial
+
+from ..lib.counter_buffer import get_trigger_counters
+from ..lib.keyword_matcher import KeywordMatcher
 
 _logger = logging.getLogger(__name__)
 
+# Field của rule dùng để build matcher - đổi field này thì build lại
+MATCHER_FIELDS = {'active', 'priority', 'sequence', 'trigger_keywords', 'account_id', 'company_id'}
+# Tên cache của matcher trong social.cache.version
+MATCHER_CACHE = 'chatbot_matcher'
+
+
+def _record_triggers(registry, rule_ids, when):
+    """Sau commit: cộng vào bộ đếm của worker, ghi xuống DB khi tới hạn"""
+    counters = get_trigger_counters()
+    for rule_id in rule_ids:
+        counters.add((registry.db_name, rule_id, when.date()), 1, when)
+    if not counters.is_due():
+        return
+    try:
+        with registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            env['social.chatbot.automation']._flush_trigger_counters()
+    except Exception as e:
+        _logger.warning(f'Flush chatbot trigger counters failed: {e}')
+
 
 class SocialChatbotAutomation(models.Model):
     """
@@ -114,18 +138,146 @@ class SocialChatbotAutomation(models.Model):
             if rule.priority < 0 or rule.priority > 100:
                 raise ValidationError(_('Priority must be between 0 and 100'))
     
+    # CRUD (invalidate matcher cache)
+    @api.model_create_multi
+    def create(self, vals_list):
+        rules = super().create(vals_list)
+        self.env['social.cache.version']._bump(MATCHER_CACHE)
+        return rules
+    
+    def write(self, vals):
+        result = super().write(vals)
+        if MATCHER_FIELDS & set(vals):
+            self.env['social.cache.version']._bump(MATCHER_CACHE)
+        return result
+    
+    def unlink(self):
+        result = super().unlink()
+        self.env['social.cache.version']._bump(MATCHER_CACHE)
+        return result
+    
+    # MATCHING
+    @api.model
+    @tools.ormcache('company_id', 'account_id',
+                    f'self.env["social.cache.version"]._get_version("{MATCHER_CACHE}")')
+    def _get_keyword_matcher(self, company_id, account_id):
+        """
+        Matcher đã compile cho các rule active của (company, page), cache
+        trong registry theo version MATCHER_CACHE (đổi khi rule thay đổi).
+        
+        Rule của page và rule chung (không có page) được gộp; value của mỗi
+        từ khóa là thứ hạng của rule theo _order (0 = ưu tiên cao nhất).
+        
+        Returns:
+            tuple: (KeywordMatcher, tuple rule id theo thứ hạng)
+        """
+        rules = self.sudo().with_context(active_test=True).search([
+            ('company_id', '=', company_id),
+            ('account_id', 'in', [account_id, False] if account_id else [False]),
+        ])
+        matcher = KeywordMatcher(
+            (keyword, rank)
+            for rank, rule in enumerate(rules)
+            for keyword in rule.trigger_keywords.split(',')
+        )
+        _logger.info(f'Compiled chatbot matcher: {len(rules)} rules, {matcher.size} keywords '
+                     f'(company {company_id}, page {account_id})')
+        return matcher, tuple(rules.ids)
+    
+    @api.model
+    def _find_matching_rule(self, message_text, account):
+        """
+        Rule ưu tiên cao nhất khớp message (một lượt duyệt message).
+        
+        Khác check_match(): so khớp không dấu và trọn từ, chỉ rule active.
+        
+        Args:
+            message_text (str): Tin nhắn của khách
+            account (social.account): Page nhận tin
+        
+        Returns:
+            social.chatbot.automation: Rule khớp (rỗng nếu không có)
+        """
+        if not message_text or not account:
+            return self.browse()
+        matcher, rule_ids = self._get_keyword_matcher(account.company_id.id, account.id)
+        rank = matcher.find_best(message_text)
+        return self.browse(rule_ids[rank]) if rank is not None else self.browse()
+    
     # BUSINESS METHODS
     def mark_as_triggered(self):
         """
         Đánh dấu rule đã được kích hoạt.
-        Tăng counter và cập nhật last triggered date.
+        
+        Chỉ cộng vào bộ đếm trong bộ nhớ của worker sau khi transaction
+        commit (không khóa row của rule); bộ đếm được ghi xuống theo lô bởi
+        _flush_trigger_counters().
         """
-        self.ensure_one()
-        self.write({
-            'triggered_count': self.triggered_count + 1,
-            'last_triggered_date': fields.Datetime.now(),
-        })
-        _logger.info(f"Chatbot rule '{self.name}' triggered. Total count: {self.triggered_count}")
+        if not self:
+            return
+        self.env.cr.postcommit.add(
+            partial(_record_triggers, self.env.registry, list(self.ids), fields.Datetime.now())
+        )
+        _logger.info(f"Chatbot rules {self.mapped('name')} triggered")
+    
+    @api.model
+    def _flush_trigger_counters(self):
+        """
+        Ghi bộ đếm kích hoạt của worker xuống database: một UPDATE cộng dồn
+        (triggered_count + n) cho các rule và một upsert cho lịch sử theo
+        ngày. Lỗi → trả bộ đếm lại để lần sau ghi tiếp.
+        """
+        counters = get_trigger_counters()
+        items = counters.drain()
+        dbname = self.env.cr.dbname
+        other = {key: value for key, value in items.items() if key[0] != dbname}
+        items = {key: value for key, value in items.items() if key[0] == dbname}
+        counters.merge(other)
+        if not items:
+            return 0
+        
+        totals = {}
+        for (_db, rule_id, day), (count, last) in items.items():
+            total, last_seen = totals.get(rule_id, (0, last))
+            totals[rule_id] = (total + count, max(last_seen, last))
+        
+        try:
+            with self.env.cr.savepoint():
+                self.env.cr.execute("""
+                    UPDATE social_chatbot_automation r
+                    SET triggered_count = coalesce(r.triggered_count, 0) + v.n,
+                        last_triggered_date = greatest(r.last_triggered_date, v.last)
+                    FROM unnest(%s::int[], %s::int[], %s::timestamp[]) AS v(id, n, last)
+                    WHERE r.id = v.id
+                """, (
+                    list(totals),
+                    [total for total, last in totals.values()],
+                    [last for total, last in totals.values()],
+                ))
+                keys = list(items)
+                self.env.cr.execute("""
+                    INSERT INTO social_chatbot_automation_stat
+                        (rule_id, company_id, date, trigger_count, create_uid, create_date, write_uid, write_date)
+                    SELECT v.rule_id, r.company_id, v.day, v.n,
+                           %s, now() at time zone 'UTC', %s, now() at time zone 'UTC'
+                    FROM unnest(%s::int[], %s::date[], %s::int[]) AS v(rule_id, day, n)
+                    JOIN social_chatbot_automation r ON r.id = v.rule_id
+                    ON CONFLICT (rule_id, date) DO UPDATE
+                    SET trigger_count = social_chatbot_automation_stat.trigger_count + EXCLUDED.trigger_count,
+                        write_date = EXCLUDED.write_date
+                """, (
+                    self.env.uid, self.env.uid,
+                    [rule_id for _db, rule_id, day in keys],
+                    [day for _db, rule_id, day in keys],
+                    [items[key][0] for key in keys],
+                ))
+        except Exception as e:
+            _logger.warning(f'Flush chatbot trigger counters failed, kept in memory: {e}')
+            counters.merge(items)
+            return 0
+        
+        self.invalidate_model(['triggered_count', 'last_triggered_date'])
+        return sum(total for total, last in totals.values())
     
     def check_match(self, message_text):
         """
@@ -213,4 +365,34 @@ Gửi tin nhắn chứa bất kỳ keyword nào ở trên để test rule này.
                 'type': 'info',
                 'sticky': False,
             }
-        }
\ No newline at end of file
+        }
+
+
+class SocialChatbotAutomationStat(models.Model):
+    """Số lần kích hoạt của chatbot rule theo ngày (ghi bởi _flush_trigger_counters)"""
+    
+    _name = 'social.chatbot.automation.stat'
+    _description = 'Chatbot Rule Daily Triggers'
+    _order = 'date desc, rule_id'
+    _rec_name = 'rule_id'
+    
+    rule_id = fields.Many2one(
+        'social.chatbot.automation',
+        string='Rule',
+        required=True,
+        ondelete='cascade',
+        readonly=True,
+    )
+    company_id = fields.Many2one(
+        'res.company',
+        string='Company',
+        required=True,
+        readonly=True,
+        index=True,
+    )
+    date = fields.Date(string='Date', required=True, readonly=True, index=True)
+    trigger_count = fields.Integer(string='Triggered Count', default=0, readonly=True)
+    
+    _rule_date_uniq = models.Constraint(
+        'UNIQUE(rule_id, date)', 'Only one statistic row per rule and day!',
+    )
@@ -1,7 +1,10 @@
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
-import requests
 import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from ..lib.facebook_api import FacebookAPI
 
 _logger = logging.getLogger(__name__)
 
@@ -13,7 +16,7 @@ class SocialComment(models.Model):
 
     display_name = fields.Char(string='Display Name', compute='_compute_display_name', store=True)
     post_id = fields.Many2one('social.post', string='Post', required=True, ondelete='cascade')
-    facebook_comment_id = fields.Char(string='Facebook Comment ID', required=True)
+    facebook_comment_id = fields.Char(string='Facebook Comment ID', required=True, index=True)
     author_name = fields.Char(string='Author', required=True)
     author_facebook_id = fields.Char(string='Author FB ID')
     message = fields.Text(string='Message', required=True)
@@ -36,9 +39,9 @@ class SocialComment(models.Model):
         if not self.reply_text:
             raise UserError(_('Please enter a reply message!'))
         try:
-            url = f'https://graph.facebook.com/v18.0/{self.facebook_comment_id}/comments'
-            data = {'access_token': self.post_id.account_id.access_token, 'message': self.reply_text}
-            response = requests.post(url, data=data, timeout=30)
+            api = FacebookAPI(self.post_id.account_id.access_token)
+            response = api.post(f'{self.facebook_comment_id}/comments',
+                                data={'message': self.reply_text}, timeout=30)
             if response.status_code == 200:
                 self.replied = True
                 return {'type': 'ir.actions.client', 'tag': 'display_notification',
@@ -54,4 +57,111 @@ class SocialComment(models.Model):
     
     def action_mark_spam(self):
         self.ensure_one()
-        self.is_spam = True
\ No newline at end of file
+        self.is_spam = True
+    
+    # -------------------------------------------------------------------------
+    # WEBHOOK FEED CHANGES
+    # -------------------------------------------------------------------------
+    
+    @api.model
+    def _apply_feed_changes(self, values):
+        """
+        Áp dụng các thay đổi `feed` từ webhook (comment add/edited/remove,
+        reaction add/remove) vào social.comment và bộ đếm của social.post.
+        
+        Số query cố định cho cả lô: 1 search post, 1 search comment,
+        1 create, 1 unlink, 1 write mỗi post có bộ đếm thay đổi.
+        
+        Args:
+            values (list): change['value'] theo thứ tự nhận
+        """
+        values = [v for v in values if v.get('item') in ('comment', 'reaction') and v.get('post_id')]
+        if not values:
+            return
+        
+        posts = self.env['social.post'].sudo().search([
+            ('facebook_post_id', 'in', list({v['post_id'] for v in values})),
+        ])
+        post_by_fb_id = {post.facebook_post_id: post for post in posts}
+        
+        fb_comment_ids = set()
+        for value in values:
+            fb_comment_ids.update(filter(None, [value.get('comment_id'), value.get('parent_id')]))
+        comments = self.sudo().search([('facebook_comment_id', 'in', list(fb_comment_ids))])
+        comment_by_fb_id = {comment.facebook_comment_id: comment for comment in comments}
+        
+        to_create = {}      # facebook_comment_id -> (vals, fb parent id)
+        to_remove = set()
+        deltas = defaultdict(lambda: {'likes_count': 0, 'comments_count': 0})
+        
+        for value in values:
+            post = post_by_fb_id.get(value['post_id'])
+            if not post:
+                continue
+            verb = value.get('verb')
+            fb_id = value.get('comment_id')
+            
+            if value['item'] == 'reaction':
+                # Chỉ reaction trên bài viết (không phải trên comment)
+                if not fb_id:
+                    if verb == 'add':
+                        deltas[post]['likes_count'] += 1
+                    elif verb == 'remove':
+                        deltas[post]['likes_count'] -= 1
+                continue
+            
+            if verb == 'add':
+                if fb_id in comment_by_fb_id or fb_id in to_create:
+                    continue
+                author = value.get('from') or {}
+                created_time = value.get('created_time')
+                to_create[fb_id] = ({
+                    'post_id': post.id,
+                    'facebook_comment_id': fb_id,
+                    'author_name': author.get('name') or 'Unknown',
+                    'author_facebook_id': author.get('id', ''),
+                    'message': value.get('message', ''),
+                    'comment_date': datetime.fromtimestamp(created_time, timezone.utc).replace(tzinfo=None)
+                    if isinstance(created_time, int) else fields.Datetime.now(),
+                }, value.get('parent_id') if value.get('parent_id') != value['post_id'] else None)
+                deltas[post]['comments_count'] += 1
+            
+            elif verb == 'edited':
+                if fb_id in to_create:
+                    to_create[fb_id][0]['message'] = value.get('message', '')
+                elif fb_id in comment_by_fb_id:
+                    comment_by_fb_id[fb_id].message = value.get('message', '')
+            
+            elif verb == 'remove':
+                if fb_id in to_create:
+                    del to_create[fb_id]
+                    deltas[post]['comments_count'] -= 1
+                elif fb_id in comment_by_fb_id and fb_id not in to_remove:
+                    to_remove.add(fb_id)
+                    deltas[post]['comments_count'] -= 1
+        
+        if to_create:
+            created = self.sudo().create([vals for vals, parent in to_create.values()])
+            for fb_id, comment in zip(to_create, created):
+                comment_by_fb_id[fb_id] = comment
+            # Parent có thể vừa được tạo trong cùng lô
+            for fb_id, (vals, parent_fb_id) in to_create.items():
+                parent = comment_by_fb_id.get(parent_fb_id) if parent_fb_id else None
+                if parent:
+                    comment_by_fb_id[fb_id].parent_id = parent
+        
+        if to_remove:
+            self.sudo().browse([comment_by_fb_id[fb_id].id for fb_id in to_remove]).unlink()
+        
+        for post, delta in deltas.items():
+            vals = {
+                field: max(0, post[field] + change)
+                for field, change in delta.items() if change
+            }
+            if vals:
+                post.write(vals)
+        
+        _logger.info(
+            f'Feed changes: {len(to_create)} comments added, {len(to_remove)} removed, '
+            f'{len(deltas)} posts updated'
+        )
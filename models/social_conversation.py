@@ -146,11 +146,10 @@ class SocialConversation(models.Model):
     # CONSTRAINTS
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
     
-    _sql_constraints = [
-        ('facebook_psid_account_uniq',
-         'UNIQUE(facebook_psid, account_id)',
-         'Conversation already exists for this user and page!'),
-    ]
+    _facebook_psid_account_uniq = models.Constraint(
+        'UNIQUE(facebook_psid, account_id)',
+        'Conversation already exists for this user and page!',
+    )
     
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
     # ✅ COMPUTE METHODS
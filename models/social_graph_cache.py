@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+from odoo.modules.registry import Registry
+import logging
+from datetime import datetime, timezone
+
+from ..lib.response_cache import get_response_cache
+
+_logger = logging.getLogger(__name__)
+
+
+class GraphCacheStore:
+    """
+    Tầng cache dùng chung của GraphResponseCache trên bảng social_graph_cache.
+
+    Dùng cursor riêng (không dính transaction của request), mỗi thao tác
+    một transaction ngắn. Single-flight giữa các worker dùng lease
+    (lease_until) trên row của key: không giữ lock / connection trong lúc
+    gọi Graph.
+    """
+
+    def __init__(self, dbname):
+        self.dbname = dbname
+
+    def load(self, key):
+        with Registry(self.dbname).cursor() as cr:
+            cr.execute("""
+                SELECT body, etag, expires_at FROM social_graph_cache
+                WHERE key = %s AND body IS NOT NULL
+            """, (key,))
+            row = cr.fetchone()
+        if not row:
+            return None
+        body, etag, expires_at = row
+        return body, etag, expires_at.timestamp() if expires_at else 0
+
+    def save(self, key, body, etag, expires_at):
+        expires_at = datetime.fromtimestamp(expires_at, timezone.utc).replace(tzinfo=None)
+        with Registry(self.dbname).cursor() as cr:
+            cr.execute("""
+                INSERT INTO social_graph_cache (key, body, etag, expires_at, write_date)
+                VALUES (%s, %s, %s, %s, now() at time zone 'UTC')
+                ON CONFLICT (key) DO UPDATE
+                SET body = EXCLUDED.body,
+                    etag = EXCLUDED.etag,
+                    expires_at = EXCLUDED.expires_at,
+                    write_date = EXCLUDED.write_date
+            """, (key, body, etag, expires_at))
+
+    def acquire_lease(self, key, seconds):
+        """
+        Lấy lease tải key (row chưa có thì tạo row rỗng).
+
+        Returns:
+            bool: False nếu worker khác đang giữ lease còn hạn
+        """
+        with Registry(self.dbname).cursor() as cr:
+            cr.execute("""
+                INSERT INTO social_graph_cache (key, lease_until, write_date)
+                VALUES (%(key)s, (now() at time zone 'UTC') + make_interval(secs => %(seconds)s),
+                        now() at time zone 'UTC')
+                ON CONFLICT (key) DO UPDATE
+                SET lease_until = EXCLUDED.lease_until
+                WHERE social_graph_cache.lease_until IS NULL
+                   OR social_graph_cache.lease_until < (now() at time zone 'UTC')
+                RETURNING key
+            """, {'key': key, 'seconds': seconds})
+            return bool(cr.fetchone())
+
+    def release_lease(self, key):
+        with Registry(self.dbname).cursor() as cr:
+            cr.execute("UPDATE social_graph_cache SET lease_until = NULL WHERE key = %s", (key,))
+
+
+class SocialGraphCache(models.Model):
+    """
+    Response Graph API (GET) được cache, dùng chung giữa các worker.
+
+    Key là hash của page/token + endpoint + params.
+    """
+    _name = 'social.graph.cache'
+    _description = 'Facebook Graph API Response Cache'
+    _rec_name = 'key'
+
+    key = fields.Char(string='Key', required=True, readonly=True)
+    body = fields.Text(string='Body', readonly=True)
+    etag = fields.Char(string='ETag', readonly=True)
+    expires_at = fields.Datetime(string='Expires At', readonly=True, index=True)
+    lease_until = fields.Datetime(string='Lease Until', readonly=True,
+                                  help='Worker đang tải key này (single-flight) tới thời điểm này')
+
+    _key_uniq = models.Constraint('UNIQUE(key)', 'Cache key must be unique!')
+
+    def _register_hook(self):
+        """Gắn tầng DB vào response cache khi registry load xong"""
+        super()._register_hook()
+        get_response_cache().set_store(GraphCacheStore(self.env.cr.dbname))
+
+    @api.autovacuum
+    def _gc_expired_entries(self):
+        """Xóa entry đã hết hạn quá 1 ngày (không còn dùng để revalidate)"""
+        self.env.cr.execute("""
+            DELETE FROM social_graph_cache
+            WHERE expires_at < (now() at time zone 'UTC') - interval '1 day'
+               OR (body IS NULL AND (lease_until IS NULL
+                                     OR lease_until < (now() at time zone 'UTC')))
+        """)
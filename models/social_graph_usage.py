@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+from odoo import fields, models
+from odoo.modules.registry import Registry
+from datetime import datetime, timezone
+
+from ..lib.rate_limiter import get_rate_limiter
+
+
+class GraphUsageStore:
+    """
+    Store của GraphRateLimiter dùng bảng social_graph_usage.
+
+    Dùng cursor riêng nên không phụ thuộc transaction của request đang chạy
+    và mọi Odoo worker cùng thấy một ngân sách quota: token của từng bucket
+    (tokens, tokens_at) nằm trên row, được nạp và trừ trong một transaction
+    ngắn theo đồng hồ của PostgreSQL.
+    """
+
+    def __init__(self, dbname):
+        self.dbname = dbname
+
+    def load(self):
+        with Registry(self.dbname).cursor() as cr:
+            cr.execute("SELECT key, usage_pct, blocked_until FROM social_graph_usage")
+            return {
+                key: (usage or 0, blocked_until.timestamp() if blocked_until else None)
+                for key, usage, blocked_until in cr.fetchall()
+            }
+
+    def save(self, key, usage, blocked_until):
+        blocked_until = datetime.fromtimestamp(blocked_until, timezone.utc).replace(tzinfo=None) if blocked_until else None
+        with Registry(self.dbname).cursor() as cr:
+            cr.execute("""
+                INSERT INTO social_graph_usage (key, usage_pct, blocked_until, write_date)
+                VALUES (%s, %s, %s, now() at time zone 'UTC')
+                ON CONFLICT (key) DO UPDATE
+                SET usage_pct = EXCLUDED.usage_pct,
+                    blocked_until = GREATEST(social_graph_usage.blocked_until, EXCLUDED.blocked_until),
+                    write_date = EXCLUDED.write_date
+            """, (key, usage, blocked_until))
+
+    def _refill(self, cr, keys, rates, capacities):
+        """Nạp token theo thời gian đã trôi qua và khóa row (theo thứ tự key)"""
+        cr.execute("""
+            WITH b AS (
+                SELECT * FROM unnest(%s::varchar[], %s::float8[], %s::float8[])
+                    AS b(key, rate, capacity)
+            ), locked AS (
+                SELECT u.key FROM social_graph_usage u
+                JOIN b ON b.key = u.key
+                ORDER BY u.key
+                FOR UPDATE OF u
+            )
+            UPDATE social_graph_usage u
+            SET tokens = LEAST(b.capacity, COALESCE(u.tokens, b.capacity) + b.rate * GREATEST(0,
+                    EXTRACT(EPOCH FROM (now() at time zone 'UTC')
+                                       - COALESCE(u.tokens_at, now() at time zone 'UTC')))),
+                tokens_at = now() at time zone 'UTC'
+            FROM b, locked
+            WHERE u.key = b.key AND locked.key = u.key
+            RETURNING u.key, u.tokens
+        """, (keys, rates, capacities))
+        return dict(cr.fetchall())
+
+    def take(self, buckets, cost):
+        """
+        Trừ `cost` token của mọi bucket nếu tất cả đều đủ (all-or-nothing).
+
+        Args:
+            buckets (dict): key -> (rate, capacity, tokens cần có)
+
+        Returns:
+            float: 0 nếu đã trừ token, ngược lại số giây cần chờ
+        """
+        keys = sorted(buckets)
+        rates = [buckets[key][0] for key in keys]
+        capacities = [float(buckets[key][1]) for key in keys]
+        with Registry(self.dbname).cursor() as cr:
+            tokens = self._refill(cr, keys, rates, capacities)
+            if len(tokens) < len(keys):
+                cr.execute("""
+                    INSERT INTO social_graph_usage (key, tokens, tokens_at, write_date)
+                    SELECT key, capacity, now() at time zone 'UTC', now() at time zone 'UTC'
+                    FROM unnest(%s::varchar[], %s::float8[]) AS b(key, capacity)
+                    ON CONFLICT (key) DO NOTHING
+                """, (keys, capacities))
+                tokens = self._refill(cr, keys, rates, capacities)
+
+            wait = max(
+                (buckets[key][2] - tokens.get(key, 0)) / max(buckets[key][0], 1e-6)
+                for key in keys
+            )
+            if wait > 0:
+                return wait
+            cr.execute("""
+                UPDATE social_graph_usage SET tokens = tokens - %s WHERE key = ANY(%s)
+            """, (cost, keys))
+            return 0.0
+
+
+class SocialGraphUsage(models.Model):
+    """
+    Trạng thái quota Graph API dùng chung giữa các worker.
+
+    Mỗi dòng là một bucket của rate limiter ('app' hoặc 'page:<hash token>'),
+    cập nhật từ header X-App-Usage / X-Page-Usage.
+    """
+    _name = 'social.graph.usage'
+    _description = 'Facebook Graph API Usage'
+    _rec_name = 'key'
+    _order = 'usage_pct desc'
+
+    key = fields.Char(string='Bucket', required=True, readonly=True)
+    usage_pct = fields.Float(string='Usage (%)', readonly=True)
+    blocked_until = fields.Datetime(string='Blocked Until', readonly=True)
+    tokens = fields.Float(string='Tokens', readonly=True,
+                          help='Token còn lại của bucket (dùng chung giữa các worker)')
+    tokens_at = fields.Datetime(string='Tokens Updated', readonly=True)
+
+    # Odoo 19 chỉ tạo constraint khai báo bằng models.Constraint (không đọc
+    # _sql_constraints); các upsert ON CONFLICT của module cần unique index này
+    _key_uniq = models.Constraint('UNIQUE(key)', 'Usage bucket must be unique!')
+
+    def _register_hook(self):
+        """Gắn store DB vào rate limiter khi registry load xong"""
+        super()._register_hook()
+        get_rate_limiter().set_store(GraphUsageStore(self.env.cr.dbname))
@@ -159,11 +159,10 @@ class SocialMessage(models.Model):
     # CONSTRAINTS
     # =========================================================================
     
-    _sql_constraints = [
-        ('facebook_user_account_uniq',
-         'UNIQUE(facebook_user_id, account_id)',
-         'Conversation already exists for this user and page!'),
-    ]
+    _facebook_user_account_uniq = models.Constraint(
+        'UNIQUE(facebook_user_id, account_id)',
+        'Conversation already exists for this user and page!',
+    )
     # =========================================================================
 # ACTION METHODS
 # =========================================================================
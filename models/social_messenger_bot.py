@@ -0,0 +1,787 @@
+# -*- coding: utf-8 -*-
+
+from odoo import fields, models
+from odoo.tools import config
+import json
+import logging
+import re
+from datetime import timedelta
+
+from ..lib.flood_control import FLOOD_BURST, FLOOD_RATE, get_flood_control
+
+_logger = logging.getLogger(__name__)
+
+
+class ChatbotSession:
+    """
+    Session chatbot (social.message) của một lượt xử lý tin nhắn.
+
+    Đọc field như record; write() chỉ ghi nhận thay đổi trong bộ nhớ,
+    flush() ghi mọi thay đổi của lượt bằng một write() duy nhất (một
+    UPDATE, một tracking message) vào cuối lượt.
+    """
+
+    def __init__(self, record):
+        self.record = record.sudo()
+        self._changes = {}
+
+    def __getattr__(self, name):
+        changes = self.__dict__.get('_changes', {})
+        if name in changes:
+            return changes[name]
+        return getattr(self.record, name)
+
+    def write(self, vals):
+        """Ghi nhận thay đổi (cùng định dạng vals với write() của ORM)"""
+        for name, value in vals.items():
+            field = self.record._fields[name]
+            if field.type == 'many2one':
+                value = self.record[name].browse(value.id if hasattr(value, 'id') else value or ())
+            elif field.type in ('many2many', 'one2many'):
+                value = self._apply_commands(self.__getattr__(name), value)
+            self._changes[name] = value
+        return True
+
+    @staticmethod
+    def _apply_commands(current, commands):
+        """Giá trị x2many sau các command (5,) / (6, 0, ids) / (4, id) / (3, id)"""
+        if not isinstance(commands, (list, tuple)):
+            return commands
+        for command in commands:
+            if command[0] == 5:
+                current = current.browse()
+            elif command[0] == 6:
+                current = current.browse(command[2])
+            elif command[0] == 4:
+                current |= current.browse(command[1])
+            elif command[0] == 3:
+                current -= current.browse(command[1])
+        return current
+
+    def flush(self):
+        """
+        Ghi các thay đổi khác giá trị hiện tại của record.
+
+        Returns:
+            bool: True nếu có UPDATE
+        """
+        vals = {}
+        for name, value in self._changes.items():
+            field = self.record._fields[name]
+            current = self.record[name]
+            if field.type == 'many2one':
+                if value != current:
+                    vals[name] = value.id
+            elif field.type in ('many2many', 'one2many'):
+                if value.ids != current.ids:
+                    vals[name] = [(6, 0, value.ids)]
+            elif value != current:
+                vals[name] = value
+        self._changes = {}
+        if vals:
+            self.record.write(vals)
+        return bool(vals)
+
+
+class SocialMessengerBot(models.AbstractModel):
+    """
+    Xử lý sự kiện Messenger nhận qua webhook (chatbot bán hàng).
+
+    Được gọi từ queue social.webhook.event, không chạy trong HTTP request
+    của webhook.
+    """
+    _name = 'social.messenger.bot'
+    _description = 'Facebook Messenger Chatbot'
+
+    def _configure_flood_control(self):
+        """
+        Giới hạn flood control từ Settings (get_param có cache, không query).
+
+        Bucket nằm trong bộ nhớ của từng HTTP worker và webhook được chia
+        đều giữa các worker, nên giới hạn cấu hình được chia cho số worker
+        (--workers) để tổng mọi worker xấp xỉ giới hạn của Settings.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        try:
+            rate = float(ICP.get_param('module_social_facebook.chatbot_flood_rate', FLOOD_RATE))
+            burst = int(ICP.get_param('module_social_facebook.chatbot_flood_burst', FLOOD_BURST))
+        except (TypeError, ValueError):
+            return
+        workers = max(1, config.get('workers') or 1)
+        get_flood_control().configure(rate / workers, max(1.0, burst / workers))
+    
+    @staticmethod
+    def _allow_event(page_id, psid, event):
+        """
+        Flood control trong bộ nhớ theo (page, PSID), chạy trước mọi truy
+        cập ORM. Chỉ tin nhắn / postback của khách tốn token; bucket tính
+        theo timestamp (ms) của event.
+        """
+        if 'message' not in event and 'postback' not in event:
+            return True
+        if event.get('message', {}).get('is_echo'):
+            return True
+        at = event['timestamp'] / 1000.0 if isinstance(event.get('timestamp'), (int, float)) else None
+        if get_flood_control().allow(f'{page_id}:{psid}', at=at):
+            return True
+        _logger.debug(f'Flood control: dropped event of PSID {psid} (page {page_id})')
+        return False
+    
+    def _handle_messaging_event(self, msg, event):
+        """
+        Xử lý một event cho session (social.message) đã resolve. Thay đổi
+        của session trong lượt được gom lại và ghi một lần ở cuối lượt.
+        """
+        session = ChatbotSession(msg)
+        self._handle_turn(session, event)
+        session.flush()
+    
+    def _handle_turn(self, msg, event):
+        """Một lượt chatbot trên ChatbotSession"""
+        
+        _logger.info('=' * 60)
+        _logger.info('📨 MESSAGING EVENT')
+        _logger.info(f'Event: {json.dumps(event, indent=2)}')
+        _logger.info('=' * 60)
+        
+        # Check cooldown
+        if msg.cooldown_until:
+            now = fields.Datetime.now()
+            if msg.cooldown_until > now:
+                _logger.info(f"⏳ Cooldown active until {msg.cooldown_until}")
+                return
+        
+        if 'message' in event:
+            message_data = event['message']
+            
+            if message_data.get('is_echo'):
+                return
+            
+            # ✅ FIX: XỬ LÝ STICKER & ATTACHMENT
+            user_message = ''
+            
+            # Kiểm tra có text không
+            if 'text' in message_data:
+                user_message = message_data.get('text', '')
+                _logger.info(f'💬 Text message: {user_message}')
+            
+            # ✅ THÊM: Xử lý sticker/attachment → Bỏ qua
+            elif 'attachments' in message_data:
+                attachments = message_data.get('attachments', [])
+                _logger.info(f'📎 Received attachment/sticker (count: {len(attachments)})')
+                
+                # Kiểm tra có phải sticker không
+                if attachments and attachments[0].get('type') == 'image':
+                    payload = attachments[0].get('payload', {})
+                    if 'sticker_id' in payload:
+                        _logger.info(f'👍 Sticker detected: {payload.get("sticker_id")}')
+                        # Phản hồi thân thiện
+                        self._send_text(msg, '😊 Cảm ơn bạn!\n\n👉 Gửi "mua" để xem sản phẩm nhé!')
+                        return
+                
+                # Attachment khác (image, file...) → Bỏ qua
+                _logger.info(f'📎 Non-text message, ignoring')
+                return
+            
+            # Process quick reply
+            if 'quick_reply' in message_data:
+                payload = message_data['quick_reply'].get('payload', '')
+                _logger.info(f'⚡ Quick reply payload: {payload}')
+                self._process_chatbot_flow(msg, payload)
+            elif user_message:
+                # Chỉ xử lý khi có text
+                self._process_chatbot_flow(msg, user_message)
+    
+    def _find_or_create_message_record(self, sender_id, recipient_id):
+        """Tìm/tạo message record"""
+        page = self.env['social.account']._resolve_page_id(recipient_id)
+        if not page:
+            return None
+        account_id, company_id, access_token = page
+        
+        msg = self.env['social.message'].sudo().search([
+            ('facebook_user_id', '=', sender_id),
+            ('account_id', '=', account_id),
+        ], limit=1)
+        
+        if msg:
+            return msg
+        
+        try:
+            with self.env.cr.savepoint():
+                return self.env['social.message'].sudo().create({
+                    'facebook_user_id': sender_id,
+                    'account_id': account_id,
+                    'company_id': company_id,
+                    'chatbot_state': 'idle',
+                })
+        except Exception as e:
+            _logger.error(f"Failed to create message record: {e}")
+            return None
+    
+    def _get_message_records(self, pairs):
+        """
+        Resolve session của nhiều (page_id, psid) một lần: page qua resolver
+        cache của social.account, 1 query social.message, 1 create cho PSID mới.
+        
+        Args:
+            pairs (iterable): (page_id, psid)
+        
+        Returns:
+            dict: (page_id, psid) -> social.message (bỏ qua page không tồn tại)
+        """
+        pairs = set(pairs)
+        if not pairs:
+            return {}
+        
+        Account = self.env['social.account']
+        page_by_id = {}
+        for page_id in {page_id for page_id, psid in pairs}:
+            page = Account._resolve_page_id(page_id)
+            if page:
+                page_by_id[page_id] = page
+        if not page_by_id:
+            return {}
+        
+        Message = self.env['social.message'].sudo()
+        messages = Message.search([
+            ('account_id', 'in', list({page[0] for page in page_by_id.values()})),
+            ('facebook_user_id', 'in', list({psid for page_id, psid in pairs})),
+        ])
+        msg_by_key = {(m.account_id.id, m.facebook_user_id): m for m in messages}
+        
+        result = {}
+        missing = []
+        for page_id, psid in pairs:
+            page = page_by_id.get(page_id)
+            if not page:
+                continue
+            msg = msg_by_key.get((page[0], psid))
+            if msg:
+                result[(page_id, psid)] = msg
+            else:
+                missing.append((page_id, psid, page))
+        
+        if missing:
+            vals_list = [{
+                'facebook_user_id': psid,
+                'account_id': page[0],
+                'company_id': page[1],
+                'chatbot_state': 'idle',
+            } for page_id, psid, page in missing]
+            try:
+                with self.env.cr.savepoint():
+                    created = Message.create(vals_list)
+                for (page_id, psid, page), msg in zip(missing, created):
+                    result[(page_id, psid)] = msg
+            except Exception as e:
+                # Worker khác vừa tạo cùng session → resolve lại từng PSID
+                _logger.info(f'Batch session create failed ({e}), retry one by one')
+                for page_id, psid, page in missing:
+                    msg = self._find_or_create_message_record(psid, page_id)
+                    if msg:
+                        result[(page_id, psid)] = msg
+        
+        return result
+    
+    def _find_existing_customer(self, msg):
+        """Tìm customer theo (page, PSID) trong social.messenger.identity"""
+        partner = self.env['social.messenger.identity']._get_partner(
+            msg.account_id.id, msg.facebook_user_id
+        )
+        if partner:
+            _logger.info(f"✅ FOUND customer: {partner.name}")
+            return partner
+        return None
+    
+    def _get_or_create_fb_messenger_tag(self):
+        """Tạo/lấy FB Messenger tag"""
+        Tag = self.env['res.partner.category'].sudo()
+        tag = Tag.search([('name', '=ilike', 'Facebook-Messenger')], limit=1)
+        if not tag:
+            tag = Tag.create({'name': 'Facebook-Messenger', 'color': 4})
+        return tag
+    
+    def _reset_order_flow(self, msg, kick_start=False, set_cooldown=False):
+        """Reset order flow"""
+        write_vals = {
+            'chatbot_state': 'idle',
+            'cooldown_until': False,
+            'selected_product_ids': [(5, 0, 0)],
+            'product_quantity': 0,
+            'customer_name': False,
+            'customer_phone': False,
+            'customer_address': False,
+        }
+        
+        if set_cooldown:
+            write_vals['cooldown_until'] = fields.Datetime.now() + timedelta(seconds=3)
+        
+        msg.write(write_vals)
+        _logger.info(f"🔄 Reset order flow for PSID: {msg.facebook_user_id}")
+        
+        if kick_start:
+            self._state_idle(msg, 'mua')
+    
+    def _process_chatbot_flow(self, msg, user_message):
+        """Process chatbot flow"""
+        
+        _logger.info('=' * 60)
+        _logger.info('🤖 CHATBOT FLOW')
+        _logger.info(f'PSID: {msg.facebook_user_id}')
+        _logger.info(f'Message: {user_message}')
+        _logger.info(f'Current state: {msg.chatbot_state}')
+        _logger.info('=' * 60)
+        
+        state = msg.chatbot_state or 'idle'
+        
+        if state == 'idle':
+            self._state_idle(msg, user_message)
+        elif state == 'ask_update':
+            self._state_ask_update(msg, user_message)
+        elif state == 'ask_name':
+            self._state_ask_name(msg, user_message)
+        elif state == 'ask_phone':
+            self._state_ask_phone(msg, user_message)
+        elif state == 'ask_address':
+            self._state_ask_address(msg, user_message)
+        elif state == 'show_products':
+            self._state_show_products(msg, user_message)
+        elif state == 'ask_quantity':
+            self._state_ask_quantity(msg, user_message)
+        elif state == 'confirm_order':
+            self._state_confirm_order(msg, user_message)
+    
+    def _state_idle(self, msg, text):
+        """State: idle"""
+        _logger.info('🎬 STATE: IDLE')
+        
+        text_lower = text.lower().strip()
+        
+        # Tìm customer
+        customer = self._find_existing_customer(msg)
+        
+        if customer:
+            _logger.info(f"👤 Returning customer: {customer.name}")
+            self._greet_returning_customer(msg, customer, text)
+            return
+        
+        _logger.info("🆕 New customer")
+        
+        # Xử lý PRODUCT payload
+        if text.startswith('PRODUCT_'):
+            msg.write({'chatbot_state': 'show_products'})
+            self._state_show_products(msg, text)
+            return
+        
+        # Kiểm tra từ khóa mua
+        if any(kw in text_lower for kw in ['mua', 'order', 'buy', 'menu']):
+            _logger.info("🛒 'mua' keyword - starting registration")
+            msg.write({'chatbot_state': 'ask_name'})
+            
+            welcome_msg = self.env['ir.config_parameter'].sudo().get_param(
+                'module_social_facebook.chatbot_welcome_message',
+                'Xin chào! 👋\n\nBạn vui lòng cho biết tên của bạn?'
+            )
+            
+            self._send_text(msg, welcome_msg)
+        else:
+            self._send_text(msg, '👋 Xin chào! Gửi "mua" để xem sản phẩm!')
+    
+    def _greet_returning_customer(self, msg, customer, user_message):
+        """Chào khách quen"""
+        _logger.info(f'👋 Greeting customer: {customer.name}')
+        
+        msg.write({
+            'customer_name': customer.name,
+            'customer_phone': customer.phone,
+            'customer_address': customer.street,
+        })
+        
+        text_lower = user_message.lower().strip()
+        
+        if user_message.startswith('PRODUCT_'):
+            msg.write({'chatbot_state': 'show_products'})
+            self._state_show_products(msg, user_message)
+            return
+        
+        if any(kw in text_lower for kw in ['mua', 'order', 'buy', 'menu']):
+            msg.write({'chatbot_state': 'ask_update'})
+            
+            message = f"""👋 Xin chào {customer.name}!
+
+📞 SĐT: {customer.phone or 'Chưa có'}
+📍 Địa chỉ: {customer.street or 'Chưa có'}
+
+Bạn có muốn cập nhật thông tin không?
+👉 Gửi "Có" để cập nhật
+👉 Gửi "Không" để tiếp tục mua hàng"""
+            
+            self._send_text(msg, message)
+        else:
+            message = f"""👋 Xin chào {customer.name}!
+
+Rất vui được gặp lại bạn! 😊
+
+👉 Gửi "mua" để xem sản phẩm"""
+            
+            self._send_text(msg, message)
+    
+    def _state_ask_update(self, msg, text):
+        """State: ask_update"""
+        text_lower = text.lower().strip()
+        
+        if any(kw in text_lower for kw in ['có', 'yes', 'ok']):
+            msg.write({'chatbot_state': 'ask_name'})
+            self._send_text(msg, "Bạn muốn cập nhật tên?\n(gửi '.' để giữ nguyên)")
+        elif any(kw in text_lower for kw in ['không', 'no', 'skip', 'mua']):
+            msg.write({'chatbot_state': 'show_products'})
+            self._send_product_list(msg)
+        else:
+            self._send_text(msg, '❓ Gửi "Có" hoặc "Không"')
+    
+    def _state_ask_name(self, msg, text):
+        """State: ask_name"""
+        text_lower = text.lower().strip()
+        
+        if any(kw in text_lower for kw in ['mua', 'menu']):
+            msg.write({'chatbot_state': 'idle'})
+            self._state_idle(msg, text)
+            return
+        
+        name = text.strip()
+        
+        if name == '.':
+            if msg.customer_name:
+                msg.write({'chatbot_state': 'ask_phone'})
+                self._send_text(msg, "✅ Giữ nguyên tên.\n\nNhập SĐT?\n(gửi '.' để giữ nguyên)")
+                return
+            else:
+                self._send_text(msg, "❌ Vui lòng nhập tên!")
+                return
+        
+        if len(name) < 2:
+            self._send_text(msg, "❌ Tên quá ngắn.")
+            return
+        
+        name_normalized = ' '.join(word.capitalize() for word in name.split())
+        
+        msg.write({
+            'customer_name': name_normalized,
+            'chatbot_state': 'ask_phone'
+        })
+        
+        self._send_text(msg, f"✅ Xin chào {name_normalized}! 😊\n\nNhập SĐT?\n(gửi '.' để giữ nguyên)")
+    
+    def _state_ask_phone(self, msg, text):
+        """State: ask_phone"""
+        text_lower = text.lower().strip()
+        
+        if any(kw in text_lower for kw in ['mua', 'menu']):
+            msg.write({'chatbot_state': 'idle'})
+            self._state_idle(msg, text)
+            return
+        
+        phone = text.strip()
+        
+        if phone == '.':
+            if msg.customer_phone:
+                msg.write({'chatbot_state': 'ask_address'})
+                self._send_text(msg, "✅ Giữ nguyên SĐT.\n\nNhập địa chỉ?\n(gửi '.' để giữ nguyên)")
+                return
+            else:
+                self._send_text(msg, "❌ Vui lòng nhập SĐT!")
+                return
+        
+        phone_clean = re.sub(r'[\s\-\(\)]', '', phone)
+        
+        if phone_clean.startswith('+84'):
+            phone_clean = '0' + phone_clean[3:]
+        elif phone_clean.startswith('84'):
+            phone_clean = '0' + phone_clean[2:]
+        
+        if not re.match(r'^0\d{9,10}$', phone_clean):
+            self._send_text(msg, "📱 SĐT không hợp lệ!\n\nVD: 0912345678")
+            return
+        
+        msg.write({
+            'customer_phone': phone_clean,
+            'chatbot_state': 'ask_address'
+        })
+        
+        self._send_text(msg, "📍 Nhập địa chỉ giao hàng?\n(gửi '.' để giữ nguyên)")
+    
+    def _state_ask_address(self, msg, text):
+        """State: ask_address"""
+        text_lower = text.lower().strip()
+        
+        if any(kw in text_lower for kw in ['mua', 'menu']):
+            msg.write({'chatbot_state': 'idle'})
+            self._state_idle(msg, text)
+            return
+        
+        address = text.strip()
+        
+        if address == '.':
+            if msg.customer_address:
+                msg.write({'chatbot_state': 'show_products'})
+                self._send_text(msg, "✅ Giữ nguyên địa chỉ.")
+                self._send_product_list(msg)
+                return
+            else:
+                self._send_text(msg, "❌ Vui lòng nhập địa chỉ!")
+                return
+        
+        if len(address) < 5:
+            self._send_text(msg, "❌ Địa chỉ quá ngắn!")
+            return
+        
+        msg.write({
+            'customer_address': address,
+            'chatbot_state': 'show_products'
+        })
+        
+        self._send_product_list(msg)
+    
+    def _state_show_products(self, msg, text):
+        """State: show_products"""
+        if text.startswith('PRODUCT_'):
+            product_id = self._extract_product_id(text)
+            if product_id:
+                self._handle_product_selection(msg, product_id)
+    
+    def _state_ask_quantity(self, msg, text):
+        """State: ask_quantity"""
+        try:
+            quantity = int(text.strip())
+            
+            if quantity < 1:
+                self._send_text(msg, "❌ Số lượng >= 1")
+                return
+            
+            if quantity > 999:
+                self._send_text(msg, "❌ Max 999")
+                return
+            
+            msg.write({
+                'product_quantity': quantity,
+                'chatbot_state': 'confirm_order'
+            })
+            
+            product = msg.selected_product_ids[0]
+            total = product.price * quantity
+            
+            self._send_text(msg, f"""✅ Xác nhận:
+
+📦 {product.product_id.name}
+🔢 SL: {quantity}
+💰 Đơn giá: {product.price:,.0f} đ
+💵 Tổng: {total:,.0f} đ
+
+👤 {msg.customer_name}
+📞 {msg.customer_phone}
+📍 {msg.customer_address or 'Chưa có'}
+
+Xác nhận?
+👉 "Có" / "Không" """)
+            
+        except ValueError:
+            self._send_text(msg, "❌ Nhập số (VD: 1, 2, 5)")
+    
+    def _state_confirm_order(self, msg, text):
+        """State: confirm_order"""
+        text_lower = text.lower().strip()
+        
+        if any(kw in text_lower for kw in ['có', 'yes', 'ok']):
+            try:
+                partner = self._find_or_create_partner_with_tags(msg)
+                order = self._create_sale_order(msg, partner)
+                lead = self._create_or_update_crm_lead(msg, partner, order)
+                self._sync_to_conversation(msg, partner, lead)
+                
+                self._send_text(msg, f"""🎉 Đặt hàng thành công!
+
+📝 Mã: {order.name}
+💰 Tổng: {order.amount_total:,.0f} đ
+
+Cảm ơn! 🙏
+👉 Gửi "mua" để tiếp tục""")
+                
+                self._reset_order_flow(msg, set_cooldown=True)
+                
+            except Exception as e:
+                _logger.error(f'Order failed: {e}', exc_info=True)
+                self._reset_order_flow(msg)
+                self._send_text(msg, "❌ Lỗi! Thử lại")
+        
+        elif any(kw in text_lower for kw in ['không', 'no']):
+            msg.write({
+                'chatbot_state': 'show_products',
+                'selected_product_ids': [(5, 0, 0)],
+                'product_quantity': 0,
+            })
+            self._send_text(msg, "❌ Đã hủy. Chọn lại!")
+            self._send_product_list(msg)
+        else:
+            self._send_text(msg, '❓ Gửi "Có" hoặc "Không"')
+    
+    def _find_or_create_partner_with_tags(self, msg):
+        """Tạo/cập nhật partner"""
+        Partner = self.env['res.partner'].with_context(tracking_disable=True).sudo()
+        
+        existing = self._find_existing_customer(msg)
+        
+        if existing:
+            update_vals = {}
+            if msg.customer_name and existing.name != msg.customer_name:
+                update_vals['name'] = msg.customer_name
+            if msg.customer_phone and existing.phone != msg.customer_phone:
+                update_vals['phone'] = msg.customer_phone
+            if msg.customer_address and existing.street != msg.customer_address:
+                update_vals['street'] = msg.customer_address
+            
+            if update_vals:
+                existing.write(update_vals)
+            
+            return existing
+        else:
+            fb_tag = self._get_or_create_fb_messenger_tag()
+            
+            partner = Partner.create({
+                'name': msg.customer_name,
+                'phone': msg.customer_phone,
+                'street': msg.customer_address,
+                'company_type': 'person',
+                'category_id': [(6, 0, [fb_tag.id])],
+            })
+            self.env['social.messenger.identity']._set_partner(
+                msg.account_id.id, msg.facebook_user_id, partner.id
+            )
+            return partner
+    
+    def _create_sale_order(self, msg, partner):
+        """Tạo sale order"""
+        SaleOrder = self.env['sale.order'].with_context(tracking_disable=True).sudo()
+        OrderLine = self.env['sale.order.line'].with_context(tracking_disable=True).sudo()
+        
+        order = SaleOrder.create({
+            'partner_id': partner.id,
+            'date_order': fields.Datetime.now(),
+        })
+        
+        for product in msg.selected_product_ids:
+            OrderLine.create({
+                'order_id': order.id,
+                'product_id': product.product_id.id,
+                'product_uom_qty': msg.product_quantity or 1,
+                'price_unit': product.price,
+            })
+        
+        return order
+    
+    def _create_or_update_crm_lead(self, msg, partner, order):
+        """Tạo/cập nhật CRM Lead"""
+        try:
+            Lead = self.env['crm.lead'].with_context(tracking_disable=True).sudo()
+            
+            existing_lead = Lead.search([
+                ('facebook_user_id', '=', msg.facebook_user_id),
+                ('partner_id', '=', partner.id),
+            ], limit=1)
+            
+            if existing_lead:
+                new_revenue = (existing_lead.expected_revenue or 0) + order.amount_total
+                existing_lead.write({'expected_revenue': new_revenue})
+                msg.write({'lead_id': existing_lead.id})
+                return existing_lead
+            else:
+                lead = Lead.create({
+                    'name': f'FB Lead - {partner.name}',
+                    'type': 'opportunity',
+                    'partner_id': partner.id,
+                    'contact_name': partner.name,
+                    'phone': partner.phone,
+                    'expected_revenue': order.amount_total,
+                    'facebook_user_id': msg.facebook_user_id,
+                })
+                msg.write({'lead_id': lead.id})
+                return lead
+        except Exception as e:
+            _logger.error(f"Lead error: {e}", exc_info=True)
+            return None
+    
+    def _sync_to_conversation(self, msg, partner, lead):
+        """Sync to conversation"""
+        try:
+            Conversation = self.env['social.conversation'].sudo()
+            
+            existing = Conversation.search([
+                ('facebook_psid', '=', msg.facebook_user_id),
+                ('account_id', '=', msg.account_id.id),
+            ], limit=1)
+            
+            conv_vals = {
+                'customer_name': partner.name,
+                'customer_phone': partner.phone,
+                'last_message_date': fields.Datetime.now(),
+                'state': 'ongoing',
+                'lead_id': lead.id if lead else False,
+            }
+            
+            if existing:
+                existing.write(conv_vals)
+            else:
+                conv_vals.update({
+                    'facebook_psid': msg.facebook_user_id,
+                    'account_id': msg.account_id.id,
+                    'company_id': msg.company_id.id,
+                    'conversation_id': f"CONV-{Conversation.search_count([]) + 1:05d}",
+                })
+                Conversation.create(conv_vals)
+        except Exception as e:
+            _logger.error(f"Conversation error: {e}", exc_info=True)
+    
+    def _handle_product_selection(self, msg, product_id):
+        """Handle product selection"""
+        product = self.env['social.messenger.product'].sudo().browse(product_id)
+        
+        if not product.exists():
+            self._send_text(msg, "❌ Không tồn tại!")
+            return
+        
+        msg.write({
+            'selected_product_ids': [(6, 0, [product.id])],
+            'chatbot_state': 'ask_quantity'
+        })
+        
+        self._send_text(msg, f"""✅ Đã chọn: {product.product_id.name}
+
+💰 Giá: {product.price:,.0f} đ
+
+🔢 Nhập số lượng (VD: 1, 2, 5)""")
+    
+    def _send_text(self, msg, text):
+        """Send text (qua outbox, gửi sau khi transaction commit)"""
+        self.env['social.messenger.outbox']._enqueue(msg.account_id, msg.facebook_user_id, text)
+    
+    def _send_product_list(self, msg):
+        """Send product list (catalog đã render sẵn, qua outbox)"""
+        company = msg.company_id
+        text, quick_replies = self.env['social.messenger.product']._get_catalog_payload(
+            company.id, company.currency_id.id
+        )
+        
+        if not text:
+            self._send_text(msg, "❌ Chưa có sản phẩm!")
+            return
+        
+        self.env['social.messenger.outbox']._enqueue(
+            msg.account_id, msg.facebook_user_id, text, quick_replies=list(quick_replies)
+        )
+    
+    def _extract_product_id(self, payload):
+        """Extract product ID"""
+        try:
+            return int(payload.replace('PRODUCT_', ''))
+        except:
+            return None
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class SocialMessengerIdentity(models.Model):
+    """
+    Khách hàng Messenger: (page, PSID) → res.partner.
+
+    PSID chỉ có nghĩa trong một page nên key là cặp (page, PSID); unique
+    index trên cặp này làm lookup khách quen là một index probe (thay cho
+    tag `facebook_psid:<psid>` mỗi khách một tag).
+    """
+    _name = 'social.messenger.identity'
+    _description = 'Messenger Customer Identity'
+    _rec_name = 'psid'
+
+    account_id = fields.Many2one('social.account', string='Facebook Page', required=True,
+                                 ondelete='cascade', readonly=True)
+    psid = fields.Char(string='PSID', required=True, readonly=True)
+    partner_id = fields.Many2one('res.partner', string='Customer', required=True,
+                                 ondelete='cascade', index=True)
+
+    _account_psid_uniq = models.Constraint(
+        'UNIQUE(account_id, psid)', 'PSID already linked for this page!',
+    )
+
+    @api.model
+    def _get_partner(self, account_id, psid):
+        """
+        Partner của (page, PSID) - một index probe.
+
+        Returns:
+            res.partner: Rỗng nếu chưa có
+        """
+        self.env.cr.execute("""
+            SELECT partner_id FROM social_messenger_identity
+            WHERE account_id = %s AND psid = %s
+        """, (account_id, psid))
+        row = self.env.cr.fetchone()
+        return self.env['res.partner'].sudo().browse(row[0] if row else ())
+
+    @api.model
+    def _set_partner(self, account_id, psid, partner_id):
+        """Gắn (page, PSID) với partner (ghi đè nếu đã có)"""
+        self.env.cr.execute("""
+            INSERT INTO social_messenger_identity
+                (account_id, psid, partner_id, create_uid, create_date, write_uid, write_date)
+            VALUES (%(account_id)s, %(psid)s, %(partner_id)s,
+                    %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC')
+            ON CONFLICT (account_id, psid) DO UPDATE
+            SET partner_id = EXCLUDED.partner_id,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+        """, {'account_id': account_id, 'psid': psid, 'partner_id': partner_id, 'uid': self.env.uid})
+        self.invalidate_model(['partner_id'])
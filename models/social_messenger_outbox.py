@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+import json
+import time
+import random
+import logging
+from collections import OrderedDict
+from datetime import timedelta
+
+import requests
+
+from ..lib.facebook_api import FacebookAPIError
+from ..lib.facebook_api_async import run_graph_calls
+from ..lib.rate_limiter import PRIORITY_HIGH, THROTTLE_ERROR_CODES
+
+_logger = logging.getLogger(__name__)
+
+# Số tin mỗi lô dispatch (1 commit mỗi lô)
+DISPATCH_BATCH_SIZE = 200
+# Thời gian tối đa (giây) một lần chạy dispatcher
+DISPATCH_TIME_BUDGET = 50
+# Số lần gửi tối đa trước khi đánh dấu failed
+MAX_SEND_ATTEMPTS = 5
+# Backoff giữa các lần gửi lại (giây): base * 2^(attempt-1), tối đa max, có jitter
+RETRY_BASE_DELAY = 5
+RETRY_MAX_DELAY = 600
+# Số ngày giữ tin đã gửi
+KEEP_SENT_DAYS = 7
+
+
+class SocialMessengerOutbox(models.Model):
+    """
+    Outbox tin nhắn Messenger gửi đi (transactional outbox).
+
+    Chatbot chỉ thêm row vào outbox trong transaction của nó; tin được gửi
+    bởi dispatcher (cron) sau khi transaction commit. Transaction rollback
+    thì row biến mất - khách không nhận tin của thao tác không thành công.
+    """
+    _name = 'social.messenger.outbox'
+    _description = 'Messenger Outbox'
+    _order = 'id'
+    _rec_name = 'recipient_id'
+
+    account_id = fields.Many2one('social.account', string='Facebook Page', required=True,
+                                 ondelete='cascade', readonly=True)
+    recipient_id = fields.Char(string='Recipient PSID', required=True, readonly=True, index=True)
+    message_text = fields.Text(string='Message', required=True, readonly=True)
+    quick_replies = fields.Text(string='Quick Replies', readonly=True, help='JSON')
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ], string='Status', default='pending', required=True, readonly=True, index=True)
+    attempts = fields.Integer(string='Attempts', default=0, readonly=True)
+    next_attempt_date = fields.Datetime(string='Next Attempt', readonly=True)
+    facebook_message_id = fields.Char(string='Facebook Message ID', readonly=True)
+    sent_date = fields.Datetime(string='Sent Date', readonly=True)
+    error_message = fields.Text(string='Error Message', readonly=True)
+
+    # -------------------------------------------------------------------------
+    # ENQUEUE (chatbot)
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _enqueue(self, account, recipient_id, message_text, quick_replies=None):
+        """Thêm tin vào outbox; dispatcher chạy sau khi transaction commit"""
+        message = self.sudo().create({
+            'account_id': account.id,
+            'recipient_id': recipient_id,
+            'message_text': message_text,
+            'quick_replies': json.dumps(quick_replies) if quick_replies else False,
+        })
+        # Trigger nằm trong cùng transaction → chỉ có hiệu lực khi commit
+        self.env.ref('module_social_facebook.cron_dispatch_messenger_outbox')._trigger()
+        return message
+
+    # -------------------------------------------------------------------------
+    # DISPATCH (cron)
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _claim_pending(self, limit=DISPATCH_BATCH_SIZE):
+        """
+        Lô tin pending đã tới hạn, theo thứ tự tạo. Bỏ qua recipient còn tin
+        trước đó đang chờ retry để giữ đúng thứ tự.
+        """
+        self.env.cr.execute("""
+            SELECT o.id FROM social_messenger_outbox o
+            WHERE o.state = 'pending'
+              AND (o.next_attempt_date IS NULL OR o.next_attempt_date <= %(now)s)
+              AND NOT EXISTS (
+                  SELECT 1 FROM social_messenger_outbox p
+                  WHERE p.state = 'pending'
+                    AND p.account_id = o.account_id
+                    AND p.recipient_id = o.recipient_id
+                    AND p.id < o.id
+                    AND p.next_attempt_date > %(now)s
+              )
+            ORDER BY o.id
+            LIMIT %(limit)s
+            FOR UPDATE SKIP LOCKED
+        """, {'now': fields.Datetime.now(), 'limit': limit})
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    @api.model
+    def _cron_dispatch(self, batch_size=DISPATCH_BATCH_SIZE, time_budget=DISPATCH_TIME_BUDGET):
+        """Gửi tin trong outbox theo lô, commit sau mỗi lô"""
+        deadline = time.monotonic() + time_budget
+        sent = 0
+        drained = False
+
+        while time.monotonic() < deadline:
+            messages = self._claim_pending(batch_size)
+            if not messages:
+                drained = True
+                break
+            sent += messages._dispatch()
+            self.env.cr.commit()
+
+        if sent:
+            _logger.info(f'Dispatched {sent} Messenger messages')
+
+        cron = self.env.ref('module_social_facebook.cron_dispatch_messenger_outbox')
+        if not drained:
+            # Hết giờ nhưng còn tin → chạy tiếp ngay
+            cron._trigger()
+        else:
+            # Chạy lại đúng lúc tin chờ retry sớm nhất tới hạn
+            retry = self.search([
+                ('state', '=', 'pending'),
+                ('next_attempt_date', '>', fields.Datetime.now()),
+            ], order='next_attempt_date', limit=1)
+            if retry:
+                cron._trigger(retry.next_attempt_date)
+        return sent
+
+    def _dispatch(self):
+        """
+        Gửi các tin theo từng vòng: mỗi vòng gửi song song tin đầu tiên của
+        mọi recipient (connection pool dùng chung), nên tin của cùng một
+        recipient luôn đi đúng thứ tự.
+
+        Returns:
+            int: Số tin gửi thành công
+        """
+        queues = OrderedDict()
+        for message in self:
+            queues.setdefault((message.account_id.id, message.recipient_id), []).append(message)
+
+        concurrency = self.env['social.account']._get_graph_concurrency()
+        sent = 0
+
+        while queues:
+            heads = [queue[0] for queue in queues.values()]
+            results = run_graph_calls({
+                message.id: (
+                    message.account_id.access_token,
+                    'send_message',
+                    message.recipient_id,
+                    message.message_text,
+                    json.loads(message.quick_replies) if message.quick_replies else None,
+                )
+                for message in heads
+            }, concurrency=concurrency, priority=PRIORITY_HIGH)
+
+            for message in heads:
+                key = (message.account_id.id, message.recipient_id)
+                result = results.get(message.id)
+                if isinstance(result, Exception):
+                    message._record_failure(result)
+                    # Tin sau của recipient này chờ lần dispatch sau
+                    del queues[key]
+                    continue
+
+                message.write({
+                    'state': 'sent',
+                    'attempts': message.attempts + 1,
+                    'facebook_message_id': (result or {}).get('message_id'),
+                    'sent_date': fields.Datetime.now(),
+                    'error_message': False,
+                })
+                sent += 1
+                queues[key].pop(0)
+                if not queues[key]:
+                    del queues[key]
+
+        return sent
+
+    @staticmethod
+    def _is_retryable(error):
+        if isinstance(error, FacebookAPIError):
+            return error.is_transient or error.code in THROTTLE_ERROR_CODES
+        return isinstance(error, requests.exceptions.RequestException)
+
+    def _record_failure(self, error):
+        self.ensure_one()
+        attempts = self.attempts + 1
+        vals = {'attempts': attempts, 'error_message': str(error)}
+
+        if self._is_retryable(error) and attempts < MAX_SEND_ATTEMPTS:
+            delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempts - 1))
+            delay = random.uniform(delay / 2, delay)
+            vals['next_attempt_date'] = fields.Datetime.now() + timedelta(seconds=delay)
+            _logger.warning(f'Messenger send to {self.recipient_id} failed ({error}), retry in {delay:.0f}s')
+        else:
+            vals['state'] = 'failed'
+            _logger.error(f'Messenger send to {self.recipient_id} failed permanently: {error}')
+
+        self.write(vals)
+
+    def action_retry(self):
+        """Gửi lại tin lỗi"""
+        self.write({'state': 'pending', 'attempts': 0, 'next_attempt_date': False, 'error_message': False})
+        self.env.ref('module_social_facebook.cron_dispatch_messenger_outbox')._trigger()
+
+    @api.autovacuum
+    def _gc_sent_messages(self):
+        """Xóa tin đã gửi quá KEEP_SENT_DAYS ngày"""
+        self.env.cr.execute("""
+            DELETE FROM social_messenger_outbox
+            WHERE state = 'sent'
+              AND sent_date < (now() at time zone 'UTC') - make_interval(days => %s)
+        """, (KEEP_SENT_DAYS,))
@@ -1,11 +1,19 @@
 # -*- coding: utf-8 -*-
 
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import ValidationError
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Số quick reply tối đa Messenger cho phép trong một tin
+MAX_QUICK_REPLIES = 11
+# Field có trong catalog đã render (_get_catalog_payload): chỉ write các
+# field này mới làm mới cache
+CATALOG_FIELDS = {'active', 'sequence', 'company_id', 'product_id', 'quick_reply_title'}
+# Tên cache trong social.cache.version
+CATALOG_CACHE = 'messenger_catalog'
+
 
 class SocialMessengerProduct(models.Model):
     """
@@ -89,11 +97,10 @@ class SocialMessengerProduct(models.Model):
         compute='_compute_order_count',
     )
     
-    _sql_constraints = [
-        ('product_company_uniq', 
-         'UNIQUE(product_id, company_id)', 
-         'Product already exists in Messenger catalog for this company!'),
-    ]
+    _product_company_uniq = models.Constraint(
+        'UNIQUE(product_id, company_id)',
+        'Product already exists in Messenger catalog for this company!',
+    )
     
     @api.depends('product_id', 'product_id.name')
     def _compute_display_name(self):
@@ -137,6 +144,23 @@ class SocialMessengerProduct(models.Model):
             ])
             record.order_count = len(orders)
     
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['social.cache.version']._bump(CATALOG_CACHE)
+        return records
+    
+    def write(self, vals):
+        result = super().write(vals)
+        if CATALOG_FIELDS & set(vals):
+            self.env['social.cache.version']._bump(CATALOG_CACHE)
+        return result
+    
+    def unlink(self):
+        result = super().unlink()
+        self.env['social.cache.version']._bump(CATALOG_CACHE)
+        return result
+    
     @api.constrains('quick_reply_title')
     def _check_quick_reply_title(self):
         """Validate quick reply title length"""
@@ -166,6 +190,51 @@ class SocialMessengerProduct(models.Model):
         
         return self.search(domain, order='sequence, id')
     
+    @api.model
+    @tools.ormcache('company_id', 'currency_id', 'self.env.lang',
+                    f'self.env["social.cache.version"]._get_version("{CATALOG_CACHE}")')
+    def _get_catalog_payload(self, company_id, currency_id):
+        """
+        Tin nhắn danh sách sản phẩm + quick replies đã render sẵn theo
+        company / currency / ngôn ngữ (tên sản phẩm được dịch), cache trong
+        registry theo version CATALOG_CACHE: version đổi (mọi worker) khi
+        catalog (CATALOG_FIELDS), tên hoặc giá sản phẩm thay đổi.
+        
+        Returns:
+            tuple: (message text, tuple quick reply) - (None, ()) nếu
+                catalog trống
+        """
+        products = self.sudo().search([
+            ('active', '=', True),
+            ('company_id', '=', company_id),
+        ], order='sequence, id')
+        if not products:
+            return None, ()
+        
+        currency = self.env['res.currency'].browse(currency_id)
+        lines = ["📦 DANH SÁCH SẢN PHẨM\n"]
+        for idx, product in enumerate(products, 1):
+            price = currency.format(product.price) if product.price > 0 else "Liên hệ"
+            lines.append(f"{idx}. {product.product_id.name}\n   💰 {price}\n")
+        lines.append("👇 Chọn sản phẩm:")
+        
+        quick_replies = tuple(
+            product.format_for_messenger() for product in products[:MAX_QUICK_REPLIES]
+        )
+        return '\n'.join(lines), quick_replies
+    
+    @api.model
+    @tools.ormcache(f'self.env["social.cache.version"]._get_version("{CATALOG_CACHE}")')
+    def _get_catalog_template_ids(self):
+        """product.template đang hiển thị trong catalog (mọi company)"""
+        self.env.cr.execute("""
+            SELECT DISTINCT pp.product_tmpl_id
+            FROM social_messenger_product smp
+            JOIN product_product pp ON pp.id = smp.product_id
+            WHERE smp.active
+        """)
+        return frozenset(row[0] for row in self.env.cr.fetchall())
+    
     def format_for_messenger(self):
         """
         Format sản phẩm thành quick reply buttons cho Messenger.
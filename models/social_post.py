@@ -3,14 +3,30 @@
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
-import requests
+from odoo.tools import split_every
 import logging
-from datetime import datetime
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 import base64  # ✅ THÊM IMPORT
+import io
+import json
+
+from ..lib.facebook_api import FacebookAPI, FacebookAPIError, parse_graph_datetime
+from ..lib.rate_limiter import PRIORITY_LOW
 
 
 _logger = logging.getLogger(__name__)
 
+STATS_FIELDS = 'likes.summary(true),comments.summary(true),shares'
+# Số comment xử lý mỗi lô khi sync (1 search + 1 create mỗi lô)
+COMMENT_SYNC_CHUNK = 500
+# Cron đối soát comment (webhook có thể lỡ event): chỉ post đăng trong
+# COMMENT_RECONCILE_DAYS ngày, chỉ comment tạo trong COMMENT_RECONCILE_HOURS
+# giờ gần nhất (lớn hơn chu kỳ cron để các lượt chạy gối lên nhau)
+COMMENT_RECONCILE_DAYS = 7
+COMMENT_RECONCILE_HOURS = 12
+
 
 class SocialPost(models.Model):
     """
@@ -57,6 +73,11 @@ class SocialPost(models.Model):
     image = fields.Binary(string='Image', attachment=True)
     image_filename = fields.Char(string='Image Filename')
     video_url = fields.Char(string='Video URL')
+    video_file = fields.Binary(string='Video File', attachment=True)
+    video_filename = fields.Char(string='Video Filename')
+    # Trạng thái resumable upload (upload_session_id, video_id, offset) để
+    # tiếp tục sau khi lỗi giữa chừng
+    video_upload_state = fields.Text(string='Video Upload State', readonly=True, copy=False)
     link_url = fields.Char(string='Link URL')
     
     # -------------------------------------------------------------------------
@@ -178,13 +199,12 @@ class SocialPost(models.Model):
         """
         ✅ Hàm mới: Chuẩn bị dữ liệu post theo media_type
         
-        Return: (url, data_dict, files_dict)
+        Return: (endpoint, data_dict, files_dict)
         """
-        base_url = f'https://graph.facebook.com/v18.0/{self.account_id.facebook_page_id}'
+        base_url = self.account_id.facebook_page_id
         
         # Dữ liệu cơ bản
         data = {
-            'access_token': self.account_id.access_token,
             'message': self.content,
         }
         
@@ -202,11 +222,15 @@ class SocialPost(models.Model):
             url = f'{base_url}/photos'
             
         elif self.media_type == 'video':
-            if not self.video_url:
-                raise UserError(_('Please provide a video URL!'))
-            
-            data['video_url'] = self.video_url
-            url = f'{base_url}/feed'
+            if self.video_file:
+                # Upload từ filestore theo chunk (xem _publish_video_file)
+                data = {'description': self.content}
+                url = f'{base_url}/videos'
+            elif self.video_url:
+                data['video_url'] = self.video_url
+                url = f'{base_url}/feed'
+            else:
+                raise UserError(_('Please upload a video file or provide a video URL!'))
             
         elif self.media_type == 'link':
             if not self.link_url:
@@ -224,53 +248,70 @@ class SocialPost(models.Model):
         """✅ SỬA: Đăng bài ngay lập tức - HỖ TRỢ IMAGE"""
         self.ensure_one()
         
-        if self.state != 'draft':
-            raise UserError(_('Only draft posts can be published!'))
+        # Post scheduled được cron publish khi tới giờ
+        if self.state not in ('draft', 'scheduled'):
+            raise UserError(_('Only draft or scheduled posts can be published!'))
         
         try:
             # ✅ CẦU DIỆN ĐẦU TIÊN: Chuẩn bị dữ liệu
             url, data, files = self._prepare_facebook_post_data()
+            api = FacebookAPI(self.account_id.access_token)
             
-            # ✅ THAY ĐỔI: Gửi request với files nếu có image
-            if files:
-                # Với image: dùng multipart/form-data
-                response = requests.post(url, data=data, files=files, timeout=30)
+            if self.media_type == 'video' and self.video_file:
+                result = self._publish_video_file(api, data)
             else:
-                # Chỉ text: dùng form-urlencoded thường
-                response = requests.post(url, data=data, timeout=30)
+                # Retry lỗi tạm thời + chống đăng trùng (dedupe key) trong FacebookAPI
+                result = api.publish(url, data, files=files, timeout=30)
             
-            # Xử lý response
-            if response.status_code == 200:
-                result = response.json()
-                self.write({
-                    'facebook_post_id': result.get('id'),
-                    'published_date': fields.Datetime.now(),
-                    'state': 'published',
-                    'error_message': False,
-                })
-                
-                self.message_post(body=_('Post published successfully!'))
-                
-                return {
-                    'type': 'ir.actions.client',
-                    'tag': 'display_notification',
-                    'params': {
-                        'title': _('Success'),
-                        'message': _('Post published to Facebook!'),
-                        'type': 'success',
-                        'sticky': False,
-                    }
+            self.write({
+                'facebook_post_id': result.get('id'),
+                'published_date': fields.Datetime.now(),
+                'state': 'published',
+                'error_message': False,
+                'video_upload_state': False,
+            })
+            
+            self.message_post(body=_('Post published successfully!'))
+            
+            return {
+                'type': 'ir.actions.client',
+                'tag': 'display_notification',
+                'params': {
+                    'title': _('Success'),
+                    'message': _('Post published to Facebook!'),
+                    'type': 'success',
+                    'sticky': False,
                 }
-            else:
-                # ✅ THÊM: Error handling tốt hơn
-                try:
-                    error_detail = response.json().get('error', {})
-                    error_msg = error_detail.get('message', response.text)
-                except:
-                    error_msg = response.text
-                
-                raise UserError(_('Failed to publish: %s') % error_msg)
-                
+            }
+        
+        except FacebookAPIError as e:
+            error_str = str(e)
+            if e.is_transient:
+                # Facebook đang lỗi tạm thời → giữ nguyên state để thử lại sau
+                self.write({'error_message': error_str})
+                _logger.warning(f'Transient error publishing post {self.id}: {error_str}')
+                if self.video_upload_state:
+                    # Không raise để transaction commit tiến độ upload (resume lần sau)
+                    return {
+                        'type': 'ir.actions.client',
+                        'tag': 'display_notification',
+                        'params': {
+                            'title': _('Upload Paused'),
+                            'message': _('Video upload interrupted, publish again to resume: %s') % error_str,
+                            'type': 'warning',
+                            'sticky': True,
+                        }
+                    }
+                raise UserError(_('Facebook is temporarily unavailable, please retry later: %s') % error_str)
+            
+            self.write({
+                'state': 'failed',
+                'error_message': error_str,
+                'video_upload_state': False,
+            })
+            _logger.error(f'Error publishing post {self.id}: {error_str}')
+            raise UserError(_('Failed to publish: %s') % error_str)
+            
         except Exception as e:
             error_str = str(e)
             self.write({
@@ -280,6 +321,60 @@ class SocialPost(models.Model):
             _logger.error(f'Error publishing post {self.id}: {error_str}')
             raise UserError(_('Error publishing post: %s') % error_str)
     
+    @contextmanager
+    def _open_video_file(self):
+        """
+        Mở video đính kèm để đọc theo chunk.
+        
+        File nằm trong filestore được đọc trực tiếp từ đĩa (không decode
+        base64 cả file vào bộ nhớ).
+        
+        Yields:
+            tuple: (fileobj, file_size)
+        """
+        self.ensure_one()
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_id', '=', self.id),
+            ('res_field', '=', 'video_file'),
+        ], limit=1)
+        if not attachment:
+            raise UserError(_('Please upload a video file!'))
+        
+        if attachment.store_fname:
+            with open(attachment._full_path(attachment.store_fname), 'rb') as f:
+                yield f, attachment.file_size
+        else:
+            yield io.BytesIO(attachment.raw), attachment.file_size
+    
+    def _publish_video_file(self, api, data):
+        """
+        Upload video_file bằng resumable upload, tiếp tục từ
+        video_upload_state nếu lần trước bị lỗi giữa chừng.
+        
+        Returns:
+            dict: {'id': video_id, 'success': True}
+        """
+        self.ensure_one()
+        upload_session = json.loads(self.video_upload_state) if self.video_upload_state else None
+        if upload_session:
+            _logger.info(
+                f'Resuming video upload for post {self.id} at offset {upload_session.get("start_offset")}'
+            )
+        
+        def save_progress(session):
+            self.write({'video_upload_state': json.dumps(session)})
+        
+        with self._open_video_file() as (fileobj, file_size):
+            return api.upload_video(
+                self.account_id.facebook_page_id,
+                fileobj,
+                file_size,
+                data=data,
+                upload_session=upload_session,
+                on_progress=save_progress,
+            )
+    
     def action_schedule_post(self):
         """Lên lịch đăng bài"""
         self.ensure_one()
@@ -312,21 +407,14 @@ class SocialPost(models.Model):
             return False
         
         try:
-            url = f'https://graph.facebook.com/v18.0/{self.facebook_post_id}'
-            params = {
-                'access_token': self.account_id.access_token,
-                'fields': 'likes.summary(true),comments.summary(true),shares'
-            }
+            params = {'fields': STATS_FIELDS}
             
-            response = requests.get(url, params=params, timeout=10)
+            response = FacebookAPI(self.account_id.access_token).get(
+                self.facebook_post_id, params=params, timeout=10
+            )
             
             if response.status_code == 200:
-                data = response.json()
-                self.write({
-                    'likes_count': data.get('likes', {}).get('summary', {}).get('total_count', 0),
-                    'comments_count': data.get('comments', {}).get('summary', {}).get('total_count', 0),
-                    'shares_count': data.get('shares', {}).get('count', 0),
-                })
+                self.write(self._prepare_stats_values(response.json()))
                 return True
             else:
                 _logger.error(f'Failed to sync stats: {response.text}')
@@ -336,6 +424,55 @@ class SocialPost(models.Model):
             _logger.error(f'Error syncing stats: {e}')
             return False
     
+    @api.model
+    def _prepare_stats_values(self, data):
+        """Chuyển response Graph (likes/comments/shares) thành vals để write"""
+        return {
+            'likes_count': data.get('likes', {}).get('summary', {}).get('total_count', 0),
+            'comments_count': data.get('comments', {}).get('summary', {}).get('total_count', 0),
+            'shares_count': data.get('shares', {}).get('count', 0),
+        }
+    
+    def _sync_stats_batch(self):
+        """
+        Đồng bộ thống kê cho nhiều post bằng Graph batch API.
+        
+        Post được nhóm theo page, mỗi page gửi 50 post / round trip và
+        các page được gọi song song.
+        
+        Returns:
+            int: Số post đồng bộ thành công
+        """
+        posts_by_account = defaultdict(lambda: self.browse())
+        for post in self.filtered('facebook_post_id'):
+            posts_by_account[post.account_id] |= post
+        
+        # Mỗi page một batch executor, các page chạy song song
+        jobs = {}
+        for account, posts in posts_by_account.items():
+            jobs[account.id] = (account.access_token, 'execute_batch', {
+                post.id: FacebookAPI.make_batch_request(post.facebook_post_id, {'fields': STATS_FIELDS})
+                for post in posts
+            })
+        results_by_account = self.env['social.account']._run_graph_calls(jobs)
+        
+        synced = 0
+        for account, posts in posts_by_account.items():
+            results = results_by_account.get(account.id)
+            if isinstance(results, Exception):
+                _logger.error(f'Failed to sync stats for account {account.id}: {results}')
+                continue
+            
+            for post in posts:
+                result = results.get(post.id) or {}
+                if result.get('code') == 200:
+                    post.write(self._prepare_stats_values(result['body']))
+                    synced += 1
+                else:
+                    _logger.error(f'Failed to sync stats for post {post.id}: {result.get("body")}')
+        
+        return synced
+    
     def action_view_comments(self):
         """Xem comments"""
         self.ensure_one()
@@ -365,18 +502,89 @@ class SocialPost(models.Model):
     
     @api.model
     def cron_sync_facebook_comments(self):
-        """Cron job để sync comments"""
+        """Cron job để sync stats của mọi bài đã đăng (Graph batch API)"""
+        posts = self.search([
+            ('state', '=', 'published'),
+            ('facebook_post_id', '!=', False),
+        ])
+        
+        try:
+            synced = posts._sync_stats_batch()
+            _logger.info(f'Synced stats for {synced}/{len(posts)} posts')
+        except Exception as e:
+            _logger.error(f'Error syncing post stats: {e}')
+                
+    @api.model
+    def _cron_reconcile_comments(self):
+        """
+        Cron đối soát comment: lấy lại comment gần đây của các post mới
+        đăng (comment webhook bị lỡ sẽ được tạo) rồi làm mới thống kê.
+        """
+        now = fields.Datetime.now()
         posts = self.search([
             ('state', '=', 'published'),
             ('facebook_post_id', '!=', False),
-        ], limit=50)
+            ('published_date', '>=', now - timedelta(days=COMMENT_RECONCILE_DAYS)),
+        ])
+        since = now - timedelta(hours=COMMENT_RECONCILE_HOURS)
         
+        created = 0
         for post in posts:
             try:
-                post.action_sync_stats()
+                with self.env.cr.savepoint():
+                    created += post._sync_comments(since=since)
             except Exception as e:
-                _logger.error(f'Error syncing post {post.id}: {e}')
-                
+                _logger.error(f'Error reconciling comments of post {post.id}: {e}')
+        _logger.info(f'Comment reconciliation: {created} missing comments on {len(posts)} posts')
+        
+        try:
+            posts._sync_stats_batch()
+        except Exception as e:
+            _logger.error(f'Error syncing post stats: {e}')
+    
+    def _sync_comments(self, since=None):
+        """
+        Stream comment của post từ Facebook (theo cursor, ghi theo lô) và tạo
+        các comment chưa có.
+        
+        Args:
+            since (datetime): Chỉ lấy comment tạo từ thời điểm này
+        
+        Returns:
+            int: Số comment được tạo
+        """
+        self.ensure_one()
+        api = FacebookAPI(self.account_id.access_token, priority=PRIORITY_LOW)
+        Comment = self.env['social.comment']
+        
+        created = 0
+        for chunk in split_every(COMMENT_SYNC_CHUNK, api.iter_comments(self.facebook_post_id, since=since)):
+            fb_ids = [fb_comment['id'] for fb_comment in chunk]
+            existing_ids = set(Comment.search([
+                ('facebook_comment_id', 'in', fb_ids),
+                ('post_id', '=', self.id),
+            ]).mapped('facebook_comment_id'))
+            
+            vals_list = []
+            for fb_comment in chunk:
+                if fb_comment['id'] in existing_ids:
+                    continue
+                author = fb_comment.get('from', {})
+                vals_list.append({
+                    'post_id': self.id,
+                    'facebook_comment_id': fb_comment['id'],
+                    'author_name': author.get('name', 'Unknown'),
+                    'author_facebook_id': author.get('id', ''),
+                    'message': fb_comment.get('message', ''),
+                    'comment_date': parse_graph_datetime(fb_comment.get('created_time')) or fields.Datetime.now(),
+                    'company_id': self.company_id.id,
+                })
+            
+            if vals_list:
+                Comment.create(vals_list)
+                created += len(vals_list)
+        return created
+    
     def action_sync_comments(self):
         """Đồng bộ chi tiết từng comment từ Facebook về Odoo"""
         self.ensure_one()
@@ -384,43 +592,9 @@ class SocialPost(models.Model):
             raise UserError(_('Post not published yet!'))
         
         try:
-            # Gọi Graph API lấy comments
-            url = f'https://graph.facebook.com/v18.0/{self.facebook_post_id}/comments'
-            params = {
-                'access_token': self.account_id.access_token,
-                'fields': 'id,message,from,created_time,parent',
-                'limit': 100
-            }
-            
-            response = requests.get(url, params=params, timeout=30)
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Loop qua từng comment
-                for fb_comment in data.get('data', []):
-                    # Kiểm tra xem comment đã có chưa
-                    existing = self.env['social.comment'].search([
-                        ('facebook_comment_id', '=', fb_comment['id']),
-                        ('post_id', '=', self.id)
-                    ], limit=1)
-                    
-                    if not existing:
-                        # Tạo mới comment record
-                        author = fb_comment.get('from', {})
-                        self.env['social.comment'].create({
-                            'post_id': self.id,
-                            'facebook_comment_id': fb_comment['id'],
-                            'author_name': author.get('name', 'Unknown'),
-                            'author_facebook_id': author.get('id', ''),
-                            'message': fb_comment.get('message', ''),
-                            'comment_date': fb_comment.get('created_time'),
-                            'company_id': self.company_id.id,
-                        })
-                
-                self.message_post(body=_('Comments synced from Facebook!'))
-                return True
-            else:
-                raise UserError(_('Failed to sync comments: %s') % response.text)
+            self._sync_comments()
+            self.message_post(body=_('Comments synced from Facebook!'))
+            return True
                 
         except Exception as e:
             raise UserError(_('Error syncing comments: %s') % str(e))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+import logging
+from functools import partial
+
+from ..lib.event_dedupe import get_seen_events
+
+_logger = logging.getLogger(__name__)
+
+# Thời gian (giờ) giữ key đã xử lý - Facebook chỉ gửi lại trong vài giờ
+DEDUPE_TTL_HOURS = 48
+
+
+def _add_all(seen, keys):
+    for key in keys:
+        seen.add(key)
+
+
+class SocialWebhookDedupe(models.Model):
+    """
+    Key (mid / watermark) của messaging event đã xử lý.
+
+    Unique index trên key là nguồn sự thật giữa các worker; LRU trong
+    process (lib.event_dedupe) chặn phần lớn redelivery mà không cần query.
+    """
+    _name = 'social.webhook.dedupe'
+    _description = 'Facebook Webhook Processed Event'
+    _rec_name = 'key'
+
+    key = fields.Char(string='Key', required=True, readonly=True)
+
+    _key_uniq = models.Constraint('UNIQUE(key)', 'Event key must be unique!')
+
+    @api.model
+    def _mark_processed(self, keys):
+        """
+        Ghi nhận các event key trong transaction hiện tại (chặn worker khác
+        xử lý cùng event). Một query cho cả danh sách.
+
+        Returns:
+            set: Key chưa từng xử lý (key redelivery bị loại)
+        """
+        seen = get_seen_events()
+        keys = [key for key in dict.fromkeys(keys) if key not in seen]
+        if not keys:
+            return set()
+
+        self.env.cr.execute("""
+            INSERT INTO social_webhook_dedupe (key, create_date)
+            SELECT unnest(%s::varchar[]), now() at time zone 'UTC'
+            ON CONFLICT (key) DO NOTHING
+            RETURNING key
+        """, (keys,))
+        new_keys = {row[0] for row in self.env.cr.fetchall()}
+        for key in keys:
+            if key not in new_keys:
+                seen.add(key)
+        return new_keys
+
+    @api.model
+    def _remember_after_commit(self, keys):
+        """
+        Đưa key vào LRU sau khi commit. Gọi khi savepoint xử lý event đã
+        thành công - event bị rollback không được vào LRU để còn xử lý lại.
+        """
+        if keys:
+            seen = get_seen_events()
+            self.env.cr.postcommit.add(partial(_add_all, seen, list(keys)))
+
+    @api.autovacuum
+    def _gc_expired_keys(self):
+        """Xóa key cũ hơn DEDUPE_TTL_HOURS"""
+        self.env.cr.execute("""
+            DELETE FROM social_webhook_dedupe
+            WHERE create_date < (now() at time zone 'UTC') - make_interval(hours => %s)
+        """, (DEDUPE_TTL_HOURS,))
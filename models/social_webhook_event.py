@@ -0,0 +1,440 @@
+# -*- coding: utf-8 -*-
+
+from odoo import api, fields, models
+import json
+import time
+import zlib
+import logging
+from datetime import timedelta
+
+from ..lib.event_dedupe import get_seen_events, make_change_key, make_event_key
+from ..lib.flood_control import get_flood_control
+
+_logger = logging.getLogger(__name__)
+
+# Số delivery mỗi lô khi drain queue (1 commit mỗi lô)
+QUEUE_BATCH_SIZE = 50
+# Thời gian tối đa (giây) một lần chạy cron drain queue
+QUEUE_TIME_BUDGET = 50
+# Số lần xử lý tối đa trước khi để delivery ở trạng thái failed
+MAX_ATTEMPTS = 3
+# Số ngày giữ delivery đã xử lý xong
+KEEP_DONE_DAYS = 7
+# Số partition (= số cron worker, xem data/ir_cron_data.xml). Event của
+# cùng PSID luôn vào cùng partition và được xử lý tuần tự.
+WEBHOOK_PARTITIONS = 4
+# Chờ (giây) trước khi chạy lại partition vừa có lỗi
+RETRY_DELAY = 30
+# Ordering key của phần `leadgen` (Lead Ads): các row này được xử lý gộp
+# cả lô - một lượt Graph batch và một create() crm.lead
+LEADGEN_KEY_PREFIX = 'leadgen:'
+
+
+def get_partition(ordering_key):
+    """Partition ổn định giữa các process (không dùng hash() của Python)"""
+    return zlib.crc32((ordering_key or '').encode('utf-8')) % WEBHOOK_PARTITIONS
+
+
+class SocialWebhookEvent(models.Model):
+    """
+    Queue các delivery webhook Facebook (append-only).
+
+    Controller chỉ lưu delivery rồi trả 200 ngay; cron drain queue theo lô
+    nên độ trễ webhook không phụ thuộc Graph API hay việc tạo đơn hàng.
+
+    Delivery được tách theo (page, PSID) và chia vào WEBHOOK_PARTITIONS
+    partition theo hash(PSID). Mỗi partition có một cron worker riêng và
+    advisory lock riêng: event của cùng khách hàng xử lý đúng thứ tự, các
+    khách hàng khác nhau chạy song song, không tranh nhau cùng row
+    social.message (không serialization failure / replay).
+    """
+    _name = 'social.webhook.event'
+    _description = 'Facebook Webhook Delivery'
+    _order = 'id'
+
+    payload = fields.Text(string='Payload', required=True, readonly=True)
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string='Status', default='pending', required=True, readonly=True, index=True)
+    attempts = fields.Integer(string='Attempts', default=0, readonly=True)
+    error_message = fields.Text(string='Error Message', readonly=True)
+    processed_date = fields.Datetime(string='Processed Date', readonly=True)
+    ordering_key = fields.Char(string='Ordering Key', readonly=True,
+                               help='page_id:psid - event cùng key được xử lý tuần tự')
+    partition = fields.Integer(string='Partition', default=0, readonly=True)
+
+    def init(self):
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS social_webhook_event_pending_idx
+            ON social_webhook_event (partition, id) WHERE state = 'pending'
+        """)
+
+    # -------------------------------------------------------------------------
+    # ENQUEUE (webhook controller)
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _split_payload(self, payload):
+        """
+        Tách delivery thành các phần theo ordering key.
+
+        Messaging event gom theo page_id:psid; change `leadgen` theo
+        leadgen:page_id; phần còn lại của entry (changes, ...) theo
+        page_id. Body không phải JSON hợp lệ được giữ nguyên (lỗi sẽ ghi
+        nhận khi xử lý).
+
+        Messaging event qua flood control ngay tại đây, trước khi ghi DB
+        (mỗi event chỉ tính token một lần, kể cả khi row được xử lý lại);
+        event bị bỏ chỉ được đếm và ghi log.
+
+        Returns:
+            list: [(ordering_key, payload_str)]
+        """
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            return [('', payload)]
+        if not isinstance(data, dict) or data.get('object') != 'page':
+            return [('', payload)]
+
+        Bot = self.env['social.messenger.bot']
+        Bot._configure_flood_control()
+        parts = {}
+        dropped = 0
+        for entry in data.get('entry', []):
+            page_id = entry.get('id')
+            base = {k: v for k, v in entry.items() if k != 'messaging'}
+            changes = base.pop('changes', None) or []
+            leadgen = [change for change in changes if change.get('field') == 'leadgen']
+            if leadgen:
+                parts.setdefault(f'{LEADGEN_KEY_PREFIX}{page_id}', []).append(dict(base, changes=leadgen))
+            if len(leadgen) < len(changes):
+                base['changes'] = [change for change in changes if change.get('field') != 'leadgen']
+            if set(base) - {'id', 'time'}:
+                # Entry có dữ liệu khác ngoài messaging (changes, ...)
+                parts.setdefault(str(page_id), []).append(base)
+            for event in entry.get('messaging', []):
+                psid = event.get('sender', {}).get('id')
+                recipient_id = event.get('recipient', {}).get('id')
+                if not Bot._allow_event(recipient_id, psid, event):
+                    dropped += 1
+                    continue
+                key = f'{recipient_id}:{psid}'
+                entries = parts.setdefault(key, [])
+                if not entries:
+                    entries.append({'id': page_id, 'time': entry.get('time'), 'messaging': []})
+                entries[0]['messaging'].append(event)
+
+        if dropped:
+            _logger.info(f'Flood control dropped {dropped} webhook events '
+                         f'(total {get_flood_control().dropped})')
+        return [
+            (key, json.dumps({'object': 'page', 'entry': entries}))
+            for key, entries in parts.items()
+        ]
+
+    @api.model
+    def _enqueue(self, payload):
+        """Lưu delivery vào queue (mỗi page:psid một row) và đánh thức worker"""
+        events = self.create([{
+            'payload': part,
+            'ordering_key': key,
+            'partition': get_partition(key),
+        } for key, part in self._split_payload(payload)])
+        for partition in set(events.mapped('partition')):
+            self._get_partition_cron(partition)._trigger()
+        return events
+
+    # -------------------------------------------------------------------------
+    # DRAIN (cron)
+    # -------------------------------------------------------------------------
+
+    @api.model
+    def _get_partition_cron(self, partition):
+        xmlid = 'module_social_facebook.cron_process_webhook_events'
+        if partition:
+            xmlid = f'{xmlid}_{partition}'
+        return self.env.ref(xmlid)
+
+    @api.model
+    def _lock_partition(self, partition):
+        """Advisory lock (tới cuối transaction): mỗi partition chỉ một worker"""
+        self.env.cr.execute(
+            "SELECT pg_try_advisory_xact_lock(hashtext('social_webhook_event'), %s)",
+            (partition,),
+        )
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _claim_pending(self, partition, limit=QUEUE_BATCH_SIZE):
+        """Lấy một lô delivery pending của partition theo thứ tự nhận"""
+        self.env.cr.execute("""
+            SELECT id FROM social_webhook_event
+            WHERE state = 'pending' AND partition = %s
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (partition, limit))
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
+
+    @api.model
+    def _cron_process_queue(self, partition=0, batch_size=QUEUE_BATCH_SIZE,
+                            time_budget=QUEUE_TIME_BUDGET):
+        """
+        Drain một partition theo lô, commit sau mỗi lô. Dừng khi hết việc,
+        hết giờ, hoặc có lỗi (chạy lại sau RETRY_DELAY để giữ thứ tự).
+        """
+        deadline = time.monotonic() + time_budget
+        processed = 0
+        failed = False
+
+        while time.monotonic() < deadline:
+            if not self._lock_partition(partition):
+                _logger.info(f'Webhook partition {partition} busy, skip')
+                return processed
+            events = self._claim_pending(partition, batch_size)
+            if not events:
+                break
+            failed = not events._process()
+            processed += len(events)
+            self.env.cr.commit()
+            if failed:
+                break
+
+        if processed:
+            _logger.info(f'Processed {processed} webhook deliveries (partition {partition})')
+            # Bộ đếm chatbot rule của worker này (không chờ tới chu kỳ flush)
+            self.env['social.chatbot.automation']._flush_trigger_counters()
+        if self.search_count([('state', '=', 'pending'), ('partition', '=', partition)], limit=1):
+            # Còn việc → chạy tiếp ngay (hoặc sau RETRY_DELAY nếu vừa lỗi)
+            at = fields.Datetime.now() + timedelta(seconds=RETRY_DELAY) if failed else None
+            self._get_partition_cron(partition)._trigger(at)
+        return processed
+
+    def _process(self):
+        """
+        Xử lý các delivery theo thứ tự; các row leadgen được xử lý gộp
+        trước (xem _process_leadgen()).
+
+        Lỗi của một PSID chỉ rollback savepoint của PSID đó: delivery được
+        đưa lại vào queue (event đã xử lý bị loại nhờ dedupe key) và các
+        delivery sau cùng ordering key trong lô được giữ lại để không xử lý
+        vượt thứ tự.
+
+        Returns:
+            bool: False nếu có delivery lỗi
+        """
+        Dedupe = self.env['social.webhook.dedupe']
+        leadgen_events = self.filtered(
+            lambda e: (e.ordering_key or '').startswith(LEADGEN_KEY_PREFIX)
+        )
+        ok = leadgen_events._process_leadgen() if leadgen_events else True
+
+        blocked_keys = set()
+        for event in self - leadgen_events:
+            if event.ordering_key and event.ordering_key in blocked_keys:
+                continue
+            try:
+                keys, errors = event._process_payload(json.loads(event.payload))
+            except Exception as e:
+                _logger.error(f'Webhook delivery {event.id} failed: {e}', exc_info=True)
+                keys, errors = [], [str(e)]
+            Dedupe._remember_after_commit(keys)
+
+            attempts = event.attempts + 1
+            if errors:
+                state = 'failed' if attempts >= MAX_ATTEMPTS else 'pending'
+                if state == 'pending':
+                    blocked_keys.add(event.ordering_key)
+                event.write({
+                    'state': state,
+                    'attempts': attempts,
+                    'error_message': '\n'.join(errors),
+                })
+            else:
+                event.write({
+                    'state': 'done',
+                    'attempts': attempts,
+                    'error_message': False,
+                    'processed_date': fields.Datetime.now(),
+                })
+        return ok and not blocked_keys
+
+    def _process_payload(self, data):
+        """
+        Xử lý mọi entry của một delivery.
+
+        Returns:
+            tuple: (event key đã xử lý, danh sách lỗi)
+        """
+        if data.get('object') != 'page':
+            return [], []
+        entries = data.get('entry', [])
+        keys, errors = self._process_messaging(entries)
+        change_keys, change_errors = self._process_changes(entries)
+        return keys + change_keys, errors + change_errors
+
+    def _group_messaging_events(self, entries):
+        """
+        Gom messaging event của mọi entry theo (page_id, psid), giữ thứ tự
+        timestamp trong từng PSID. Event đã có trong LRU dedupe bị bỏ ngay.
+
+        Returns:
+            dict: (page_id, psid) -> [(key, event)]
+        """
+        seen = get_seen_events()
+        groups = {}
+        for entry in entries:
+            for event in entry.get('messaging', []):
+                psid = event.get('sender', {}).get('id')
+                page_id = event.get('recipient', {}).get('id')
+                if not psid or not page_id:
+                    continue
+                key = make_event_key(event)
+                if key and key in seen:
+                    _logger.info(f'Skip duplicate webhook event {key}')
+                    continue
+                groups.setdefault((page_id, psid), []).append((key, event))
+        for events in groups.values():
+            events.sort(key=lambda item: item[1].get('timestamp') or 0)
+        return groups
+
+    def _process_messaging(self, entries):
+        """
+        Số query cố định cho cả delivery (resolve page + session một lần),
+        cộng phần việc của từng event. Mỗi PSID chạy trong savepoint riêng.
+        """
+        groups = self._group_messaging_events(entries)
+        if not groups:
+            return [], []
+
+        Bot = self.env['social.messenger.bot']
+        Dedupe = self.env['social.webhook.dedupe']
+        sessions = Bot._get_message_records(groups)
+        processed_keys, errors = [], []
+
+        for (page_id, psid), events in groups.items():
+            msg = sessions.get((page_id, psid))
+            if not msg:
+                continue
+            try:
+                with self.env.cr.savepoint():
+                    # Redelivery bị bỏ trước mọi thao tác ORM / gửi tin
+                    new_keys = Dedupe._mark_processed([key for key, event in events if key])
+                    group_keys = []
+                    for key, event in events:
+                        if key:
+                            if key not in new_keys or key in group_keys:
+                                _logger.info(f'Skip duplicate webhook event {key}')
+                                continue
+                            group_keys.append(key)
+                        Bot._handle_messaging_event(msg, event)
+                processed_keys += group_keys
+            except Exception as e:
+                _logger.error(f'Webhook events of PSID {psid} failed: {e}', exc_info=True)
+                errors.append(f'{psid}: {e}')
+
+        return processed_keys, errors
+
+    def _process_changes(self, entries):
+        """
+        Xử lý entry['changes'] (field `feed`: comment, reaction) trong một
+        savepoint cho cả delivery (row của queue đã được tách theo page).
+        """
+        changes = [
+            change for entry in entries for change in entry.get('changes', [])
+            if change.get('field') == 'feed' and change.get('value')
+        ]
+        if not changes:
+            return [], []
+
+        Dedupe = self.env['social.webhook.dedupe']
+        keyed = [(make_change_key(change), change) for change in changes]
+        try:
+            with self.env.cr.savepoint():
+                new_keys = Dedupe._mark_processed([key for key, change in keyed])
+                values, keys = [], []
+                for key, change in keyed:
+                    if key not in new_keys or key in keys:
+                        continue
+                    keys.append(key)
+                    values.append(change['value'])
+                self.env['social.comment']._apply_feed_changes(values)
+            return keys, []
+        except Exception as e:
+            _logger.error(f'Webhook feed changes failed: {e}', exc_info=True)
+            return [], [f'feed: {e}']
+
+    def _process_leadgen(self):
+        """
+        Xử lý gộp các row `leadgen` của lô trong một savepoint: đọc mọi lead
+        qua Graph batch và tạo crm.lead bằng một create(). Lỗi → cả nhóm
+        được đưa lại vào queue (lead đã có bị loại nhờ dedupe).
+
+        Returns:
+            bool: False nếu có lỗi
+        """
+        Dedupe = self.env['social.webhook.dedupe']
+        keyed = []
+        for event in self:
+            try:
+                data = json.loads(event.payload)
+            except ValueError:
+                continue
+            for entry in data.get('entry', []):
+                for change in entry.get('changes', []):
+                    value = change.get('value') or {}
+                    if change.get('field') != 'leadgen' or not value.get('leadgen_id'):
+                        continue
+                    value = dict(value, page_id=str(value.get('page_id') or entry.get('id')))
+                    keyed.append((f"leadgen:{value['leadgen_id']}", value))
+
+        keys, error = [], False
+        try:
+            with self.env.cr.savepoint():
+                new_keys = Dedupe._mark_processed([key for key, value in keyed])
+                values = []
+                for key, value in keyed:
+                    if key in new_keys and key not in keys:
+                        keys.append(key)
+                        values.append(value)
+                self.env['crm.lead']._create_from_facebook_leadgen(values)
+        except Exception as e:
+            _logger.error(f'Webhook leadgen batch failed ({len(self)} deliveries): {e}', exc_info=True)
+            keys, error = [], f'leadgen: {e}'
+        Dedupe._remember_after_commit(keys)
+
+        now = fields.Datetime.now()
+        for event in self:
+            attempts = event.attempts + 1
+            if error:
+                event.write({
+                    'state': 'failed' if attempts >= MAX_ATTEMPTS else 'pending',
+                    'attempts': attempts,
+                    'error_message': error,
+                })
+            else:
+                event.write({
+                    'state': 'done',
+                    'attempts': attempts,
+                    'error_message': False,
+                    'processed_date': now,
+                })
+        return not error
+
+    def action_retry(self):
+        """Đưa delivery lỗi về queue"""
+        self.write({'state': 'pending', 'attempts': 0, 'error_message': False})
+        for partition in set(self.mapped('partition')):
+            self._get_partition_cron(partition)._trigger()
+
+    @api.autovacuum
+    def _gc_done_events(self):
+        """Xóa delivery đã xử lý xong quá KEEP_DONE_DAYS ngày"""
+        self.env.cr.execute("""
+            DELETE FROM social_webhook_event
+            WHERE state = 'done'
+              AND processed_date < (now() at time zone 'UTC') - make_interval(days => %s)
+        """, (KEEP_DONE_DAYS,))
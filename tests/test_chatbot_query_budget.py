@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+from odoo.tests import TransactionCase, tagged
+
+from ..lib.chatbot_benchmark import ChatbotSimulator
+from ..lib.fake_graph_server import fake_graph_server
+
+
+@tagged('post_install', '-at_install')
+class TestChatbotQueryBudget(TransactionCase):
+    """
+    Số query mỗi tin nhắn chatbot (qua queue webhook) theo transition không
+    vượt ngân sách từ baseline đo được (lib/chatbot_query_baseline.json).
+    Transition chưa có baseline cũng làm test fail.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.account = cls.env['social.account'].create({
+            'name': 'Query Budget Page',
+            'facebook_page_id': '990000000000001',
+            'access_token': 'query-budget-token',
+        })
+        product = cls.env['product.product'].create({
+            'name': 'Áo thun',
+            'list_price': 150000,
+            'sale_ok': True,
+        })
+        cls.catalog_product = cls.env['social.messenger.product'].create({
+            'product_id': product.id,
+            'company_id': cls.account.company_id.id,
+        })
+
+    def test_query_budget_per_transition(self):
+        simulator = ChatbotSimulator(self.env, self.account, self.catalog_product.id)
+        with fake_graph_server():
+            report = simulator.run(customers=2)
+        self.assertTrue(report['transitions'], 'Simulator recorded no transition')
+
+        for transition, stats in report['transitions'].items():
+            with self.subTest(transition=transition):
+                self.assertIsNotNone(
+                    stats['budget'], f'No query baseline for {transition}, record it first',
+                )
+                self.assertLessEqual(
+                    stats['queries_max'], stats['budget'],
+                    f'{transition}: {stats["queries_max"]} queries, budget {stats["budget"]}',
+                )